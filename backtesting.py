@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+"""
+Backtesting walk-forward de PricePredictor sobre el historial guardado
+
+Para cada día de origen t se reproduce lo que el predictor habría respondido ese día
+(solo con datos hasta t) y se compara con el precio real en t + h, para cada horizonte h.
+Métricas por serie (calibre público, calibre/presentación de despacho) y horizonte:
+MAE, MAPE, sesgo y cobertura del intervalo de confianza.
+
+Mismos modelos que predictor.py, reformulados para evaluar todos los orígenes a la vez:
+- Público: regresión lineal sobre la ventana [t - dias_historial, t] + ajuste EMA.
+  El reajuste es incremental: las sumas de la regresión (n, Σx, Σy, Σxy, Σx², Σy²) de cada
+  ventana salen de sumas acumuladas, O(1) por origen. La EMA de la ventana se obtiene de la
+  EMA global de la serie corrigiendo su valor inicial (la diferencia decae como (1-α)^k).
+- Despacho: predicción pública × regresión despacho~público sobre las fechas comunes de la
+  ventana (mismas sumas acumuladas); ratio estimado si hay menos de 5 fechas comunes.
+Todo es numpy sobre matrices series × días (vectorizado entre calibres); las series se
+reparten en bloques entre procesos (--workers).
+
+Diferencia con predictor.py: si un día tiene varias fuentes de precio público, la regresión
+usa todas las filas (igual que el predictor) pero la EMA y la correlación usan el promedio
+del día. Con ventanas de más de ~1 año el predictor usa medias semanales / mensuales
+(resolucion_para_ventana); el backtest siempre evalúa el modelo sobre datos diarios.
+
+Uso:
+    python backtesting.py [--horizons 1 7 14 30] [--dias-historial 90] [--workers 4]
+    python backtesting.py --desde 2025-01-01 --hasta 2025-12-31 --output backtest.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from database import resolucion_para_ventana
+from predictor import calibre_publico_para, ratio_despacho_estimado
+from rolling_stats import load_history, window_sum, regression_from_sums, MIN_FECHAS_CORRELACION
+
+logger = logging.getLogger(__name__)
+
+EMA_ALPHA = 0.3                 # predictor._calcular_ema
+EMA_PESO_AJUSTE = 0.5           # precio_predicho_ajustado = base + ajuste * 0.5
+MIN_MUESTRAS_PUBLICO = 5
+Z_95 = 1.96
+
+
+# ===== MODELO PÚBLICO =====
+
+def _ema_state(media: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    EMA global por serie sobre las muestras diarias, arrastrada a todos los días:
+    G (EMA tras la última muestra <= d), K (muestras <= d), último precio <= d y,
+    hacia adelante, G y precio de la primera muestra >= d
+    """
+    series, dias = media.shape
+    presente = ~np.isnan(media)
+    ema = np.full((series, dias), np.nan)
+    ultimo = np.full((series, dias), np.nan)
+    actual = np.full(series, np.nan)
+    precio = np.full(series, np.nan)
+    for d in range(dias):
+        hay = presente[:, d]
+        valor = media[:, d]
+        actual = np.where(hay, np.where(np.isnan(actual), valor, EMA_ALPHA * valor + (1 - EMA_ALPHA) * actual), actual)
+        precio = np.where(hay, valor, precio)
+        ema[:, d] = actual
+        ultimo[:, d] = precio
+
+    siguiente_ema = np.full((series, dias), np.nan)
+    siguiente_precio = np.full((series, dias), np.nan)
+    s_ema = np.full(series, np.nan)
+    s_precio = np.full(series, np.nan)
+    for d in range(dias - 1, -1, -1):
+        hay = presente[:, d]
+        s_ema = np.where(hay, ema[:, d], s_ema)
+        s_precio = np.where(hay, media[:, d], s_precio)
+        siguiente_ema[:, d] = s_ema
+        siguiente_precio[:, d] = s_precio
+    return ema, np.cumsum(presente, axis=1), ultimo, siguiente_ema, siguiente_precio
+
+
+def public_forecasts(suma: np.ndarray, suma2: np.ndarray, n_dia: np.ndarray, media: np.ndarray,
+                     dias_historial: int, horizons: Sequence[int]) -> Dict[int, Dict[str, np.ndarray]]:
+    """
+    Predicciones públicas hechas en cada día de origen t (columna t) para cada horizonte:
+    {h: {pred, base, ci}} con NaN donde el predictor respondería datos_insuficientes
+    """
+    series, dias = suma.shape
+    x = np.arange(dias, dtype=float)[None, :]
+    n = window_sum(n_dia, dias_historial)
+    sx = window_sum(n_dia * x, dias_historial)
+    sy = window_sum(suma, dias_historial)
+    sxx = window_sum(n_dia * x * x, dias_historial)
+    syy = window_sum(suma2, dias_historial)
+    sxy = window_sum(suma * x, dias_historial)
+    slope, intercept, _, std_err = regression_from_sums(n, sx, sy, sxx, syy, sxy)
+    valido = n >= MIN_MUESTRAS_PUBLICO
+
+    # EMA de la ventana = EMA global - (1-α)^(muestras entre inicio y fin) × (G_inicio - p_inicio)
+    ema, k, ultimo, sig_ema, sig_precio = _ema_state(media)
+    t = np.arange(dias)
+    inicio = np.maximum(t - dias_historial, 0)
+    k_antes = np.where(t - dias_historial - 1 >= 0, k[:, np.maximum(t - dias_historial - 1, 0)], 0)
+    pasos = k - 1 - k_antes
+    ema_ventana = ema - np.power(1 - EMA_ALPHA, pasos) * (sig_ema[:, inicio] - sig_precio[:, inicio])
+    ajuste = (ema_ventana - ultimo) * EMA_PESO_AJUSTE
+
+    ci = Z_95 * std_err * np.sqrt(1 + 1 / np.maximum(n, 1))
+    forecasts = {}
+    for h in horizons:
+        base = intercept + slope * (x + h)
+        forecasts[h] = {
+            "pred": np.where(valido, base + ajuste, np.nan),
+            "base": np.where(valido, base, np.nan),
+            "ci": np.where(valido, ci, np.nan)
+        }
+    return forecasts
+
+
+# ===== MODELO DESPACHO =====
+
+def despacho_forecasts(publico: Dict[int, Dict[str, np.ndarray]], publico_media: np.ndarray,
+                       despacho: np.ndarray, ratios_fallback: np.ndarray,
+                       dias_historial: int) -> Dict[int, Dict[str, np.ndarray]]:
+    """
+    Predicciones de despacho por origen: filas alineadas (publico_media[i] es la serie pública
+    de referencia de despacho[i]); {h: {pred, lo, hi}}
+    """
+    comun = ~np.isnan(publico_media) & ~np.isnan(despacho)
+    xp = np.where(comun, publico_media, 0.0)
+    yd = np.where(comun, despacho, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = np.where(comun, yd / np.where(comun, xp, 1.0), 0.0)
+    m = comun.astype(float)
+    n = window_sum(m, dias_historial)
+    slope, intercept, _, _ = regression_from_sums(
+        n, window_sum(xp, dias_historial), window_sum(yd, dias_historial),
+        window_sum(xp * xp, dias_historial), window_sum(yd * yd, dias_historial),
+        window_sum(xp * yd, dias_historial)
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio_medio = window_sum(ratio, dias_historial) / n
+        ratio_std = np.sqrt(np.maximum(window_sum(ratio * ratio, dias_historial) / n - ratio_medio ** 2, 0))
+    correlacion = n >= MIN_FECHAS_CORRELACION
+    regresion = correlacion & np.isfinite(slope)
+
+    forecasts = {}
+    for h, pub in publico.items():
+        pub_pred = pub["pred"]
+        pred = np.where(regresion, intercept + slope * pub_pred,
+                        np.where(correlacion, ratio_medio * pub_pred, ratios_fallback[:, None] * pub_pred))
+        error = np.sqrt(pub["ci"] ** 2 + (ratio_std * pub_pred) ** 2)
+        forecasts[h] = {
+            "pred": pred,
+            "lo": np.where(correlacion, pred - error, np.nan),
+            "hi": np.where(correlacion, pred + error, np.nan),
+        }
+    return forecasts
+
+
+# ===== MÉTRICAS =====
+
+def score(pred: np.ndarray, lo: np.ndarray, hi: np.ndarray, real: np.ndarray, h: int,
+          origenes: np.ndarray) -> List[Dict[str, Any]]:
+    """Métricas por fila: predicción en columna t contra el real en t + h, para t en `origenes`"""
+    origenes = origenes[origenes + h < real.shape[1]]
+    p = pred[:, origenes]
+    y = real[:, origenes + h]
+    valido = ~np.isnan(p) & ~np.isnan(y)
+    error = np.where(valido, p - y, 0.0)
+    n = valido.sum(axis=1)
+    con_intervalo = valido & ~np.isnan(lo[:, origenes])
+    dentro = con_intervalo & (y >= lo[:, origenes]) & (y <= hi[:, origenes])
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mae = np.abs(error).sum(axis=1) / n
+        mape = np.where(valido, np.abs(error) / np.where(valido, y, 1.0), 0.0).sum(axis=1) / n
+        sesgo = error.sum(axis=1) / n
+        cobertura = dentro.sum(axis=1) / con_intervalo.sum(axis=1)
+
+    def _r(value, digits):
+        return round(float(value), digits) if np.isfinite(value) else None
+
+    return [{
+        "evaluaciones": int(n[i]),
+        "mae": _r(mae[i], 4),
+        "mape_pct": _r(mape[i] * 100, 2),
+        "sesgo": _r(sesgo[i], 4),
+        "cobertura_intervalo_pct": _r(cobertura[i] * 100, 1)
+    } for i in range(len(n))]
+
+
+# ===== EJECUCIÓN POR BLOQUES =====
+
+def _run_chunk(job: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Un bloque de series (se ejecuta en un proceso del pool)"""
+    horizons = job["horizons"]
+    w = job["dias_historial"]
+    origenes = job["origenes"]
+    media = np.where(job["n"] > 0, job["suma"] / np.maximum(job["n"], 1), np.nan)
+    publico = public_forecasts(job["suma"], job["suma2"], job["n"], media, w, horizons)
+    resultados = []
+
+    for fila in job["filas_publicas"]:
+        i = fila["indice"]
+        for h in horizons:
+            pred = publico[h]["pred"][i:i + 1]
+            lo = (publico[h]["base"] - publico[h]["ci"])[i:i + 1]
+            hi = (publico[h]["base"] + publico[h]["ci"])[i:i + 1]
+            metricas = score(pred, lo, hi, media[i:i + 1], h, origenes)[0]
+            resultados.append({"serie": "publico", "calibre": fila["calibre"], "presentacion": None,
+                               "horizonte": h, **metricas})
+
+    if job["filas_despacho"]:
+        ref = np.array([f["indice_publico"] for f in job["filas_despacho"]])
+        tiene_ref = ref >= 0
+        ref = np.where(tiene_ref, ref, 0)
+        pub_rows = {
+            h: {k: np.where(tiene_ref[:, None], v[ref], np.nan) for k, v in publico[h].items()}
+            for h in horizons
+        }
+        desp = despacho_forecasts(pub_rows, np.where(tiene_ref[:, None], media[ref], np.nan),
+                                  job["despacho"], job["ratios"], w)
+        for h in horizons:
+            metricas = score(desp[h]["pred"], desp[h]["lo"], desp[h]["hi"], job["despacho"], h, origenes)
+            for fila, m in zip(job["filas_despacho"], metricas):
+                resultados.append({"serie": "despacho", "calibre": fila["calibre"],
+                                   "presentacion": fila["presentacion"], "horizonte": h, **m})
+    return resultados
+
+
+def _chunks(items: List[Any], parts: int) -> List[List[Any]]:
+    parts = max(1, min(parts, len(items)))
+    return [items[i::parts] for i in range(parts)] if items else []
+
+
+def run_backtest(db_path: Path,
+                 horizons: Sequence[int] = (1, 7, 14, 30),
+                 dias_historial: int = 90,
+                 desde: Optional[date] = None,
+                 hasta: Optional[date] = None,
+                 workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Backtest walk-forward de todas las series públicas y de despacho
+
+    Args:
+        db_path: Base de datos de precios (se lee, no se modifica)
+        horizons: Días a futuro evaluados
+        dias_historial: Ventana de ajuste (como PricePredictor)
+        desde / hasta: Rango de días de origen (por defecto todo el historial)
+        workers: Procesos del pool (1 = en el proceso actual)
+    """
+    start = time.perf_counter()
+    history = load_history(db_path)
+    t0 = 0 if desde is None else max(0, (desde - history.inicio).days)
+    t1 = history.dias - 1 if hasta is None else min(history.dias - 1, (hasta - history.inicio).days)
+    origenes = np.arange(t0, t1 + 1)
+    workers = workers or os.cpu_count() or 1
+
+    fila_pub = {c: i for i, c in enumerate(history.calibres_publicos)}
+    series = ([("publico", c) for c in history.calibres_publicos]
+              + [("despacho", c) for c in history.combos_despacho])
+
+    jobs = []
+    for bloque in _chunks(series, workers):
+        publicas = [c for tipo, c in bloque if tipo == "publico"]
+        combos = [c for tipo, c in bloque if tipo == "despacho"]
+        # Series públicas que necesita el bloque (propias + referencias de despacho)
+        necesarias = sorted(set(publicas) | {
+            calibre_publico_para(cal, pres) for cal, pres in combos
+            if calibre_publico_para(cal, pres) in fila_pub
+        })
+        local = {c: i for i, c in enumerate(necesarias)}
+        idx = [fila_pub[c] for c in necesarias]
+        idx_combos = [history.combos_despacho.index(c) for c in combos]
+        jobs.append({
+            "horizons": list(horizons),
+            "dias_historial": dias_historial,
+            "origenes": origenes,
+            "suma": history.publico_suma[idx],
+            "suma2": history.publico_suma2[idx],
+            "n": history.publico_n[idx],
+            "filas_publicas": [{"calibre": c, "indice": local[c]} for c in publicas],
+            "filas_despacho": [{
+                "calibre": cal,
+                "presentacion": pres,
+                "indice_publico": local.get(calibre_publico_para(cal, pres), -1)
+            } for cal, pres in combos],
+            "despacho": history.despacho[idx_combos] if combos else np.empty((0, history.dias)),
+            "ratios": np.array([ratio_despacho_estimado(pres) for _, pres in combos])
+        })
+
+    if workers == 1 or len(jobs) == 1:
+        partes = [_run_chunk(job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as pool:
+            partes = list(pool.map(_run_chunk, jobs))
+    resultados = sorted(
+        (r for parte in partes for r in parte),
+        key=lambda r: (r["serie"], r["calibre"], r["presentacion"] or "", r["horizonte"])
+    )
+
+    resumen = {}
+    for h in horizons:
+        for tipo in ("publico", "despacho"):
+            filas = [r for r in resultados if r["horizonte"] == h and r["serie"] == tipo and r["evaluaciones"]]
+            total = sum(r["evaluaciones"] for r in filas)
+            if not total:
+                continue
+
+            def _ponderado(campo):
+                valores = [(r[campo], r["evaluaciones"]) for r in filas if r[campo] is not None]
+                peso = sum(n for _, n in valores)
+                return round(sum(v * n for v, n in valores) / peso, 4) if peso else None
+
+            resumen[f"{tipo}_h{h}"] = {
+                "evaluaciones": total,
+                "mae": _ponderado("mae"),
+                "mape_pct": _ponderado("mape_pct"),
+                "cobertura_intervalo_pct": _ponderado("cobertura_intervalo_pct")
+            }
+
+    return {
+        "parametros": {
+            "horizontes": list(horizons),
+            "dias_historial": dias_historial,
+            "origen_desde": str(history.fecha(t0)),
+            "origen_hasta": str(history.fecha(t1)),
+            "dias_origen": len(origenes),
+            "series_publicas": len(history.calibres_publicos),
+            "series_despacho": len(history.combos_despacho),
+            "workers": min(workers, len(jobs)) if jobs else 0
+        },
+        "resumen": resumen,
+        "series": resultados,
+        "duracion_s": round(time.perf_counter() - start, 3),
+        "generado_en": datetime.now().isoformat()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtesting walk-forward de las predicciones de precios")
+    parser.add_argument("--db", type=Path, default=None, help="BD de precios (por defecto PRICES_DB_PATH o data/)")
+    parser.add_argument("--horizons", type=int, nargs="+", default=[1, 7, 14, 30])
+    parser.add_argument("--dias-historial", type=int, default=90)
+    parser.add_argument("--desde", type=date.fromisoformat, default=None, help="Primer día de origen (YYYY-MM-DD)")
+    parser.add_argument("--hasta", type=date.fromisoformat, default=None, help="Último día de origen (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (por defecto CPUs)")
+    parser.add_argument("--output", type=Path, default=None, help="Guardar resultados completos en JSON")
+    args = parser.parse_args()
+
+    db_path = args.db or Path(os.getenv("PRICES_DB_PATH") or Path(__file__).parent / "data" / "precios_historicos.db")
+    resolucion = resolucion_para_ventana(args.dias_historial)
+    if resolucion != "diaria":
+        print(f"⚠️ Con {args.dias_historial} días el predictor usa resolución {resolucion}; "
+              f"el backtest evalúa el modelo sobre datos diarios")
+    resultado = run_backtest(db_path, args.horizons, args.dias_historial, args.desde, args.hasta, args.workers)
+
+    p = resultado["parametros"]
+    print(f"📊 Backtest {p['origen_desde']} → {p['origen_hasta']} ({p['dias_origen']} orígenes, "
+          f"{p['series_publicas']} públicas + {p['series_despacho']} despacho, {p['workers']} procesos) "
+          f"en {resultado['duracion_s']:.2f}s")
+    for nombre, m in resultado["resumen"].items():
+        cobertura = f"{m['cobertura_intervalo_pct']:.1f}%" if m["cobertura_intervalo_pct"] is not None else "-"
+        print(f"  {nombre:<14} n={m['evaluaciones']:<7} MAE {m['mae']:.4f}  MAPE {m['mape_pct']:.2f}%  "
+              f"cobertura {cobertura}")
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(resultado, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"💾 Resultados: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
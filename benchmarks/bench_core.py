@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks del camino de predicción
+
+Mide PricePredictor.predecir_precio_publico, predecir_precio_despacho y _calcular_ema,
+PriceDatabase.calcular_correlacion, ShrimpPriceMLModel.predict_with_ensemble /
+train_ensemble_model y el backtest walk-forward completo (backtesting.run_backtest) sobre historiales sintéticos de 90 días, 2 años y 10 años para
+todos los calibres (HEADLESS y WHOLE). Cada operación recorre todos los calibres,
+así el costo reportado escala con el tamaño real del catálogo.
+
+Las bases de datos y los modelos se generan en un directorio temporal que se borra al
+terminar (--keep lo conserva para inspeccionarlo).
+
+Uso:
+    python -m benchmarks.bench_core [--histories 90,730,3650] [--rounds 20]
+    python -m benchmarks.bench_core --case ema --case correlacion --json
+    python -m benchmarks.bench_core --case backtest --histories 1095,3650
+    python -m benchmarks.bench_core --skip-train --output resultados.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta, datetime
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.harness import measure  # noqa: E402
+
+DEFAULT_HISTORIES = (90, 730, 3650)
+CASES = ("publico", "despacho", "ema", "correlacion", "ensemble", "backtest", "train")
+
+# Las rondas de entrenamiento y de backtest son caras: se limitan aparte
+TRAIN_ROUNDS = 3
+BACKTEST_ROUNDS = 3
+
+
+def build_synthetic_db(db_path: Path, dias: int, catalog: Dict[str, Dict[str, float]],
+                       public_for: Dict[str, str], seed: int = 7) -> Dict[str, np.ndarray]:
+    """
+    Genera `dias` días de precios públicos (todos los calibres HEADLESS) y de despacho
+    (HEADLESS + WHOLE) terminando hoy. Paseo aleatorio con tendencia y estacionalidad.
+
+    Returns:
+        {calibre_publico: array de precios públicos} para los casos que no usan la BD
+    """
+    from database import PriceDatabase
+
+    db = PriceDatabase(db_path)  # crea el esquema
+    rng = np.random.default_rng(seed)
+    today = date.today()
+    fechas = [str(today - timedelta(days=dias - 1 - i)) for i in range(dias)]
+    t = np.arange(dias)
+    estacional = 1 + 0.06 * np.sin(2 * np.pi * t / 365.25)
+
+    publicos: Dict[str, np.ndarray] = {}
+    rows_publicos: List[Tuple] = []
+    for calibre, base in catalog["HEADLESS"].items():
+        paseo = np.cumsum(rng.normal(0, 0.004, dias))
+        precios = (base * 1.55) * estacional * np.exp(paseo) * (1 + 0.00005 * t)
+        publicos[calibre] = precios
+        rows_publicos.extend(
+            (f, calibre, round(float(p), 4), "consolidado", 3, "alta", None)
+            for f, p in zip(fechas, precios)
+        )
+
+    rows_despacho: List[Tuple] = []
+    for presentacion, tabla in catalog.items():
+        for calibre in tabla:
+            publico = publicos.get(public_for.get(calibre, calibre))
+            if publico is None:
+                continue
+            ratio = 0.65 if presentacion == "HEADLESS" else 0.70
+            precios = publico * ratio * (1 + rng.normal(0, 0.01, dias))
+            rows_despacho.extend(
+                (f, calibre, presentacion, round(float(p), 4), "EXPORQUILSA", None)
+                for f, p in zip(fechas, precios)
+            )
+
+    conn = sqlite3.connect(db_path)
+    with conn:
+        conn.executemany("""
+            INSERT OR REPLACE INTO precios_publicos
+            (fecha, calibre, precio_usd_lb, fuente, cantidad_fuentes, confiabilidad, metadata_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows_publicos)
+        conn.executemany("""
+            INSERT OR REPLACE INTO precios_despacho
+            (fecha, calibre, presentacion, precio_usd_lb, origen, metadata_hash)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, rows_despacho)
+    conn.close()
+    db.reconstruir_agregados()  # inserción directa: los agregados por período no se enteran
+    return publicos
+
+
+def _features_for(precios: np.ndarray, mes: int) -> Dict[str, float]:
+    """Features del modelo ML derivadas del historial (mismo esquema que /predict/price)"""
+    return {
+        "precio_historico_1m": float(precios[-30:].mean()),
+        "precio_historico_3m": float(precios[-90:].mean()),
+        "volumen_produccion": 100000.0,
+        "temperatura_impacto": 1.0,
+        "usd_cny_rate": 7.1,
+        "mes_estacional": mes,
+        "precio_nacional_base": float(precios[-1]),
+        "demanda_estacional": 1.25 if mes in (11, 12, 1) else 1.0,
+        "clima_score": 1.0
+    }
+
+
+def run(histories: List[int], rounds: int, cases: List[str], keep: bool = False) -> Dict[str, Any]:
+    """Corre los casos en un directorio temporal; se borra al terminar salvo con keep=True"""
+    workdir = Path(tempfile.mkdtemp(prefix="maransa-bench-core-"))
+    try:
+        return _run_in(workdir, histories, rounds, cases)
+    finally:
+        if keep:
+            print(f"📁 Bases sintéticas conservadas en {workdir}", file=sys.stderr)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _run_in(workdir: Path, histories: List[int], rounds: int, cases: List[str]) -> Dict[str, Any]:
+    os.environ["PRICES_DB_PATH"] = str(workdir / "service.db")
+    os.environ["MODEL_STORAGE_PATH"] = str(workdir / "models")
+
+    import main as service
+    from backtesting import run_backtest
+    from database import PriceDatabase
+    from predictor import PricePredictor, calibre_publico_para
+
+    logging.getLogger().setLevel(logging.WARNING)
+
+    catalog = service.config.SHRIMP_CALIBER_PRICES
+    public_for = {c: calibre_publico_para(c, "WHOLE") for c in catalog["WHOLE"]}
+    combos = [(calibre, presentacion) for presentacion, tabla in catalog.items() for calibre in tabla]
+    calibres_publicos = list(catalog["HEADLESS"])
+
+    model = service.ShrimpPriceMLModel()
+    if "ensemble" in cases:
+        model.train_ensemble_model()
+
+    results: Dict[str, Any] = {}
+    for dias in histories:
+        db_path = workdir / f"historial_{dias}.db"
+        publicos = build_synthetic_db(db_path, dias, catalog, public_for)
+        db = PriceDatabase(db_path)
+        predictor = PricePredictor(db)
+        mes = date.today().month
+        features = [_features_for(p, mes) for p in publicos.values()]
+
+        bench = {
+            "publico": lambda: [predictor.predecir_precio_publico(c, 30, dias) for c in calibres_publicos],
+            "despacho": lambda: [predictor.predecir_precio_despacho(c, p, 30, dias) for c, p in combos],
+            "ema": lambda: [predictor._calcular_ema(p, 0.3) for p in publicos.values()],
+            "correlacion": lambda: [
+                db.calcular_correlacion(c, p, dias, calibre_publico=public_for.get(c, c)) for c, p in combos
+            ],
+            "ensemble": lambda: [model.predict_with_ensemble(f) for f in features],
+        }
+        operaciones = {
+            "publico": len(calibres_publicos),
+            "despacho": len(combos),
+            "ema": len(publicos),
+            "correlacion": len(combos),
+            "ensemble": len(features),
+        }
+
+        # Verificación: todas las operaciones deben producir resultados válidos
+        if "despacho" in cases:
+            muestra = predictor.predecir_precio_despacho(*combos[-1], 30, dias)
+            if muestra.get("status") == "datos_insuficientes" or muestra.get("metodo") == "ratio_estimado":
+                raise SystemExit(f"Historial sintético inválido para {dias} días: {muestra}")
+
+        results[str(dias)] = {}
+        for case in cases:
+            if case in ("train", "backtest"):
+                continue
+            stats = measure(bench[case], rounds)
+            stats["por_calibre_ms"] = round(stats["median_ms"] / operaciones[case], 4)
+            stats["calibres"] = operaciones[case]
+            results[str(dias)][case] = stats
+
+        if "backtest" in cases:
+            # Todas las series, todos los días de origen, horizontes 1/7/14/30, en un solo proceso
+            stats = measure(lambda: run_backtest(db_path, workers=1), min(rounds, BACKTEST_ROUNDS))
+            series = len(calibres_publicos) + len(combos)
+            stats["por_calibre_ms"] = round(stats["median_ms"] / series, 4)
+            stats["calibres"] = series
+            results[str(dias)]["backtest"] = stats
+
+        if "train" in cases:
+            # train_ensemble_model genera su propio dataset sintético: se escala al largo del historial
+            original = model.generate_synthetic_training_data
+            model.generate_synthetic_training_data = lambda n_samples=dias: original(max(dias, 90))
+            try:
+                results[str(dias)]["train"] = measure(model.train_ensemble_model, min(rounds, TRAIN_ROUNDS), warmup=0)
+            finally:
+                model.generate_synthetic_training_data = original
+
+    return {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "rounds": rounds,
+            "histories": histories,
+            "calibres": len(combos),
+            "ml_libraries": model.available_libraries
+        },
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks del predictor y el modelo ML")
+    parser.add_argument("--histories", default=",".join(map(str, DEFAULT_HISTORIES)),
+                        help="Largos de historial en días, separados por coma")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--case", action="append", choices=CASES, default=[])
+    parser.add_argument("--skip-train", action="store_true", help="Omitir train_ensemble_model (lento)")
+    parser.add_argument("--json", action="store_true", help="Imprimir resultados en JSON")
+    parser.add_argument("--output", type=Path, default=None, help="Guardar resultados en JSON")
+    parser.add_argument("--keep", action="store_true", help="No borrar el directorio temporal con las bases sintéticas")
+    args = parser.parse_args()
+
+    histories = [int(h) for h in args.histories.split(",") if h.strip()]
+    cases = args.case or [c for c in CASES if not (args.skip_train and c == "train")]
+
+    results = run(histories, args.rounds, cases, keep=args.keep)
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'historial':>10}  {'caso':<12}{'min (ms)':>11}{'mediana':>11}{'media':>11}"
+          f"{'stddev':>10}{'iqr':>10}{'ops':>10}{'/calibre':>11}")
+    for dias, casos in results["results"].items():
+        for case, s in casos.items():
+            por_calibre = s.get("por_calibre_ms")
+            print(f"{dias:>10}  {case:<12}{s['min_ms']:>11.3f}{s['median_ms']:>11.3f}{s['mean_ms']:>11.3f}"
+                  f"{s['stddev_ms']:>10.3f}{s['iqr_ms']:>10.3f}{s['ops']:>10.1f}"
+                  f"{(f'{por_calibre:.4f}' if por_calibre is not None else '-'):>11}")
+
+
+if __name__ == "__main__":
+    main()
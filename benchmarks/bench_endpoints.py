@@ -0,0 +1,374 @@
+#!/usr/bin/env python3
+"""
+Benchmark de carga de los endpoints de predicción y datos
+
+Ejecuta cada escenario con concurrencia configurable contra la app en proceso
+(ASGI, sin red) o contra un uvicorn local, con los servicios externos servidos
+por el mock de upstream_replay. Reporta throughput y latencias p50/p95/p99,
+guarda los resultados en JSON y falla si hay regresión frente a un baseline.
+
+La base de datos, la caché del scraper y los modelos se copian a un directorio
+temporal: el benchmark nunca modifica data/, models/ ni .cache/ del repositorio.
+
+Uso:
+    python -m benchmarks.bench_endpoints [--concurrency 8] [--requests 200]
+    python -m benchmarks.bench_endpoints --uvicorn --workers 1
+    python -m benchmarks.bench_endpoints --baseline
+    python -m benchmarks.bench_endpoints --save-baseline benchmarks/baselines/endpoints.json
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import shutil
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, date
+from pathlib import Path
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+import httpx  # noqa: E402
+
+from upstream_replay import MockUpstreamServer, UpstreamProfile, replay_environment  # noqa: E402
+
+RESULTS_DIR = ROOT / "benchmarks" / "results"
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baselines" / "endpoints.json"
+
+# Escenarios: (nombre, método, path, query params, cuerpo JSON)
+SCENARIOS: List[Dict[str, Any]] = [
+    {
+        "name": "predict_price",
+        "method": "POST",
+        "path": "/predict/price",
+        "json": {
+            "tipo_producto": "16/20",
+            "presentacion": "HEADLESS",
+            "provincia": "GUAYAS",
+            "mercado_destino": "CHINA",
+            "fecha_prediccion": "2026-11-01"
+        }
+    },
+    {
+        "name": "predict_purchase_price",
+        "method": "POST",
+        "path": "/predict/purchase-price",
+        "json": {
+            "tipo_producto": "21/25",
+            "presentacion": "HEADLESS",
+            "provincia": "GUAYAS",
+            "fecha_prediccion": "2026-11-01",
+            "dias_horizonte": 30
+        }
+    },
+    {
+        "name": "predict_future_price",
+        "method": "GET",
+        "path": "/predict/future-price",
+        "params": {"calibre": "26/30", "dias": 30}
+    },
+    {
+        "name": "predict_despacho_price",
+        "method": "GET",
+        "path": "/predict/despacho-price",
+        "params": {"calibre": "16/20", "presentacion": "HEADLESS", "dias": 30}
+    },
+    {
+        "name": "correlations_calculate",
+        "method": "POST",
+        "path": "/correlations/calculate",
+        "params": {"calibre": "31/35", "presentacion": "HEADLESS"}
+    },
+    {
+        "name": "data_market_prices",
+        "method": "GET",
+        "path": "/data/market-prices"
+    },
+]
+
+
+def _percentiles(samples_ms: List[float]) -> Dict[str, float]:
+    arr = np.asarray(samples_ms, dtype=float)
+    if arr.size == 0:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0, "max_ms": 0.0}
+    p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+    return {
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "mean_ms": round(float(arr.mean()), 3),
+        "max_ms": round(float(arr.max()), 3)
+    }
+
+
+async def _run_scenario(client: httpx.AsyncClient, scenario: Dict[str, Any],
+                        total: int, concurrency: int, warmup: int) -> Dict[str, Any]:
+    """Ejecuta `total` requests con `concurrency` workers; el warmup no se mide"""
+
+    async def _one() -> (int, float):
+        start = time.perf_counter()
+        response = await client.request(
+            scenario["method"], scenario["path"],
+            params=scenario.get("params"), json=scenario.get("json")
+        )
+        return response.status_code, (time.perf_counter() - start) * 1000
+
+    for _ in range(warmup):
+        await _one()
+
+    latencies: List[float] = []
+    status_codes: Dict[str, int] = {}
+    pending = iter(range(total))
+
+    async def _worker():
+        for _ in pending:
+            status, elapsed = await _one()
+            latencies.append(elapsed)
+            status_codes[str(status)] = status_codes.get(str(status), 0) + 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(_worker() for _ in range(max(1, concurrency))))
+    wall = time.perf_counter() - wall_start
+
+    errors = sum(n for code, n in status_codes.items() if not code.startswith("2"))
+    return {
+        **_percentiles(latencies),
+        "requests": len(latencies),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "error_rate": round(errors / len(latencies), 4) if latencies else 0.0,
+        "status_codes": status_codes
+    }
+
+
+def _rebase_dates(db_path: Path) -> int:
+    """
+    Desplaza las fechas de la copia para que el dato más reciente sea hoy
+    (las predicciones usan ventanas de historial relativas a la fecha actual)
+    """
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            SELECT MAX(fecha) FROM (
+                SELECT fecha FROM precios_publicos UNION ALL SELECT fecha FROM precios_despacho
+            )
+        """)
+        latest = cursor.fetchone()[0]
+        if not latest:
+            return 0
+        shift = (date.today() - date.fromisoformat(latest[:10])).days
+        if shift <= 0:
+            return 0
+        # Fecha por fecha, de la más reciente a la más antigua, para no chocar con UNIQUE(fecha, ...)
+        for table in ("precios_publicos", "precios_despacho"):
+            cursor.execute(f"SELECT DISTINCT fecha FROM {table} ORDER BY fecha DESC")
+            for (fecha,) in cursor.fetchall():
+                cursor.execute(
+                    f"UPDATE {table} SET fecha = date(fecha, ?) WHERE fecha = ?",
+                    (f"+{shift} days", fecha)
+                )
+        # Los agregados por período quedaron con las fechas viejas: PriceDatabase los
+        # reconstruye al crear de nuevo la tabla
+        cursor.execute("DROP TABLE IF EXISTS agregados_precios")
+        conn.commit()
+        return shift
+    finally:
+        conn.close()
+
+
+def _prepare_sandbox(workdir: Path) -> Dict[str, str]:
+    """Copia BD y modelos a un directorio temporal; devuelve el entorno a usar"""
+    db_copy = workdir / "precios_historicos.db"
+    shutil.copy2(ROOT / "data" / "precios_historicos.db", db_copy)
+    _rebase_dates(db_copy)
+    models_copy = workdir / "models"
+    shutil.copytree(ROOT / "models", models_copy)
+    return {
+        "PRICES_DB_PATH": str(db_copy),
+        "MODEL_STORAGE_PATH": str(models_copy),
+        "MARKET_CACHE_DIR": str(workdir / "cache"),
+        # El mock no valida la key; solo habilita la ruta de OpenWeatherMap
+        "WEATHER_API_KEY": os.getenv("WEATHER_API_KEY") or "benchmark",
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _run_all(base_url: Optional[str], app: Any, scenarios: List[Dict[str, Any]],
+                   total: int, concurrency: int, warmup: int, timeout: float) -> Dict[str, Any]:
+    if app is not None:
+        transport = httpx.ASGITransport(app=app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout)
+    else:
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        client = httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits)
+
+    results = {}
+    async with client:
+        for scenario in scenarios:
+            results[scenario["name"]] = await _run_scenario(client, scenario, total, concurrency, warmup)
+            r = results[scenario["name"]]
+            print(f"  {scenario['name']:<26} p50 {r['p50_ms']:>9.2f}  p95 {r['p95_ms']:>9.2f}  "
+                  f"p99 {r['p99_ms']:>9.2f} ms  {r['throughput_rps']:>8.1f} req/s  errores {r['error_rate']:.1%}",
+                  flush=True)
+    return results
+
+
+def _start_uvicorn(env: Dict[str, str], workers: int) -> (subprocess.Popen, str):
+    port = _free_port()
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1", "--port", str(port),
+           "--log-level", "warning", "--workers", str(workers)]
+    proc = subprocess.Popen(cmd, cwd=str(ROOT), env={**os.environ, **env})
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + 120
+    while time.time() < deadline:
+        if proc.poll() is not None:
+            raise SystemExit(f"uvicorn terminó con código {proc.returncode}")
+        try:
+            if httpx.get(f"{base_url}/", timeout=1.0).status_code == 200:
+                return proc, base_url
+        except httpx.HTTPError:
+            time.sleep(0.25)
+    proc.terminate()
+    raise SystemExit("uvicorn no respondió a tiempo")
+
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+                        min_delta_ms: float = 5.0) -> List[str]:
+    """
+    Regresión si, por escenario:
+    - p95 o p99 superan el baseline en más de `tolerance` (relativo) y en más de `min_delta_ms`
+    - el throughput cae más de `tolerance`
+    - la tasa de error sube más de 1 punto porcentual
+    """
+    regressions = []
+    for name, base in baseline.get("scenarios", {}).items():
+        current = results["scenarios"].get(name)
+        if current is None:
+            continue
+        for metric in ("p95_ms", "p99_ms"):
+            limit = max(base.get(metric, 0.0) * (1 + tolerance), base.get(metric, 0.0) + min_delta_ms)
+            if base.get(metric) and current[metric] > limit:
+                regressions.append(f"{name}: {metric} {current[metric]:.2f} > {base[metric]:.2f} (+{tolerance:.0%})")
+        if base.get("throughput_rps") and current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(
+                f"{name}: throughput {current['throughput_rps']:.1f} < {base['throughput_rps']:.1f} (-{tolerance:.0%})"
+            )
+        if current["error_rate"] > base.get("error_rate", 0.0) + 0.01:
+            regressions.append(f"{name}: error_rate {current['error_rate']:.2%} > {base.get('error_rate', 0.0):.2%}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de carga de endpoints del microservicio")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=200, help="Requests medidas por escenario")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--scenario", action="append", default=[], help="Limitar a uno o más escenarios")
+    parser.add_argument("--uvicorn", action="store_true", help="Levantar uvicorn local en vez de ASGI en proceso")
+    parser.add_argument("--workers", type=int, default=1, help="Workers de uvicorn (solo con --uvicorn)")
+    parser.add_argument("--target", default=None, help="URL de un servidor ya levantado (sin sandbox)")
+    parser.add_argument("--upstream-latency-ms", type=float, default=0.0)
+    parser.add_argument("--upstream-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--upstream-error-rate", type=float, default=0.0)
+    parser.add_argument("--output", type=Path, default=None, help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", type=Path, nargs="?", const=DEFAULT_BASELINE, default=None,
+                        help=f"Comparar contra un baseline (por defecto {DEFAULT_BASELINE.relative_to(ROOT)})")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Tolerancia relativa de regresión")
+    parser.add_argument("--min-delta-ms", type=float, default=5.0,
+                        help="Diferencia absoluta mínima de latencia para considerar regresión")
+    parser.add_argument("--verbose", action="store_true", help="Mantener los logs INFO del servicio")
+    parser.add_argument("--save-baseline", type=Path, default=None, help="Guardar resultados como baseline")
+    args = parser.parse_args()
+
+    scenarios = [s for s in SCENARIOS if not args.scenario or s["name"] in args.scenario]
+    if not scenarios:
+        raise SystemExit(f"Escenarios disponibles: {', '.join(s['name'] for s in SCENARIOS)}")
+
+    profile = UpstreamProfile(args.upstream_latency_ms, args.upstream_jitter_ms, args.upstream_error_rate)
+    mode = "target" if args.target else ("uvicorn" if args.uvicorn else "inprocess")
+
+    with tempfile.TemporaryDirectory(prefix="maransa-bench-") as tmp, MockUpstreamServer(profile=profile) as upstream:
+        env = {**_prepare_sandbox(Path(tmp)), **replay_environment(upstream)}
+        proc = None
+        app = None
+        base_url = args.target
+
+        if mode == "inprocess":
+            os.environ.update(env)
+            import main as service  # noqa: E402 - tras fijar el entorno del sandbox
+            app = service.app
+            if not args.verbose:
+                logging.getLogger().setLevel(logging.WARNING)
+        elif mode == "uvicorn":
+            proc, base_url = _start_uvicorn(env, args.workers)
+
+        print(f"🚀 Benchmark endpoints ({mode}, concurrencia {args.concurrency}, {args.requests} requests/escenario)")
+        try:
+            scenario_results = asyncio.run(_run_all(
+                base_url, app, scenarios, args.requests, args.concurrency, args.warmup, args.timeout
+            ))
+        finally:
+            if proc is not None:
+                proc.terminate()
+                proc.wait(timeout=30)
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "mode": mode,
+            "workers": args.workers if mode == "uvicorn" else 1,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "upstream_latency_ms": args.upstream_latency_ms,
+            "upstream_jitter_ms": args.upstream_jitter_ms,
+            "upstream_error_rate": args.upstream_error_rate,
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        },
+        "scenarios": scenario_results
+    }
+
+    output = args.output or RESULTS_DIR / f"endpoints-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"💾 Resultados: {output}")
+
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.save_baseline.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"📌 Baseline guardado: {args.save_baseline}")
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        for key in ("mode", "workers", "concurrency", "upstream_latency_ms"):
+            if baseline.get("meta", {}).get(key) != results["meta"][key]:
+                print(f"⚠️ Condiciones distintas al baseline: {key} = {results['meta'][key]} "
+                      f"(baseline {baseline.get('meta', {}).get(key)})")
+        regressions = compare_to_baseline(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("❌ Regresiones detectadas:")
+            for line in regressions:
+                print(f"   - {line}")
+            sys.exit(1)
+        print(f"✅ Sin regresiones frente a {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Benchmark de tiempo de importación de main.py (python -X importtime)
+
+Importa el servicio en un intérprete nuevo por ronda, con BD/modelos/caché copiados a un
+directorio temporal, y reporta el tiempo acumulado de `import main` (mediana), los
+paquetes de primer nivel más caros y las librerías pesadas que se importaron de forma
+anticipada. Falla (exit 1) si alguna librería de HEAVY_MODULES se importa al arrancar o
+si el tiempo supera el baseline: pensado para correr en CI.
+
+Uso:
+    python -m benchmarks.bench_imports [--rounds 5]
+    python -m benchmarks.bench_imports --baseline
+    python -m benchmarks.bench_imports --save-baseline benchmarks/baselines/imports.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, List
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_endpoints import _prepare_sandbox, RESULTS_DIR  # noqa: E402
+
+DEFAULT_BASELINE = ROOT / "benchmarks" / "baselines" / "imports.json"
+
+# Solo deben cargarse bajo demanda (entrenamiento, carga de modelos, scraping, HTTP saliente)
+HEAVY_MODULES = (
+    "pandas", "sklearn", "scipy", "xgboost", "statsmodels", "joblib",
+    "aiohttp", "requests", "bs4", "lxml", "pyinstrument",
+)
+
+
+def parse_importtime(stderr: str) -> List[Dict[str, Any]]:
+    """Líneas 'import time: self | cumulative | name' -> [{module, depth, self_us, cumulative_us}]"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3 or not parts[0].strip().isdigit():
+            continue  # encabezado
+        name = parts[2].rstrip()
+        module = name.lstrip()
+        entries.append({
+            "module": module,
+            "depth": (len(name) - len(module)) // 2,
+            "self_us": int(parts[0]),
+            "cumulative_us": int(parts[1])
+        })
+    return entries
+
+
+def run_once(env: Dict[str, str]) -> List[Dict[str, Any]]:
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=300
+    )
+    if proc.returncode != 0:
+        raise SystemExit(f"import main falló:\n{proc.stderr[-2000:]}")
+    return parse_importtime(proc.stderr)
+
+
+def summarize_round(entries: List[Dict[str, Any]]) -> Dict[str, Any]:
+    main_entry = next(e for e in reversed(entries) if e["module"] == "main" and e["depth"] == 0)
+    # Paquetes de primer nivel importados (directa o indirectamente) por main
+    packages: Dict[str, int] = {}
+    for entry in entries:
+        package = entry["module"].split(".")[0]
+        if entry["depth"] <= 1 or package not in packages:
+            packages[package] = max(packages.get(package, 0), entry["cumulative_us"])
+    eager_heavy = sorted({e["module"].split(".")[0] for e in entries} & set(HEAVY_MODULES))
+    return {
+        "main_ms": main_entry["cumulative_us"] / 1000,
+        "total_ms": sum(e["cumulative_us"] for e in entries if e["depth"] == 0) / 1000,
+        "modules": len(entries),
+        "packages": packages,
+        "eager_heavy": eager_heavy
+    }
+
+
+def compare_to_baseline(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float,
+                        min_delta_ms: float) -> List[str]:
+    regressions = []
+    base = baseline.get("import", {})
+    current = results["import"]
+    if base.get("main_median_ms"):
+        limit = max(base["main_median_ms"] * (1 + tolerance), base["main_median_ms"] + min_delta_ms)
+        if current["main_median_ms"] > limit:
+            regressions.append(
+                f"import main {current['main_median_ms']:.1f} ms > {base['main_median_ms']:.1f} ms (+{tolerance:.0%})"
+            )
+    if current["modules"] > base.get("modules", current["modules"]) * (1 + tolerance):
+        regressions.append(f"módulos importados {current['modules']} > {base['modules']} (+{tolerance:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de tiempo de importación del microservicio")
+    parser.add_argument("--rounds", type=int, default=5, help="Intérpretes nuevos a medir")
+    parser.add_argument("--top", type=int, default=12, help="Paquetes más caros a mostrar")
+    parser.add_argument("--output", type=Path, default=None, help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", type=Path, nargs="?", const=DEFAULT_BASELINE, default=None,
+                        help=f"Comparar contra un baseline (por defecto {DEFAULT_BASELINE.relative_to(ROOT)})")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Tolerancia relativa de regresión")
+    parser.add_argument("--min-delta-ms", type=float, default=100.0,
+                        help="Diferencia absoluta mínima para considerar regresión")
+    parser.add_argument("--save-baseline", type=Path, default=None, help="Guardar resultados como baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="maransa-bench-") as tmp:
+        env = {**os.environ, **_prepare_sandbox(Path(tmp)), "PYTHONDONTWRITEBYTECODE": "1"}
+        env.pop("PYTHONPROFILEIMPORTTIME", None)
+        run_once(env)  # calienta la caché de bytecode y del sistema de archivos
+        rounds = [summarize_round(run_once(env)) for _ in range(max(1, args.rounds))]
+
+    main_times = [r["main_ms"] for r in rounds]
+    packages = {
+        name: round(statistics.median(r["packages"].get(name, 0) for r in rounds) / 1000, 2)
+        for name in rounds[0]["packages"]
+    }
+    top = dict(sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top])
+    eager_heavy = sorted({m for r in rounds for m in r["eager_heavy"]})
+
+    results = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(),
+            "rounds": len(rounds),
+            "python": platform.python_version(),
+            "platform": platform.platform()
+        },
+        "import": {
+            "main_median_ms": round(statistics.median(main_times), 2),
+            "main_min_ms": round(min(main_times), 2),
+            "main_max_ms": round(max(main_times), 2),
+            "total_median_ms": round(statistics.median(r["total_ms"] for r in rounds), 2),
+            "modules": rounds[0]["modules"],
+            "top_packages_ms": top,
+            "eager_heavy": eager_heavy
+        }
+    }
+
+    imp = results["import"]
+    print(f"🚀 import main: mediana {imp['main_median_ms']:.1f} ms "
+          f"(min {imp['main_min_ms']:.1f}, max {imp['main_max_ms']:.1f}), {imp['modules']} módulos")
+    for name, ms in top.items():
+        print(f"  {name:<28} {ms:>9.2f} ms")
+
+    output = args.output or RESULTS_DIR / f"imports-{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    print(f"💾 Resultados: {output}")
+
+    if args.save_baseline:
+        args.save_baseline.parent.mkdir(parents=True, exist_ok=True)
+        args.save_baseline.write_text(json.dumps(results, indent=2), encoding="utf-8")
+        print(f"📌 Baseline guardado: {args.save_baseline}")
+
+    failures = [f"{name} se importa al arrancar (debe ser diferido)" for name in eager_heavy]
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        failures += compare_to_baseline(results, baseline, args.tolerance, args.min_delta_ms)
+    if failures:
+        print("❌ Regresiones detectadas:")
+        for line in failures:
+            print(f"   - {line}")
+        sys.exit(1)
+    print("✅ Sin importaciones pesadas anticipadas" + (f" ni regresiones frente a {args.baseline}" if args.baseline else ""))
+
+
+if __name__ == "__main__":
+    main()
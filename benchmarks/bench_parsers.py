@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Benchmark de parsers FreezeOcean / Selina Wamucii contra páginas guardadas en fixtures/
+
+Compara la implementación anterior (BeautifulSoup + regex compiladas en cada llamada)
+con market_parsers (patrones precompilados, stripper ligero y lookup precomputado).
+
+Uso: python -m benchmarks.bench_parsers [--rounds 50]
+"""
+
+import argparse
+import json
+import re
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+from benchmarks.harness import measure  # noqa: E402
+
+from market_data_scraper import MarketPriceScraper, _CALIBER_LOOKUP  # noqa: E402
+from market_parsers import (  # noqa: E402
+    parse_freezeocean_products,
+    parse_selina_ajax_prices,
+    parse_selina_page_prices,
+)
+
+FIXTURES = ROOT / "fixtures"
+
+
+# ===== IMPLEMENTACIÓN ANTERIOR (referencia) =====
+
+def legacy_parse_freezeocean(products: Any) -> Dict[str, Any]:
+    caliber_mapping = MarketPriceScraper.CALIBER_MAPPING
+
+    def _strip_html(value: str) -> str:
+        if not value:
+            return ""
+        return BeautifulSoup(value, "lxml").get_text(" ", strip=True)
+
+    def _to_float(value: str) -> Optional[float]:
+        if not value:
+            return None
+        try:
+            return float(value.replace(",", ".").strip())
+        except Exception:
+            return None
+
+    def _map_size_to_caliber(size: int) -> Optional[str]:
+        for key in caliber_mapping.keys():
+            low, high = key.split("/")
+            if int(low) <= size <= int(high):
+                return key
+        return None
+
+    def _normalize_caliber(start: int, end: int) -> Optional[str]:
+        raw = f"{start}/{end}"
+        if raw in caliber_mapping:
+            return raw
+        target_mid = (start + end) / 2
+        best_key = None
+        best_diff = None
+        for key in caliber_mapping.keys():
+            low, high = key.split("/")
+            diff = abs((int(low) + int(high)) / 2 - target_mid)
+            if best_diff is None or diff < best_diff:
+                best_diff = diff
+                best_key = key
+        if best_diff is not None and best_diff <= 6:
+            return best_key
+        return None
+
+    def _extract_caliber(text: str) -> Optional[str]:
+        range_pattern = re.compile(
+            r"(\d{2})\s*[–-]\s*(\d{2})\s*(?:u|unidades|und|u\.|en\s*libra|lb)",
+            re.IGNORECASE
+        )
+        match = range_pattern.search(text)
+        if match:
+            start, end = match.groups()
+            return _normalize_caliber(int(start), int(end))
+        talla_match = re.search(r"talla\s*(\d{2})", text, re.IGNORECASE)
+        if talla_match:
+            return _map_size_to_caliber(int(talla_match.group(1)))
+        return None
+
+    def _extract_price_per_lb(text: str) -> Optional[float]:
+        lb_patterns = [
+            r"(?:precio\s*:)?\s*libra\s*[:\-]?\s*\$?\s*([0-9]+(?:[\.,][0-9]+)?)",
+            r"(?:lb|libra)\s*\$?\s*([0-9]+(?:[\.,][0-9]+)?)"
+        ]
+        for pattern in lb_patterns:
+            match = re.search(pattern, text, re.IGNORECASE)
+            if match:
+                value = _to_float(match.group(1))
+                if value:
+                    return value
+        kg_match = re.search(r"(?:kilo|kg)\s*[:\-]?\s*\$?\s*([0-9]+(?:[\.,][0-9]+)?)", text, re.IGNORECASE)
+        if kg_match:
+            value = _to_float(kg_match.group(1))
+            if value:
+                return value / 2.20462
+        return None
+
+    prices_by_caliber: Dict[str, List[float]] = {}
+    for product in products:
+        combined = " ".join([
+            _strip_html(product.get("name", "")),
+            _strip_html(product.get("short_description", "")),
+            _strip_html(product.get("description", ""))
+        ]).strip()
+        if not combined:
+            continue
+        caliber = _extract_caliber(combined)
+        if not caliber:
+            continue
+        price_per_lb = _extract_price_per_lb(combined)
+        if price_per_lb is None:
+            prices_data = product.get("prices", {})
+            raw_price = prices_data.get("price")
+            minor_unit = prices_data.get("currency_minor_unit", 2)
+            if raw_price is not None:
+                price_per_lb = float(raw_price) / (10 ** int(minor_unit))
+        if price_per_lb is None:
+            continue
+        prices_by_caliber.setdefault(caliber, []).append(price_per_lb)
+
+    return {
+        cal: {
+            "precio_promedio": round(sum(prices) / len(prices), 3),
+            "cantidad_fuentes": len(prices),
+            "fuente": "FreezeOcean"
+        }
+        for cal, prices in prices_by_caliber.items() if prices
+    }
+
+
+def legacy_parse_selina(page_html: str, ajax_payload: Any) -> List[float]:
+    # La versión anterior parseaba siempre la página completa, aunque la respuesta AJAX tuviera precios
+    soup = BeautifulSoup(page_html, "lxml")
+    text = soup.get_text(" ", strip=True)
+    ajax_text = json.dumps(ajax_payload)
+    prices = [float(m) for m in re.findall(
+        r"\$\s*([0-9]+(?:\.[0-9]+)?)\s*(?:/\s*lb|per\s*lb|per\s*pound)", ajax_text, re.IGNORECASE
+    ) if m]
+    if not prices:
+        for a, b in re.findall(
+            r"between\s+US\$\s*([0-9]+(?:\.[0-9]+)?)\s+and\s+US\$\s*([0-9]+(?:\.[0-9]+)?)\s+per\s+pound",
+            text, re.IGNORECASE
+        ):
+            prices.append((float(a) + float(b)) / 2)
+    return prices
+
+
+def new_parse_selina(page_html: str, ajax_payload: Any) -> List[float]:
+    prices = parse_selina_ajax_prices(ajax_payload)
+    if not prices:
+        prices = parse_selina_page_prices(page_html)
+    return prices
+
+
+# ===== HARNESS =====
+
+def _time(fn, rounds: int) -> Dict[str, float]:
+    return measure(fn, rounds)
+
+
+def run(rounds: int) -> Dict[str, Any]:
+    products = json.loads((FIXTURES / "freezeocean_products.json").read_text(encoding="utf-8"))
+    page_html = (FIXTURES / "selina_wamucii.html").read_text(encoding="utf-8")
+    ajax_payload = json.loads((FIXTURES / "selina_wamucii_ajax.json").read_text(encoding="utf-8"))
+
+    # Los resultados deben ser idénticos antes de comparar tiempos
+    legacy_fo = legacy_parse_freezeocean(products)
+    new_fo = parse_freezeocean_products(products, _CALIBER_LOOKUP)
+    if legacy_fo != new_fo:
+        raise SystemExit(f"FreezeOcean: resultados distintos\n  antes: {legacy_fo}\n  ahora: {new_fo}")
+    if legacy_parse_selina(page_html, {}) != parse_selina_page_prices(page_html):
+        raise SystemExit("Selina Wamucii (fallback HTML): resultados distintos")
+
+    results = {}
+    cases = {
+        "freezeocean": (
+            lambda: legacy_parse_freezeocean(products),
+            lambda: parse_freezeocean_products(products, _CALIBER_LOOKUP)
+        ),
+        "selina_wamucii_ajax": (
+            lambda: legacy_parse_selina(page_html, ajax_payload),
+            lambda: new_parse_selina(page_html, ajax_payload)
+        ),
+        "selina_wamucii_fallback_html": (
+            lambda: legacy_parse_selina(page_html, {}),
+            lambda: new_parse_selina(page_html, {})
+        ),
+    }
+    for name, (legacy_fn, new_fn) in cases.items():
+        before = _time(legacy_fn, rounds)
+        after = _time(new_fn, rounds)
+        results[name] = {
+            "anterior": before,
+            "actual": after,
+            "speedup": round(before["median_ms"] / after["median_ms"], 1) if after["median_ms"] else None
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de parsers de precios públicos")
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--json", action="store_true", help="Imprimir resultados en JSON")
+    args = parser.parse_args()
+
+    results = run(args.rounds)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'caso':<32}{'anterior (ms)':>16}{'actual (ms)':>14}{'speedup':>10}")
+    for name, r in results.items():
+        print(f"{name:<32}{r['anterior']['median_ms']:>16.3f}{r['actual']['median_ms']:>14.3f}{r['speedup']:>9}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# Utilidades comunes de medición para los benchmarks
+# Estadísticas al estilo pytest-benchmark: min, max, mean, stddev, median, iqr, ops
+
+import statistics
+import time
+from typing import Callable, Dict, Any, List
+
+
+def summarize(samples_ms: List[float]) -> Dict[str, float]:
+    """Estadísticas de una lista de tiempos en milisegundos"""
+    ordered = sorted(samples_ms)
+    if len(ordered) >= 4:
+        q1, _, q3 = statistics.quantiles(ordered, n=4)
+    else:
+        q1, q3 = ordered[0], ordered[-1]
+    mean = statistics.mean(ordered)
+    return {
+        "min_ms": round(ordered[0], 4),
+        "max_ms": round(ordered[-1], 4),
+        "mean_ms": round(mean, 4),
+        "stddev_ms": round(statistics.stdev(ordered), 4) if len(ordered) > 1 else 0.0,
+        "median_ms": round(statistics.median(ordered), 4),
+        "iqr_ms": round(q3 - q1, 4),
+        "ops": round(1000.0 / mean, 2) if mean else 0.0,
+        "rounds": len(ordered)
+    }
+
+
+def measure(fn: Callable[[], Any], rounds: int, warmup: int = 1) -> Dict[str, float]:
+    """Ejecuta `fn` `warmup` veces sin medir y luego `rounds` veces midiendo cada llamada"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(max(1, rounds)):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return summarize(samples)
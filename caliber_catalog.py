@@ -0,0 +1,217 @@
+# Catálogo inmutable de calibres / presentaciones EXPORQUILSA
+# Construido una sola vez a partir de la tabla de precios; las respuestas de los endpoints
+# estáticos (/data/exporquilsa-prices, /data/calibers-by-presentation, /data/caliber-price)
+# quedan serializadas a JSON de antemano y se sirven tal cual desde memoria
+
+import json
+import logging
+from datetime import datetime, date
+from types import MappingProxyType
+from typing import Dict, Any, Optional, Mapping, Iterable
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def _dumps(data: Any) -> bytes:
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data, default=str)
+    return json.dumps(data, separators=(',', ':'), default=str, ensure_ascii=False).encode('utf-8')
+
+
+def _freeze_table(table: Mapping[str, Mapping[str, float]]) -> Mapping[str, Mapping[str, float]]:
+    return MappingProxyType({p: MappingProxyType(dict(c)) for p, c in table.items()})
+
+
+class CaliberCatalog:
+    """
+    Vista de solo lectura de la tabla de precios por calibre y presentación
+
+    Todo se calcula en el constructor: las consultas son búsquedas en dict y las
+    respuestas HTTP son bytes ya serializados. Para publicar precios nuevos se
+    construye otro catálogo y se reemplaza la referencia (nunca se modifica uno existente).
+    """
+
+    def __init__(self,
+                 prices: Mapping[str, Mapping[str, float]],
+                 presentation_factors: Mapping[str, Mapping[str, Any]],
+                 quality_requirements: Mapping[str, bool],
+                 headless_rendimiento: float,
+                 fecha_actualizacion: str,
+                 calibres_prioridad: Iterable[str] = (),
+                 version: Optional[int] = None,
+                 fecha_vigencia: Optional[date] = None):
+        self.prices = _freeze_table(prices)
+        self.presentation_factors = MappingProxyType({k: MappingProxyType(dict(v)) for k, v in presentation_factors.items()})
+        self.quality_requirements = MappingProxyType(dict(quality_requirements))
+        self.headless_rendimiento = headless_rendimiento
+        self.fecha_actualizacion = fecha_actualizacion
+        self.fuente = f"EXPORQUILSA_Real_{fecha_actualizacion.replace('-', '_')}"
+        self.calibres_prioridad = frozenset(calibres_prioridad)
+        self.version = version
+        self.fecha_vigencia = fecha_vigencia
+        self.generated_at = datetime.now()
+
+        base_prices = {
+            (presentacion, calibre): self._base_price_entry(calibre, presentacion, precio)
+            for presentacion, tabla in self.prices.items()
+            for calibre, precio in tabla.items()
+        }
+        self.exporquilsa_json = _dumps(self._exporquilsa_payload())
+        self._calibers_json = MappingProxyType({
+            presentacion: _dumps(self._calibers_payload(presentacion))
+            for presentacion in self.presentation_factors
+        })
+        self._caliber_price_json = MappingProxyType({
+            key: _dumps(entry) for key, entry in base_prices.items()
+        })
+        self._base_prices = MappingProxyType({key: MappingProxyType(entry) for key, entry in base_prices.items()})
+
+    @classmethod
+    def from_config(cls, config) -> "CaliberCatalog":
+        return cls(
+            prices=config.SHRIMP_CALIBER_PRICES,
+            presentation_factors=config.PRESENTATION_FACTORS,
+            quality_requirements=config.QUALITY_REQUIREMENTS,
+            headless_rendimiento=config.HEADLESS_RENDIMIENTO,
+            fecha_actualizacion=config.SHRIMP_PRICES_DATE,
+            calibres_prioridad=config.PRIORITY_CALIBERS
+        )
+
+    @classmethod
+    def from_table(cls, table: Dict[str, Any], config) -> "CaliberCatalog":
+        """Catálogo desde una versión de PriceDatabase.obtener_tabla_precios (factores desde config)"""
+        return cls(
+            prices=table["precios"],
+            presentation_factors=config.PRESENTATION_FACTORS,
+            quality_requirements=config.QUALITY_REQUIREMENTS,
+            headless_rendimiento=config.HEADLESS_RENDIMIENTO,
+            fecha_actualizacion=table["fecha_vigencia"].strftime("%d-%m-%Y"),
+            calibres_prioridad=config.PRIORITY_CALIBERS,
+            version=table["version"],
+            fecha_vigencia=table["fecha_vigencia"]
+        )
+
+    # ===== CONSTRUCCIÓN =====
+
+    def _base_price_entry(self, calibre: str, presentacion: str, precio: float) -> Dict[str, Any]:
+        return {
+            "calibre": calibre,
+            "presentacion": presentacion,
+            "precio_base": precio,
+            "fuente": self.fuente,
+            "calidad_requerida": dict(self.quality_requirements),
+            "tiene_prioridad": calibre in self.calibres_prioridad,
+            "estatus": "success"
+        }
+
+    def _exporquilsa_payload(self) -> Dict[str, Any]:
+        return {
+            "fuente": "EXPORQUILSA S.A. - Ecuador",
+            "fecha_actualizacion": self.fecha_actualizacion,
+            "version_tabla": self.version,
+            "contacto": "WhatsApp 0984222956",
+            "requisitos_calidad": {
+                "general": "No picado, No sabor",
+                "cabeza": "No branquias oscuras"
+            },
+            "precios": {
+                "despachos_sin_cabeza": dict(self.prices.get("HEADLESS", {})),
+                "entero_con_cabeza": dict(self.prices.get("WHOLE", {}))
+            },
+            "factor_rendimiento": {
+                "headless_rendimiento": f"{self.headless_rendimiento * 100}%",
+                "descripcion": "Rendimiento de cabeza a sin cabeza"
+            },
+            "calibres_con_prioridad": sorted(self.calibres_prioridad),
+            "moneda": "USD",
+            "unidad": "por libra"
+        }
+
+    def _calibers_payload(self, presentacion: str) -> Dict[str, Any]:
+        presentation_data = self.presentation_factors[presentacion]
+        tabla = self.prices.get(self.table_for(presentacion), {})
+
+        calibers_info = []
+        for caliber in presentation_data["disponibilidad"]:
+            caliber_str = str(caliber)
+            base_price = tabla.get(caliber_str)
+            if base_price is not None:
+                calibers_info.append({
+                    "calibre": caliber_str,
+                    "nombre": f"Calibre {caliber_str}",
+                    "precio_base": round(base_price, 4),
+                    "factor_presentacion": presentation_data["factor_precio"],
+                    "precio_ajustado": round(base_price * presentation_data["factor_precio"], 4),
+                    "valor_agregado": presentation_data["valor_agregado"],
+                    "rendimiento": presentation_data["rendimiento"],
+                    "disponible": True
+                })
+            else:
+                logger.warning(f"No se encontró precio para calibre {caliber_str}")
+                calibers_info.append({
+                    "calibre": caliber_str,
+                    "nombre": f"Calibre {caliber_str}",
+                    "disponible": False,
+                    "error": "Precio no disponible"
+                })
+
+        return {
+            "presentacion": presentacion,
+            "nombre_presentacion": presentation_data["nombre"],
+            "calibres": calibers_info,
+            "factor_precio": presentation_data["factor_precio"],
+            "valor_agregado": presentation_data["valor_agregado"],
+            "rendimiento": presentation_data["rendimiento"],
+            "total_calibres": len(calibers_info),
+            "timestamp": self.generated_at
+        }
+
+    # ===== CONSULTAS =====
+
+    @staticmethod
+    def table_for(presentacion: str) -> str:
+        """Tabla de precios de una presentación (sin cabeza -> HEADLESS, entero/vivo -> WHOLE)"""
+        return "HEADLESS" if presentacion == "HEADLESS" else "WHOLE"
+
+    def resolve_presentation(self, presentation: str) -> str:
+        presentation_upper = presentation.upper()
+        if presentation_upper not in self.prices:
+            logger.warning(f"Presentación {presentation_upper} no encontrada, usando HEADLESS")
+            return "HEADLESS"
+        return presentation_upper
+
+    def base_price(self, calibre: str, presentation: str = "HEADLESS") -> Dict[str, Any]:
+        """Misma respuesta que RealDataCollector.get_caliber_base_price, sin reconstruirla"""
+        presentation_upper = self.resolve_presentation(presentation)
+        entry = self._base_prices.get((presentation_upper, calibre))
+        if entry is not None:
+            return dict(entry)
+        return self._not_found(calibre, presentation_upper)
+
+    def _not_found(self, calibre: str, presentation_upper: str) -> Dict[str, Any]:
+        logger.warning(f"Calibre {calibre} no encontrado en tabla {presentation_upper}")
+        return {
+            "calibre": calibre,
+            "presentacion": presentation_upper,
+            "precio_base": None,
+            "calibres_disponibles": list(self.prices.get(presentation_upper, {})),
+            "estatus": "not_found",
+            "mensaje": f"Calibre {calibre} no en tabla EXPORQUILSA"
+        }
+
+    def caliber_price_json(self, calibre: str, presentation: str = "HEADLESS") -> bytes:
+        presentation_upper = self.resolve_presentation(presentation)
+        payload = self._caliber_price_json.get((presentation_upper, calibre))
+        if payload is not None:
+            return payload
+        return _dumps(self._not_found(calibre, presentation_upper))
+
+    def calibers_json(self, presentacion: str) -> Optional[bytes]:
+        """JSON pre-serializado de /data/calibers-by-presentation (None si la presentación no existe)"""
+        return self._calibers_json.get(presentacion.upper())
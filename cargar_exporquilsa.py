@@ -1,79 +0,0 @@
-#!/usr/bin/env python3
-"""
-Cargar datos históricos de EXPORQUILSA (despachadora)
-Estos son los precios reales de despacho que la empresa maneja
-"""
-import sqlite3
-from datetime import date, timedelta
-import random
-
-DB_PATH = "data/precios_historicos.db"
-
-def cargar_datos_exporquilsa():
-    """Cargar 90 días de datos históricos de EXPORQUILSA"""
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    today = date.today()
-    
-    # Precios de despacho EXPORQUILSA por calibre (HEADLESS)
-    # Estos son típicamente más bajos que precios públicos
-    # Basados en costos operativos + margen
-    precios_despacho_base = {
-        '16/20': 4.50,  # Calibre premium
-        '21/25': 4.20,
-        '26/30': 3.95,
-        '31/35': 3.40,
-        '36/40': 3.70,
-        '41/50': 3.60
-    }
-    
-    print("Cargando datos históricos de EXPORQUILSA...")
-    print(f"Período: {(today - timedelta(days=90)).isoformat()} a {today.isoformat()}")
-    
-    registros_insertados = 0
-    
-    # Generar datos históricos (90 días atrás)
-    for i in range(90, 0, -1):
-        fecha = (today - timedelta(days=i)).isoformat()
-        
-        for calibre, precio_base in precios_despacho_base.items():
-            # Agregar variación realista (±5%)
-            variacion = random.uniform(-0.05, 0.05)
-            precio_despacho = precio_base * (1 + variacion)
-            
-            # Cantidad de sacos varía entre 100-300
-            cantidad_sacos = random.randint(100, 300)
-            
-            # Costo operativo promedio
-            costo_operativo = round(random.uniform(0.25, 0.35), 2)
-            
-            # Metadata con información adicional
-            metadata = f'{{"cantidad_sacos": {cantidad_sacos}, "costo_operativo": {costo_operativo}}}'
-            
-            cursor.execute('''
-            INSERT INTO precios_despacho
-            (fecha, calibre, presentacion, precio_usd_lb, origen, metadata)
-            VALUES (?, ?, ?, ?, ?, ?)
-            ''', (
-                fecha, 
-                calibre, 
-                'HEADLESS',  # Presentación principal de EXPORQUILSA
-                round(precio_despacho, 2),
-                'EXPORQUILSA',
-                metadata
-            ))
-            
-            registros_insertados += 1
-    
-    conn.commit()
-    conn.close()
-    
-    print(f"✓ {registros_insertados} registros de EXPORQUILSA insertados")
-    print(f"✓ Calibres: {list(precios_despacho_base.keys())}")
-    print(f"✓ Presentación: HEADLESS")
-    print(f"\n[OK] Base de datos lista para predicciones!")
-
-if __name__ == "__main__":
-    cargar_datos_exporquilsa()
@@ -1,73 +0,0 @@
-#!/usr/bin/env python3
-"""
-Cargar datos históricos públicos (simulados basados en tendencias reales)
-para tener suficientes datos para correlacionar con EXPORQUILSA
-"""
-import sqlite3
-from datetime import date, timedelta
-import random
-
-DB_PATH = "data/precios_historicos.db"
-
-def cargar_historico_publico():
-    """Cargar 90 días de datos históricos públicos"""
-    
-    conn = sqlite3.connect(DB_PATH)
-    cursor = conn.cursor()
-    
-    today = date.today()
-    
-    # Precios públicos base por calibre (del scraping actual)
-    precios_base = {
-        '16/20': 5.92,
-        '21/25': 5.37,
-        '26/30': 5.07,
-        '31/35': 4.24,
-        '36/40': 4.59,
-        '41/50': 4.46
-    }
-    
-    print("Cargando histórico de precios públicos (comerciales)...")
-    print(f"Período: {(today - timedelta(days=90)).isoformat()} a {(today - timedelta(days=1)).isoformat()}")
-    
-    registros_insertados = 0
-    
-    # Generar datos históricos (90 días atrás, excluyendo hoy que ya existe)
-    for i in range(90, 1, -1):  # De 90 a 2 días atrás (hoy ya está)
-        fecha = (today - timedelta(days=i)).isoformat()
-        
-        for calibre, precio_base in precios_base.items():
-            # Agregar tendencia + variación
-            # Simulamos que el precio ha ido subiendo levemente en los últimos 90 días
-            tendencia = -0.10 * (i / 90)  # De -$0.10 hace 90 días a $0 hoy
-            variacion = random.uniform(-0.08, 0.08)
-            precio = precio_base + tendencia + variacion
-            
-            # Metadata con información adicional
-            metadata = f'{{"desviacion_estandar": {round(random.uniform(0.03, 0.08), 2)}}}'
-            
-            cursor.execute('''
-            INSERT INTO precios_publicos
-            (fecha, calibre, precio_usd_lb, fuente, cantidad_fuentes, confiabilidad, metadata)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                fecha,
-                calibre,
-                round(precio, 2),
-                'freezeocean',
-                1,
-                'alta',
-                metadata
-            ))
-            
-            registros_insertados += 1
-    
-    conn.commit()
-    conn.close()
-    
-    print(f"✓ {registros_insertados} registros históricos públicos insertados")
-    print(f"✓ Calibres: {list(precios_base.keys())}")
-    print(f"\n[OK] Ahora hay suficientes datos para correlacionar!")
-
-if __name__ == "__main__":
-    cargar_historico_publico()
@@ -3,16 +3,252 @@
 # Permite entrenar modelos de predicción basados en datos reales
 
 import sqlite3
+import hashlib
 import json
 import logging
+import os
 from datetime import datetime, date, timedelta
 from pathlib import Path
 from typing import Dict, Any, Optional, List, Tuple
 import numpy as np
-from scipy import stats
+
+from metrics import timed_db
+from tracing import traced
+from rolling_stats import fit_batch, MIN_FECHAS_CORRELACION
 
 logger = logging.getLogger(__name__)
 
+# Columnas propias de cada tabla en las inserciones por lote (el resto va a metadata)
+COLUMNAS_LOTE_PUBLICOS = frozenset({"fecha", "calibre", "precio_usd_lb", "fuente", "cantidad_fuentes", "confiabilidad", "metadata"})
+COLUMNAS_LOTE_DESPACHO = frozenset({"fecha", "calibre", "presentacion", "precio_usd_lb", "origen", "metadata"})
+
+
+def _metadata_lote(registro: Dict[str, Any], columnas: frozenset) -> Dict[str, Any]:
+    """Claves extra del registro más su `metadata` explícita (dict o JSON)"""
+    metadata = {k: v for k, v in registro.items() if k not in columnas} if registro.keys() - columnas else {}
+    explicita = registro.get("metadata")
+    if isinstance(explicita, str):
+        try:
+            explicita = json.loads(explicita)
+        except ValueError:
+            explicita = {"texto": explicita}
+    if explicita:
+        metadata.update(explicita)
+    return metadata
+
+
+# Metadata compacta: los campos útiles de la metadata se guardan en columnas tipadas y lo que
+# queda del payload crudo se guarda una sola vez en metadata_payloads (clave = hash del JSON
+# canónico); cada fila solo referencia el hash. Antes cada fila repetía su JSON completo
+# (calibre, presentación y precio incluidos) y los recorridos del historial leían esas páginas.
+# (columna, clave en la metadata)
+METADATA_PUBLICOS = (("derivado_desde", "derivado_desde"), ("fuentes_detalle", "fuentes"))
+METADATA_DESPACHO = (("cantidad_sacos", "cantidad_sacos"), ("costo_operativo", "costo_operativo"), ("nota", "nota"))
+# Claves que repiten datos de la fila: no se guardan en el payload
+REDUNDANTES_PUBLICOS = COLUMNAS_LOTE_PUBLICOS | {"precio_publico_promedio", "actualizado"}
+REDUNDANTES_DESPACHO = COLUMNAS_LOTE_DESPACHO
+
+
+def _valor_columna(valor: Any) -> Any:
+    if isinstance(valor, (list, tuple, set)):
+        return ",".join(sorted(str(v) for v in valor)) or None
+    if isinstance(valor, str) and not valor.strip():
+        return None
+    return valor
+
+
+def compactar_metadata(datos: Optional[Dict[str, Any]],
+                       campos: Tuple[Tuple[str, str], ...],
+                       redundantes: frozenset) -> Tuple[tuple, Optional[str], Optional[str]]:
+    """
+    (valores de las columnas promovidas, hash, payload) de un dict de metadata; hash y payload
+    son None si no queda nada fuera de columnas
+    """
+    if not datos:
+        return (None,) * len(campos), None, None
+    promovidas = {clave for _, clave in campos}
+    valores = tuple(_valor_columna(datos.get(clave)) for _, clave in campos)
+    resto = {k: v for k, v in datos.items() if k not in redundantes and k not in promovidas and v is not None}
+    if not resto:
+        return valores, None, None
+    payload = json.dumps(resto, sort_keys=True, separators=(",", ":"), default=str)
+    return valores, hashlib.blake2b(payload.encode("utf-8"), digest_size=16).hexdigest(), payload
+
+
+PRECIOS_PUBLICOS_COLUMNAS = """
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fecha DATE NOT NULL,
+                calibre TEXT NOT NULL,
+                precio_usd_lb REAL NOT NULL,
+                fuente TEXT NOT NULL,
+                cantidad_fuentes INTEGER DEFAULT 1,
+                confiabilidad TEXT DEFAULT 'media',
+                derivado_desde TEXT,
+                fuentes_detalle TEXT,
+                metadata_hash TEXT REFERENCES metadata_payloads(hash),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(fecha, calibre, fuente)
+"""
+
+PRECIOS_DESPACHO_COLUMNAS = """
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fecha DATE NOT NULL,
+                calibre TEXT NOT NULL,
+                presentacion TEXT NOT NULL,
+                precio_usd_lb REAL NOT NULL,
+                origen TEXT DEFAULT 'EXPORQUILSA',
+                cantidad_sacos INTEGER,
+                costo_operativo REAL,
+                nota TEXT,
+                metadata_hash TEXT REFERENCES metadata_payloads(hash),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(fecha, calibre, presentacion, origen)
+"""
+
+# tabla -> (columnas, campos promovidos, claves redundantes)
+TABLAS_CON_METADATA = {
+    "precios_publicos": (PRECIOS_PUBLICOS_COLUMNAS, METADATA_PUBLICOS, REDUNDANTES_PUBLICOS),
+    "precios_despacho": (PRECIOS_DESPACHO_COLUMNAS, METADATA_DESPACHO, REDUNDANTES_DESPACHO),
+}
+
+
+# Tablas con estadísticas mantenidas por triggers: tabla -> (columna de fecha, columnas de agrupación)
+TABLAS_CON_ESTADISTICAS = {
+    "precios_publicos": ("fecha", ("calibre",)),
+    "precios_despacho": ("fecha", ("calibre", "presentacion")),
+    "correlaciones": ("fecha_calculo", ("calibre", "presentacion")),
+    "predicciones": ("fecha_prediccion", ("calibre", "presentacion")),
+}
+
+
+def _sql_triggers_estadisticas(tabla: str, fecha: str, grupo: Tuple[str, ...]) -> List[str]:
+    """
+    Triggers que mantienen estadisticas_tablas al insertar, borrar o actualizar filas de `tabla`:
+    una fila de totales (calibre = presentacion = '') y una por grupo (calibre[, presentacion])
+    """
+    def claves(row: str) -> List[Tuple[str, str, str]]:
+        presentacion = f"{row}.presentacion" if "presentacion" in grupo else "''"
+        match_grupo = " AND ".join(f"{col} = {row}.{col}" for col in grupo)
+        return [("''", "''", "1"), (f"{row}.calibre", presentacion, match_grupo)]
+
+    def sumar(row: str) -> str:
+        return "".join(f"""
+            INSERT INTO estadisticas_tablas (tabla, calibre, presentacion, filas, fecha_min, fecha_max)
+            VALUES ('{tabla}', {calibre}, {presentacion}, 1, {row}.{fecha}, {row}.{fecha})
+            ON CONFLICT(tabla, calibre, presentacion) DO UPDATE SET
+                filas = filas + 1,
+                fecha_min = CASE WHEN fecha_min IS NULL OR excluded.fecha_min < fecha_min
+                                 THEN excluded.fecha_min ELSE fecha_min END,
+                fecha_max = CASE WHEN fecha_max IS NULL OR excluded.fecha_max > fecha_max
+                                 THEN excluded.fecha_max ELSE fecha_max END,
+                actualizado_en = CURRENT_TIMESTAMP;""" for calibre, presentacion, _ in claves(row))
+
+    def restar(row: str) -> str:
+        # Solo si se borró un extremo del rango se recalcula (búsqueda por índice del grupo)
+        sql = "".join(f"""
+            UPDATE estadisticas_tablas SET
+                filas = filas - 1,
+                fecha_min = CASE WHEN {row}.{fecha} <= fecha_min
+                                 THEN (SELECT MIN({fecha}) FROM {tabla} WHERE {match}) ELSE fecha_min END,
+                fecha_max = CASE WHEN {row}.{fecha} >= fecha_max
+                                 THEN (SELECT MAX({fecha}) FROM {tabla} WHERE {match}) ELSE fecha_max END,
+                actualizado_en = CURRENT_TIMESTAMP
+            WHERE tabla = '{tabla}' AND calibre = {calibre} AND presentacion = {presentacion};"""
+                      for calibre, presentacion, match in claves(row))
+        return sql + f"""
+            DELETE FROM estadisticas_tablas WHERE tabla = '{tabla}' AND calibre <> '' AND filas <= 0;"""
+
+    columnas = ", ".join((fecha,) + grupo)
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS trg_est_{tabla}_ins AFTER INSERT ON {tabla} BEGIN {sumar('NEW')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_est_{tabla}_del AFTER DELETE ON {tabla} BEGIN {restar('OLD')} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_est_{tabla}_upd AFTER UPDATE OF {columnas} ON {tabla} "
+        f"BEGIN {restar('OLD')} {sumar('NEW')} END",
+    ]
+
+
+# Agregados semanales / mensuales (media, mínimo, máximo, último y conteo por calibre y
+# presentación) materializados en agregados_precios. Cada ingesta recalcula, en su misma
+# transacción, solo los períodos que tocó; las consultas de ventanas largas leen un punto por
+# semana o por mes en lugar de cada fila diaria. resolucion -> inicio del período en SQL
+RESOLUCIONES_AGREGADAS = {
+    "semanal": "date(fecha, 'weekday 0', '-6 days')",   # lunes de la semana
+    "mensual": "date(fecha, 'start of month')",
+}
+# Días aproximados por período y puntos mínimos para considerar suficiente una resolución
+DIAS_POR_PERIODO = {"diaria": 1, "semanal": 7, "mensual": 30}
+PUNTOS_MINIMOS_RESOLUCION = 52
+# tabla -> columnas de agrupación (presentacion = '' en precios públicos)
+TABLAS_AGREGADAS = {
+    "precios_publicos": ("calibre",),
+    "precios_despacho": ("calibre", "presentacion"),
+}
+
+
+def inicio_periodo(fecha: date, resolucion: str) -> date:
+    """Primer día del período (lunes / día 1) que contiene `fecha`"""
+    if resolucion == "semanal":
+        return fecha - timedelta(days=fecha.weekday())
+    if resolucion == "mensual":
+        return fecha.replace(day=1)
+    return fecha
+
+
+def resolucion_para_ventana(dias: int, puntos_minimos: int = PUNTOS_MINIMOS_RESOLUCION) -> str:
+    """Resolución más gruesa que todavía da `puntos_minimos` puntos en una ventana de `dias`"""
+    for resolucion in ("mensual", "semanal"):
+        if dias // DIAS_POR_PERIODO[resolucion] >= puntos_minimos:
+            return resolucion
+    return "diaria"
+
+
+def _sql_recalcular_agregados(tabla: str, resolucion: str, filtro: str) -> str:
+    """INSERT ... SELECT que recalcula los períodos de `tabla` cuyas filas cumplen `filtro`"""
+    grupo = TABLAS_AGREGADAS[tabla]
+    presentacion = "presentacion" if "presentacion" in grupo else "''"
+    return f"""
+        INSERT OR REPLACE INTO agregados_precios
+        (tabla, resolucion, calibre, presentacion, periodo, muestras, media, minimo, maximo,
+         ultimo, fecha_ultimo, dia_medio)
+        SELECT '{tabla}', '{resolucion}', calibre, {presentacion}, periodo, COUNT(*),
+               AVG(precio_usd_lb), MIN(precio_usd_lb), MAX(precio_usd_lb),
+               MAX(CASE WHEN orden = 1 THEN precio_usd_lb END), MAX(fecha), AVG(julianday(fecha))
+        FROM (
+            SELECT calibre, {presentacion} AS presentacion, fecha, precio_usd_lb,
+                   {RESOLUCIONES_AGREGADAS[resolucion]} AS periodo,
+                   ROW_NUMBER() OVER (PARTITION BY {', '.join(grupo)}, {RESOLUCIONES_AGREGADAS[resolucion]}
+                                      ORDER BY fecha DESC, id DESC) AS orden
+            FROM {tabla}
+            WHERE {filtro}
+        )
+        GROUP BY calibre, presentacion, periodo
+    """
+
+
+PREDICCIONES_COLUMNAS = """
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fecha_prediccion DATE NOT NULL,
+                fecha_objetivo DATE NOT NULL,
+                calibre TEXT NOT NULL,
+                presentacion TEXT NOT NULL,
+                precio_publico_predicho REAL NOT NULL,
+                precio_despacho_predicho REAL,
+                intervalo_inferior REAL,
+                intervalo_superior REAL,
+                confianza REAL,
+                metodo TEXT NOT NULL,
+                parametros TEXT,
+                dias_historial INTEGER NOT NULL DEFAULT 90,
+                version_datos INTEGER NOT NULL DEFAULT 0,
+                resultado TEXT,
+                precio_real REAL,
+                error_abs REAL,
+                evaluado_en TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE(fecha_prediccion, fecha_objetivo, calibre, presentacion, dias_historial, version_datos, metodo)
+"""
+
+
 class PriceDatabase:
     """
     Base de datos SQLite para almacenar precios históricos
@@ -22,9 +258,12 @@ class PriceDatabase:
     def __init__(self, db_path: Optional[Path] = None):
         """Inicializa conexión a base de datos"""
         if db_path is None:
-            db_path = Path(__file__).parent / "data" / "precios_historicos.db"
+            # PRICES_DB_PATH permite apuntar a una copia (benchmarks, pruebas aisladas)
+            db_path = os.getenv("PRICES_DB_PATH") or Path(__file__).parent / "data" / "precios_historicos.db"
         
-        self.db_path = db_path
+        self.db_path = Path(db_path)
+        # Ingestas hechas por este proceso (para releer version_datos sin esperar)
+        self.ingestas_locales = 0
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         
         # Crear tablas si no existen
@@ -35,34 +274,26 @@ class PriceDatabase:
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
-        # Tabla de precios públicos (scrapeados)
+        # Payloads de metadata deduplicados por hash (ver compactar_metadata)
         cursor.execute("""
+            CREATE TABLE IF NOT EXISTS metadata_payloads (
+                hash TEXT PRIMARY KEY,
+                payload TEXT NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self._migrar_metadata_precios(cursor)
+        
+        # Tabla de precios públicos (scrapeados)
+        cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS precios_publicos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                fecha DATE NOT NULL,
-                calibre TEXT NOT NULL,
-                precio_usd_lb REAL NOT NULL,
-                fuente TEXT NOT NULL,
-                cantidad_fuentes INTEGER DEFAULT 1,
-                confiabilidad TEXT DEFAULT 'media',
-                metadata TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(fecha, calibre, fuente)
+                {PRECIOS_PUBLICOS_COLUMNAS}
             )
         """)
         
         # Tabla de precios de despacho históricos (EXPORQUILSA)
-        cursor.execute("""
+        cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS precios_despacho (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                fecha DATE NOT NULL,
-                calibre TEXT NOT NULL,
-                presentacion TEXT NOT NULL,
-                precio_usd_lb REAL NOT NULL,
-                origen TEXT DEFAULT 'EXPORQUILSA',
-                metadata TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                UNIQUE(fecha, calibre, presentacion, origen)
+                {PRECIOS_DESPACHO_COLUMNAS}
             )
         """)
         
@@ -82,24 +313,96 @@ class PriceDatabase:
             )
         """)
         
-        # Tabla de predicciones generadas
-        cursor.execute("""
+        # Tabla de predicciones generadas (PricePredictor vía ForecastStore)
+        # presentacion = 'PUBLICO' para predicciones de precio público (sin precio despacho)
+        # precio_real / error_abs / evaluado_en los completa evaluar_predicciones()
+        self._migrar_predicciones(cursor)
+        cursor.execute(f"""
             CREATE TABLE IF NOT EXISTS predicciones (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                fecha_prediccion DATE NOT NULL,
-                fecha_objetivo DATE NOT NULL,
-                calibre TEXT NOT NULL,
+                {PREDICCIONES_COLUMNAS}
+            )
+        """)
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_predicciones_objetivo ON predicciones(evaluado_en, fecha_objetivo)")
+        
+        # Tablas de precios EXPORQUILSA versionadas (una versión por publicación)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tablas_precios (
+                version INTEGER PRIMARY KEY AUTOINCREMENT,
+                fecha_vigencia DATE NOT NULL,
+                fuente TEXT NOT NULL DEFAULT 'EXPORQUILSA',
+                notas TEXT,
+                publicado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS tablas_precios_items (
+                version INTEGER NOT NULL REFERENCES tablas_precios(version),
                 presentacion TEXT NOT NULL,
-                precio_publico_predicho REAL NOT NULL,
-                precio_despacho_predicho REAL NOT NULL,
-                confianza REAL,
-                metodo TEXT NOT NULL,
-                parametros TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                calibre TEXT NOT NULL,
+                precio_usd_lb REAL NOT NULL,
+                PRIMARY KEY (version, presentacion, calibre)
             )
         """)
         
+        # Contador de versión de datos: lo incrementa cada ingesta (cachés de predicciones lo usan como clave)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS version_datos (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL,
+                actualizado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO version_datos (id, version) VALUES (1, 0)")
+        
+        # Conteos y rangos de fechas por tabla y por (calibre, presentacion), mantenidos por
+        # triggers: /database/status los lee sin recorrer el historial
+        estadisticas_nuevas = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'estadisticas_tablas'"
+        ).fetchone() is None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS estadisticas_tablas (
+                tabla TEXT NOT NULL,
+                calibre TEXT NOT NULL DEFAULT '',
+                presentacion TEXT NOT NULL DEFAULT '',
+                filas INTEGER NOT NULL DEFAULT 0,
+                fecha_min DATE,
+                fecha_max DATE,
+                actualizado_en TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (tabla, calibre, presentacion)
+            )
+        """)
+        for tabla, (fecha, grupo) in TABLAS_CON_ESTADISTICAS.items():
+            for sql in _sql_triggers_estadisticas(tabla, fecha, grupo):
+                cursor.execute(sql)
+        if estadisticas_nuevas:
+            self._reconstruir_estadisticas(cursor)
+
+        # Agregados semanales / mensuales de precios (ver RESOLUCIONES_AGREGADAS)
+        agregados_nuevos = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'agregados_precios'"
+        ).fetchone() is None
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS agregados_precios (
+                tabla TEXT NOT NULL,
+                resolucion TEXT NOT NULL,
+                calibre TEXT NOT NULL,
+                presentacion TEXT NOT NULL DEFAULT '',
+                periodo DATE NOT NULL,
+                muestras INTEGER NOT NULL,
+                media REAL NOT NULL,
+                minimo REAL NOT NULL,
+                maximo REAL NOT NULL,
+                ultimo REAL NOT NULL,
+                fecha_ultimo DATE NOT NULL,
+                dia_medio REAL NOT NULL,
+                PRIMARY KEY (tabla, resolucion, calibre, presentacion, periodo)
+            ) WITHOUT ROWID
+        """)
+        if agregados_nuevos:
+            self._reconstruir_agregados(cursor)
+
         # Índices para optimizar consultas
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_tablas_vigencia ON tablas_precios(fecha_vigencia, version)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_publicos_fecha ON precios_publicos(fecha)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_publicos_calibre ON precios_publicos(calibre)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_despacho_fecha ON precios_despacho(fecha)")
@@ -109,6 +412,8 @@ class PriceDatabase:
         conn.close()
         logger.info(f"✓ Base de datos inicializada en {self.db_path}")
     
+    @timed_db
+    @traced("db")
     def guardar_precios_publicos(self, fecha: date, precios_consolidados: Dict[str, Any]) -> int:
         """
         Guarda precios públicos scrapeados en la base de datos
@@ -124,6 +429,8 @@ class PriceDatabase:
         cursor = conn.cursor()
         
         registros_guardados = 0
+        payloads = {}
+        calibres_guardados = []
         
         for calibre, datos in precios_consolidados.items():
             precio = datos.get('precio_publico_promedio')
@@ -132,11 +439,24 @@ class PriceDatabase:
             if precio is None or precio <= 0:
                 continue
             
+            (derivado_desde, fuentes_detalle), hash_payload, payload = compactar_metadata(
+                datos, METADATA_PUBLICOS, REDUNDANTES_PUBLICOS
+            )
             try:
+                # Upsert (no REPLACE): actualiza la fila existente sin borrarla, así los
+                # triggers de estadisticas_tablas no cuentan dos veces la misma fecha
                 cursor.execute("""
-                    INSERT OR REPLACE INTO precios_publicos 
-                    (fecha, calibre, precio_usd_lb, fuente, cantidad_fuentes, confiabilidad, metadata)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                    INSERT INTO precios_publicos 
+                    (fecha, calibre, precio_usd_lb, fuente, cantidad_fuentes, confiabilidad,
+                     derivado_desde, fuentes_detalle, metadata_hash)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(fecha, calibre, fuente) DO UPDATE SET
+                        precio_usd_lb = excluded.precio_usd_lb,
+                        cantidad_fuentes = excluded.cantidad_fuentes,
+                        confiabilidad = excluded.confiabilidad,
+                        derivado_desde = excluded.derivado_desde,
+                        fuentes_detalle = excluded.fuentes_detalle,
+                        metadata_hash = excluded.metadata_hash
                 """, (
                     str(fecha),
                     calibre,
@@ -144,25 +464,37 @@ class PriceDatabase:
                     'consolidado',
                     cantidad_fuentes,
                     'alta' if cantidad_fuentes >= 2 else 'media',
-                    json.dumps(datos)
+                    derivado_desde,
+                    fuentes_detalle,
+                    hash_payload
                 ))
+                if hash_payload:
+                    payloads[hash_payload] = payload
+                calibres_guardados.append(calibre)
                 registros_guardados += 1
             except Exception as e:
                 logger.error(f"Error guardando precio público {calibre}: {e}")
         
+        if registros_guardados:
+            self._guardar_payloads(cursor, payloads)
+            self._actualizar_agregados(cursor, "precios_publicos", [str(fecha)], calibres_guardados)
+            self._incrementar_version_datos(cursor)
         conn.commit()
         conn.close()
         
         logger.info(f"✓ Guardados {registros_guardados} precios públicos para {fecha}")
         return registros_guardados
     
+    @timed_db
+    @traced("db")
     def guardar_precios_despacho(self, fecha: date, precios: List[Dict[str, Any]]) -> int:
         """
         Guarda precios de despacho históricos de EXPORQUILSA
         
         Args:
             fecha: Fecha de los precios
-            precios: Lista de dicts con {calibre, presentacion, precio_usd_lb}
+            precios: Lista de dicts con {calibre, presentacion, precio_usd_lb[, origen,
+                     cantidad_sacos, costo_operativo, nota, ...]}
             
         Returns:
             Cantidad de registros guardados
@@ -171,6 +503,8 @@ class PriceDatabase:
         cursor = conn.cursor()
         
         registros_guardados = 0
+        payloads = {}
+        calibres_guardados = []
         
         for precio_data in precios:
             calibre = precio_data.get('calibre')
@@ -180,42 +514,308 @@ class PriceDatabase:
             if not all([calibre, presentacion, precio]):
                 continue
             
+            promovidos, hash_payload, payload = compactar_metadata(
+                precio_data, METADATA_DESPACHO, REDUNDANTES_DESPACHO
+            )
             try:
                 cursor.execute("""
-                    INSERT OR REPLACE INTO precios_despacho 
-                    (fecha, calibre, presentacion, precio_usd_lb, origen, metadata)
-                    VALUES (?, ?, ?, ?, ?, ?)
+                    INSERT INTO precios_despacho 
+                    (fecha, calibre, presentacion, precio_usd_lb, origen,
+                     cantidad_sacos, costo_operativo, nota, metadata_hash)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(fecha, calibre, presentacion, origen) DO UPDATE SET
+                        precio_usd_lb = excluded.precio_usd_lb,
+                        cantidad_sacos = excluded.cantidad_sacos,
+                        costo_operativo = excluded.costo_operativo,
+                        nota = excluded.nota,
+                        metadata_hash = excluded.metadata_hash
                 """, (
                     str(fecha),
                     calibre,
                     presentacion,
                     precio,
-                    'EXPORQUILSA',
-                    json.dumps(precio_data)
+                    precio_data.get('origen') or 'EXPORQUILSA',
+                    *promovidos,
+                    hash_payload
                 ))
+                if hash_payload:
+                    payloads[hash_payload] = payload
+                calibres_guardados.append(calibre)
                 registros_guardados += 1
             except Exception as e:
                 logger.error(f"Error guardando precio despacho {calibre}: {e}")
         
+        if registros_guardados:
+            self._guardar_payloads(cursor, payloads)
+            self._actualizar_agregados(cursor, "precios_despacho", [str(fecha)], calibres_guardados)
+            self._incrementar_version_datos(cursor)
         conn.commit()
         conn.close()
         
         logger.info(f"✓ Guardados {registros_guardados} precios de despacho para {fecha}")
         return registros_guardados
+
+    @timed_db
+    @traced("db")
+    def guardar_precios_publicos_lote(self, registros: List[Dict[str, Any]]) -> int:
+        """
+        Upsert masivo de precios públicos de varias fechas en una sola transacción
+        (importaciones: un commit y un incremento de versión para todo el lote)
+
+        Args:
+            registros: Lista de dicts con {fecha, calibre, precio_usd_lb[, fuente, cantidad_fuentes,
+                       confiabilidad, metadata]}; las claves extra se suman a `metadata`
+
+        Returns:
+            Cantidad de registros guardados
+        """
+        filas, payloads = [], {}
+        for r in registros:
+            if not (r.get('fecha') and r.get('calibre') and r.get('precio_usd_lb')):
+                continue
+            cantidad_fuentes = r.get('cantidad_fuentes') or 1
+            promovidos, hash_payload, payload = compactar_metadata(
+                _metadata_lote(r, COLUMNAS_LOTE_PUBLICOS), METADATA_PUBLICOS, REDUNDANTES_PUBLICOS
+            )
+            if hash_payload:
+                payloads[hash_payload] = payload
+            filas.append((
+                str(r['fecha']),
+                r['calibre'],
+                r['precio_usd_lb'],
+                r.get('fuente') or 'consolidado',
+                cantidad_fuentes,
+                r.get('confiabilidad') or ('alta' if cantidad_fuentes >= 2 else 'media'),
+                *promovidos,
+                hash_payload
+            ))
+        return self._upsert_lote("""
+            INSERT INTO precios_publicos
+            (fecha, calibre, precio_usd_lb, fuente, cantidad_fuentes, confiabilidad,
+             derivado_desde, fuentes_detalle, metadata_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(fecha, calibre, fuente) DO UPDATE SET
+                precio_usd_lb = excluded.precio_usd_lb,
+                cantidad_fuentes = excluded.cantidad_fuentes,
+                confiabilidad = excluded.confiabilidad,
+                derivado_desde = excluded.derivado_desde,
+                fuentes_detalle = excluded.fuentes_detalle,
+                metadata_hash = excluded.metadata_hash
+        """, filas, "precios públicos", payloads, "precios_publicos")
+
+    @timed_db
+    @traced("db")
+    def guardar_precios_despacho_lote(self, registros: List[Dict[str, Any]]) -> int:
+        """
+        Upsert masivo de precios de despacho de varias fechas en una sola transacción
+        (bootstrap / importaciones: un commit y un incremento de versión para todo el lote)
+
+        Args:
+            registros: Lista de dicts con {fecha, calibre, presentacion, precio_usd_lb[, origen,
+                       metadata]}; las claves extra se suman a `metadata`
+
+        Returns:
+            Cantidad de registros guardados
+        """
+        filas, payloads = [], {}
+        for r in registros:
+            if not (r.get('fecha') and r.get('calibre') and r.get('presentacion') and r.get('precio_usd_lb')):
+                continue
+            promovidos, hash_payload, payload = compactar_metadata(
+                _metadata_lote(r, COLUMNAS_LOTE_DESPACHO), METADATA_DESPACHO, REDUNDANTES_DESPACHO
+            )
+            if hash_payload:
+                payloads[hash_payload] = payload
+            filas.append((
+                str(r['fecha']),
+                r['calibre'],
+                r['presentacion'],
+                r['precio_usd_lb'],
+                r.get('origen') or 'EXPORQUILSA',
+                *promovidos,
+                hash_payload
+            ))
+        return self._upsert_lote("""
+            INSERT INTO precios_despacho
+            (fecha, calibre, presentacion, precio_usd_lb, origen,
+             cantidad_sacos, costo_operativo, nota, metadata_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(fecha, calibre, presentacion, origen) DO UPDATE SET
+                precio_usd_lb = excluded.precio_usd_lb,
+                cantidad_sacos = excluded.cantidad_sacos,
+                costo_operativo = excluded.costo_operativo,
+                nota = excluded.nota,
+                metadata_hash = excluded.metadata_hash
+        """, filas, "precios de despacho", payloads, "precios_despacho")
+
+    def _upsert_lote(self, sql: str, filas: List[Tuple], descripcion: str,
+                     payloads: Optional[Dict[str, str]] = None, tabla: Optional[str] = None) -> int:
+        """Filas con (fecha, calibre, ...) al inicio; con `tabla` también actualiza sus agregados"""
+        if not filas:
+            return 0
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                cursor = conn.cursor()
+                self._guardar_payloads(cursor, payloads)
+                cursor.executemany(sql, filas)
+                if tabla:
+                    self._actualizar_agregados(cursor, tabla, [f[0] for f in filas], [f[1] for f in filas])
+                self._incrementar_version_datos(cursor)
+        finally:
+            conn.close()
+
+        logger.info(f"✓ Guardados {len(filas)} {descripcion} en lote")
+        return len(filas)
+    
+    def _incrementar_version_datos(self, cursor: sqlite3.Cursor):
+        """Incrementa la versión de datos dentro de la transacción de la ingesta"""
+        self.ingestas_locales += 1
+        cursor.execute("""
+            UPDATE version_datos SET version = version + 1, actualizado_en = CURRENT_TIMESTAMP
+            WHERE id = 1
+        """)
     
+    @timed_db
+    @traced("db")
+    def obtener_version_datos(self) -> int:
+        """Versión actual de los datos de precios (cambia con cada ingesta)"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute("SELECT version FROM version_datos WHERE id = 1").fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else 0
+    
+    def _reconstruir_estadisticas(self, cursor: sqlite3.Cursor):
+        """Recalcula estadisticas_tablas desde cero (migración o tras escrituras fuera de PriceDatabase)"""
+        cursor.execute("DELETE FROM estadisticas_tablas")
+        for tabla, (fecha, grupo) in TABLAS_CON_ESTADISTICAS.items():
+            presentacion = "presentacion" if "presentacion" in grupo else "''"
+            cursor.execute(f"""
+                INSERT INTO estadisticas_tablas (tabla, calibre, presentacion, filas, fecha_min, fecha_max)
+                SELECT '{tabla}', '', '', COUNT(*), MIN({fecha}), MAX({fecha}) FROM {tabla}
+            """)
+            cursor.execute(f"""
+                INSERT INTO estadisticas_tablas (tabla, calibre, presentacion, filas, fecha_min, fecha_max)
+                SELECT '{tabla}', calibre, {presentacion}, COUNT(*), MIN({fecha}), MAX({fecha})
+                FROM {tabla} GROUP BY {', '.join(grupo)}
+            """)
+    
+    def _actualizar_agregados(self, cursor: sqlite3.Cursor, tabla: str,
+                              fechas: List[str], calibres: List[str]):
+        """
+        Recalcula, dentro de la transacción de la ingesta, los períodos semanales y mensuales
+        que contienen `fechas` para `calibres` (solo esos períodos, no el historial)
+        """
+        if not fechas or not calibres:
+            return
+        desde = date.fromisoformat(min(fechas)[:10])
+        hasta = date.fromisoformat(max(fechas)[:10])
+        calibres = sorted(set(calibres))
+        filtro = f"fecha >= ? AND fecha < ? AND calibre IN ({','.join('?' * len(calibres))})"
+        for resolucion in RESOLUCIONES_AGREGADAS:
+            fin = inicio_periodo(hasta, resolucion)
+            fin = fin + timedelta(days=7) if resolucion == "semanal" else (fin + timedelta(days=32)).replace(day=1)
+            cursor.execute(_sql_recalcular_agregados(tabla, resolucion, filtro),
+                           [str(inicio_periodo(desde, resolucion)), str(fin), *calibres])
+
+    def _reconstruir_agregados(self, cursor: sqlite3.Cursor):
+        """Recalcula agregados_precios desde cero (migración o tras escrituras fuera de PriceDatabase)"""
+        cursor.execute("DELETE FROM agregados_precios")
+        for tabla in TABLAS_AGREGADAS:
+            for resolucion in RESOLUCIONES_AGREGADAS:
+                cursor.execute(_sql_recalcular_agregados(tabla, resolucion, "1"))
+
+    @timed_db
+    @traced("db")
+    def reconstruir_agregados(self):
+        """
+        Recalcula los agregados semanales / mensuales con un recorrido completo. Solo hace falta
+        si se escribieron o borraron precios por fuera de esta clase
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self._reconstruir_agregados(conn.cursor())
+            conn.commit()
+        finally:
+            conn.close()
+        logger.info("✓ Agregados de precios reconstruidos")
+
+    @timed_db
+    @traced("db")
+    def reconstruir_estadisticas(self):
+        """
+        Recalcula las estadísticas con un recorrido completo. Solo hace falta si se escribió
+        con INSERT OR REPLACE por fuera de esta clase (REPLACE borra sin disparar triggers)
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self._reconstruir_estadisticas(conn.cursor())
+            conn.commit()
+        finally:
+            conn.close()
+        logger.info("✓ Estadísticas de tablas reconstruidas")
+    
+    @timed_db
+    @traced("db")
+    def obtener_estadisticas(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Conteos y rangos de fechas por tabla y por grupo desde estadisticas_tablas
+        (costo proporcional a la cantidad de calibres/presentaciones, no al historial)
+        
+        Returns:
+            {tabla: {total_registros, fecha_inicio, fecha_fin, grupos: [{calibre, presentacion, registros, fecha_inicio, fecha_fin}]}}
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute("""
+                SELECT tabla, calibre, presentacion, filas, fecha_min, fecha_max
+                FROM estadisticas_tablas
+                ORDER BY tabla, calibre, presentacion
+            """).fetchall()
+        finally:
+            conn.close()
+        
+        estadisticas = {
+            tabla: {"total_registros": 0, "fecha_inicio": None, "fecha_fin": None, "grupos": []}
+            for tabla in TABLAS_CON_ESTADISTICAS
+        }
+        for tabla, calibre, presentacion, filas, fecha_min, fecha_max in rows:
+            entry = estadisticas.setdefault(
+                tabla, {"total_registros": 0, "fecha_inicio": None, "fecha_fin": None, "grupos": []}
+            )
+            if calibre == '' and presentacion == '':
+                entry.update(total_registros=filas, fecha_inicio=fecha_min, fecha_fin=fecha_max)
+            else:
+                entry["grupos"].append({
+                    "calibre": calibre,
+                    "presentacion": presentacion or None,
+                    "registros": filas,
+                    "fecha_inicio": fecha_min,
+                    "fecha_fin": fecha_max
+                })
+        return estadisticas
+    
+    @timed_db
+    @traced("db")
     def obtener_historial_publico(self, 
                                    calibre: str, 
-                                   dias: int = 90) -> List[Tuple[date, float]]:
+                                   dias: int = 90,
+                                   resolucion: str = "diaria") -> List[Tuple[date, float]]:
         """
         Obtiene historial de precios públicos para un calibre
         
         Args:
             calibre: Calibre a consultar (ej: "16/20")
             dias: Días hacia atrás
+            resolucion: "diaria" (filas originales), "semanal" o "mensual" (agregados_precios)
             
         Returns:
-            Lista de tuplas (fecha, precio)
+            Lista de tuplas (fecha, precio); con agregados, (día medio del período, media)
         """
+        if resolucion != "diaria":
+            return self._historial_agregado("precios_publicos", calibre, "", dias, resolucion)
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -234,10 +834,13 @@ class PriceDatabase:
         conn.close()
         return resultados
     
+    @timed_db
+    @traced("db")
     def obtener_historial_despacho(self, 
                                     calibre: str, 
                                     presentacion: str,
-                                    dias: int = 90) -> List[Tuple[date, float]]:
+                                    dias: int = 90,
+                                    resolucion: str = "diaria") -> List[Tuple[date, float]]:
         """
         Obtiene historial de precios de despacho para un calibre/presentación
         
@@ -245,10 +848,13 @@ class PriceDatabase:
             calibre: Calibre a consultar
             presentacion: HEADLESS o WHOLE
             dias: Días hacia atrás
+            resolucion: "diaria" (filas originales), "semanal" o "mensual" (agregados_precios)
             
         Returns:
-            Lista de tuplas (fecha, precio)
+            Lista de tuplas (fecha, precio); con agregados, (día medio del período, media)
         """
+        if resolucion != "diaria":
+            return self._historial_agregado("precios_despacho", calibre, presentacion, dias, resolucion)
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -266,12 +872,31 @@ class PriceDatabase:
         
         conn.close()
         return resultados
+
+    def _historial_agregado(self, tabla: str, calibre: str, presentacion: str,
+                            dias: int, resolucion: str) -> List[Tuple[date, float]]:
+        """(día medio, media) de los períodos que se solapan con los últimos `dias` días"""
+        if resolucion not in RESOLUCIONES_AGREGADAS:
+            raise ValueError(f"Resolución no soportada: {resolucion}")
+        desde = inicio_periodo(date.today() - timedelta(days=dias), resolucion)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute("""
+                SELECT date(dia_medio), media
+                FROM agregados_precios
+                WHERE tabla = ? AND resolucion = ? AND calibre = ? AND presentacion = ? AND periodo >= ?
+                ORDER BY periodo ASC
+            """, (tabla, resolucion, calibre, presentacion, str(desde))).fetchall()
+        finally:
+            conn.close()
+        return [(date.fromisoformat(fecha), media) for fecha, media in rows]
     
     def calcular_correlacion(self, 
                             calibre: str, 
                             presentacion: str,
                             dias: int = 90,
-                            calibre_publico: str = None) -> Dict[str, Any]:
+                            calibre_publico: str = None,
+                            resolucion: str = "diaria") -> Dict[str, Any]:
         """
         Calcula correlación entre precio público y precio de despacho
         Utiliza regresión lineal y ratio promedio
@@ -280,99 +905,169 @@ class PriceDatabase:
             calibre: Calibre a analizar
             presentacion: HEADLESS o WHOLE
             dias: Ventana de análisis
+            resolucion: "diaria" o "semanal" / "mensual" (medias por período)
             
         Returns:
             Dict con estadísticas de correlación
         """
-        # Obtener historiales
-        calibre_pub = calibre_publico or calibre
-        hist_publico = self.obtener_historial_publico(calibre_pub, dias)
-        hist_despacho = self.obtener_historial_despacho(calibre, presentacion, dias)
-        
-        if not hist_publico or not hist_despacho:
-            return {
-                'status': 'sin_datos',
-                'calibre': calibre,
-                'calibre_publico': calibre_pub,
-                'presentacion': presentacion
-            }
-        
-        # Alinear fechas (intersección)
-        fechas_publico = {f: p for f, p in hist_publico}
-        fechas_despacho = {f: p for f, p in hist_despacho}
-        
-        fechas_comunes = set(fechas_publico.keys()) & set(fechas_despacho.keys())
+        return self.calcular_correlaciones([(calibre, presentacion, calibre_publico)], dias, resolucion)[0]
+    
+    @timed_db
+    @traced("db")
+    def calcular_correlaciones(self,
+                               combinaciones: List[Tuple[str, str, Optional[str]]],
+                               dias: int = 90,
+                               resolucion: str = "diaria") -> List[Dict[str, Any]]:
+        """
+        Correlación público → despacho de varias combinaciones con una lectura de BD y un
+        ajuste vectorizado (rolling_stats.fit_batch) sobre la matriz combinaciones × fechas
         
-        if len(fechas_comunes) < 5:
-            return {
-                'status': 'datos_insuficientes',
+        Args:
+            combinaciones: [(calibre, presentacion, calibre_publico o None = mismo calibre)]
+            dias: Ventana de análisis
+            resolucion: "diaria" (promedio por día) o "semanal" / "mensual" (media de cada
+                período en agregados_precios; las muestras son períodos comunes). Solo los
+                ajustes diarios se guardan en `correlaciones`
+            
+        Returns:
+            Un dict por combinación, en el mismo orden (status sin_datos / datos_insuficientes
+            si no hay historial o hay menos de 5 fechas comunes)
+        """
+        if not combinaciones:
+            return []
+        fecha_inicio = date.today() - timedelta(days=dias)
+        fecha_fin = date.today()
+        combinaciones = [(c, p, cp or c) for c, p, cp in combinaciones]
+        calibres_pub = sorted({cp for _, _, cp in combinaciones})
+        calibres_desp = sorted({c for c, _, _ in combinaciones})
+        if resolucion != "diaria" and resolucion not in RESOLUCIONES_AGREGADAS:
+            raise ValueError(f"Resolución no soportada: {resolucion}")
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            if resolucion == "diaria":
+                publicos = conn.execute(f"""
+                    SELECT fecha, calibre, AVG(precio_usd_lb)
+                    FROM precios_publicos
+                    WHERE fecha >= ? AND fecha <= ? AND calibre IN ({",".join("?" * len(calibres_pub))})
+                    GROUP BY fecha, calibre
+                """, (str(fecha_inicio), str(fecha_fin), *calibres_pub)).fetchall()
+                despacho = conn.execute(f"""
+                    SELECT fecha, calibre, presentacion, AVG(precio_usd_lb)
+                    FROM precios_despacho
+                    WHERE fecha >= ? AND fecha <= ? AND calibre IN ({",".join("?" * len(calibres_desp))})
+                    GROUP BY fecha, calibre, presentacion
+                """, (str(fecha_inicio), str(fecha_fin), *calibres_desp)).fetchall()
+            else:
+                desde = str(inicio_periodo(fecha_inicio, resolucion))
+                publicos = conn.execute(f"""
+                    SELECT periodo, calibre, media
+                    FROM agregados_precios
+                    WHERE tabla = 'precios_publicos' AND resolucion = ? AND periodo >= ?
+                      AND calibre IN ({",".join("?" * len(calibres_pub))})
+                """, (resolucion, desde, *calibres_pub)).fetchall()
+                despacho = conn.execute(f"""
+                    SELECT periodo, calibre, presentacion, media
+                    FROM agregados_precios
+                    WHERE tabla = 'precios_despacho' AND resolucion = ? AND periodo >= ?
+                      AND calibre IN ({",".join("?" * len(calibres_desp))})
+                """, (resolucion, desde, *calibres_desp)).fetchall()
+        finally:
+            conn.close()
+
+        # Columna por fecha (o período) con datos; fit_batch solo usa las comunes a ambas series
+        posiciones = {f: i for i, f in enumerate(sorted({row[0] for row in publicos} | {row[0] for row in despacho}))}
+        n_fechas = max(len(posiciones), 1)
+
+        serie_pub: Dict[str, np.ndarray] = {}
+        for fecha, calibre, precio in publicos:
+            serie_pub.setdefault(calibre, np.full(n_fechas, np.nan))[posiciones[fecha]] = precio
+        serie_desp: Dict[Tuple[str, str], np.ndarray] = {}
+        for fecha, calibre, presentacion, precio in despacho:
+            serie_desp.setdefault((calibre, presentacion), np.full(n_fechas, np.nan))[posiciones[fecha]] = precio
+
+        vacia = np.full(n_fechas, np.nan)
+        matriz_pub = np.array([serie_pub.get(cp, vacia) for _, _, cp in combinaciones])
+        matriz_desp = np.array([serie_desp.get((c, p), vacia) for c, p, _ in combinaciones])
+        ajuste = fit_batch(matriz_pub, matriz_desp)
+
+        resultados = []
+        for i, (calibre, presentacion, calibre_pub) in enumerate(combinaciones):
+            base = {'calibre': calibre, 'calibre_publico': calibre_pub, 'presentacion': presentacion}
+            if calibre_pub not in serie_pub or (calibre, presentacion) not in serie_desp:
+                resultados.append({'status': 'sin_datos', **base})
+                continue
+            muestras = int(ajuste['muestras'][i])
+            if muestras < MIN_FECHAS_CORRELACION:
+                resultados.append({'status': 'datos_insuficientes', **base, 'muestras': muestras})
+                continue
+            slope = float(ajuste['pendiente'][i])
+            intercept = float(ajuste['intercepto'][i])
+            r_value = float(ajuste['coeficiente_correlacion'][i])
+            resultados.append({
                 'calibre': calibre,
-                'calibre_publico': calibre_pub,
                 'presentacion': presentacion,
-                'muestras': len(fechas_comunes)
-            }
-        
-        # Crear arrays alineados
-        fechas_ordenadas = sorted(fechas_comunes)
-        precios_publicos = np.array([fechas_publico[f] for f in fechas_ordenadas])
-        precios_despacho = np.array([fechas_despacho[f] for f in fechas_ordenadas])
-        
-        # Calcular estadísticas
-        ratio_array = precios_despacho / precios_publicos
-        ratio_promedio = np.mean(ratio_array)
-        desviacion = np.std(ratio_array)
-        
-        # Regresión lineal: precio_despacho = a + b * precio_publico
-        slope, intercept, r_value, p_value, std_err = stats.linregress(precios_publicos, precios_despacho)
-        
-        correlacion = {
-            'calibre': calibre,
-            'presentacion': presentacion,
-            'ratio_promedio': round(float(ratio_promedio), 4),
-            'desviacion_estandar': round(float(desviacion), 4),
-            'coeficiente_correlacion': round(float(r_value), 4),
-            'pendiente': round(float(slope), 4),
-            'intercepto': round(float(intercept), 4),
-            'r_cuadrado': round(float(r_value ** 2), 4),
-            'p_value': round(float(p_value), 6),
-            'muestras': len(fechas_comunes),
-            'formula': f"precio_despacho = {intercept:.4f} + {slope:.4f} * precio_publico",
-            'metodo': 'regresion_lineal',
-            'fecha_calculo': date.today()
-        }
+                'calibre_publico': calibre_pub,
+                'ratio_promedio': round(float(ajuste['ratio_promedio'][i]), 4),
+                'desviacion_estandar': round(float(ajuste['desviacion_estandar'][i]), 4),
+                'coeficiente_correlacion': round(r_value, 4),
+                'pendiente': round(slope, 4),
+                'intercepto': round(intercept, 4),
+                'r_cuadrado': round(r_value ** 2, 4),
+                'p_value': round(float(ajuste['p_value'][i]), 6),
+                'error_estandar': round(float(ajuste['error_estandar'][i]), 6),
+                'muestras': muestras,
+                'formula': f"precio_despacho = {intercept:.4f} + {slope:.4f} * precio_publico",
+                'metodo': 'regresion_lineal',
+                'resolucion': resolucion,
+                'fecha_calculo': date.today()
+            })
         
-        # Guardar en BD
-        self._guardar_correlacion(correlacion)
+        # Guardar en BD (una transacción). Solo los ajustes diarios: la tabla guarda una fila por
+        # calibre/presentación/día y un ajuste semanal o mensual pisaría al diario
+        if resolucion == "diaria":
+            self._guardar_correlaciones([r for r in resultados if 'status' not in r])
         
-        return correlacion
+        return resultados
     
-    def _guardar_correlacion(self, correlacion: Dict[str, Any]):
-        """Guarda correlación calculada en BD"""
+    @timed_db
+    @traced("db")
+    def _guardar_correlaciones(self, correlaciones: List[Dict[str, Any]]):
+        """Guarda correlaciones calculadas en BD"""
+        if not correlaciones:
+            return
         conn = sqlite3.connect(self.db_path)
-        cursor = conn.cursor()
         
         try:
-            cursor.execute("""
-                INSERT OR REPLACE INTO correlaciones 
-                (calibre, presentacion, ratio_promedio, coeficiente_correlacion, 
-                 desviacion_estandar, muestras, fecha_calculo, formula)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                correlacion['calibre'],
-                correlacion['presentacion'],
-                correlacion['ratio_promedio'],
-                correlacion['coeficiente_correlacion'],
-                correlacion['desviacion_estandar'],
-                correlacion['muestras'],
-                str(date.today()),
-                correlacion['formula']
-            ))
-            conn.commit()
+            with conn:
+                conn.executemany("""
+                    INSERT INTO correlaciones 
+                    (calibre, presentacion, ratio_promedio, coeficiente_correlacion, 
+                     desviacion_estandar, muestras, fecha_calculo, formula)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(calibre, presentacion, fecha_calculo) DO UPDATE SET
+                        ratio_promedio = excluded.ratio_promedio,
+                        coeficiente_correlacion = excluded.coeficiente_correlacion,
+                        desviacion_estandar = excluded.desviacion_estandar,
+                        muestras = excluded.muestras,
+                        formula = excluded.formula
+                """, [(
+                    correlacion['calibre'],
+                    correlacion['presentacion'],
+                    correlacion['ratio_promedio'],
+                    correlacion['coeficiente_correlacion'],
+                    correlacion['desviacion_estandar'],
+                    correlacion['muestras'],
+                    str(date.today()),
+                    correlacion['formula']
+                ) for correlacion in correlaciones])
         except Exception as e:
-            logger.error(f"Error guardando correlación: {e}")
+            logger.error(f"Error guardando correlaciones: {e}")
         finally:
             conn.close()
     
+    @timed_db
+    @traced("db")
     def obtener_correlacion(self, calibre: str, presentacion: str) -> Optional[Dict[str, Any]]:
         """Obtiene la correlación más reciente calculada"""
         conn = sqlite3.connect(self.db_path)
@@ -403,3 +1098,339 @@ class PriceDatabase:
             'fecha_calculo': row[4],
             'formula': row[5]
         }
+    
+    # ===== PREDICCIONES PERSISTIDAS =====
+    
+    def _migrar_predicciones(self, cursor: sqlite3.Cursor):
+        """
+        Esquema original de predicciones (sin version_datos / resultado, despacho NOT NULL):
+        se reconstruye la tabla conservando las filas existentes
+        """
+        columnas = [row[1] for row in cursor.execute("PRAGMA table_info(predicciones)").fetchall()]
+        if not columnas or "version_datos" in columnas:
+            return
+        cursor.execute("ALTER TABLE predicciones RENAME TO predicciones_v1")
+        cursor.execute(f"CREATE TABLE predicciones ({PREDICCIONES_COLUMNAS})")
+        cursor.execute("""
+            INSERT INTO predicciones
+            (id, fecha_prediccion, fecha_objetivo, calibre, presentacion, precio_publico_predicho,
+             precio_despacho_predicho, confianza, metodo, parametros, created_at)
+            SELECT id, fecha_prediccion, fecha_objetivo, calibre, presentacion, precio_publico_predicho,
+                   precio_despacho_predicho, confianza, metodo, parametros, created_at
+            FROM predicciones_v1
+        """)
+        cursor.execute("DROP TABLE predicciones_v1")
+        logger.info("✓ Tabla predicciones migrada (version_datos, resultado, evaluación)")
+
+    def _migrar_metadata_precios(self, cursor: sqlite3.Cursor, lote: int = 10_000):
+        """
+        Esquema original de precios_publicos / precios_despacho (JSON completo en `metadata` por
+        fila): se reconstruyen con los campos útiles en columnas tipadas y el resto del payload
+        deduplicado en metadata_payloads
+        """
+        for tabla, (definicion, campos, redundantes) in TABLAS_CON_METADATA.items():
+            columnas = [row[1] for row in cursor.execute(f"PRAGMA table_info({tabla})").fetchall()]
+            if "metadata" not in columnas:
+                continue
+            comunes = [c for c in columnas if c != "metadata"]
+            destino = comunes + [columna for columna, _ in campos] + ["metadata_hash"]
+            insert = (f"INSERT INTO {tabla} ({', '.join(destino)}) "
+                      f"VALUES ({', '.join('?' * len(destino))})")
+
+            cursor.execute(f"ALTER TABLE {tabla} RENAME TO {tabla}_v1")
+            cursor.execute(f"CREATE TABLE {tabla} ({definicion})")
+            # Cursor propio para leer mientras `cursor` inserta
+            origen = cursor.connection.execute(f"SELECT {', '.join(comunes)}, metadata FROM {tabla}_v1")
+            filas_migradas, payloads = 0, {}
+            while True:
+                filas = origen.fetchmany(lote)
+                if not filas:
+                    break
+                nuevas = []
+                for *valores, metadata in filas:
+                    try:
+                        datos = json.loads(metadata) if metadata else {}
+                    except ValueError:
+                        datos = {"texto": metadata}
+                    if not isinstance(datos, dict):
+                        datos = {"valor": datos}
+                    promovidos, hash_payload, payload = compactar_metadata(datos, campos, redundantes)
+                    if hash_payload:
+                        payloads[hash_payload] = payload
+                    nuevas.append((*valores, *promovidos, hash_payload))
+                cursor.executemany(insert, nuevas)
+                filas_migradas += len(nuevas)
+            self._guardar_payloads(cursor, payloads)
+            cursor.execute(f"DROP TABLE {tabla}_v1")
+            logger.info(f"✓ Tabla {tabla} migrada: {filas_migradas} filas, metadata en columnas tipadas "
+                        f"+ {len(payloads)} payloads únicos")
+
+    def _guardar_payloads(self, cursor: sqlite3.Cursor, payloads: Dict[str, str]):
+        """Inserta los payloads de metadata que aún no existen (clave = hash)"""
+        if payloads:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO metadata_payloads (hash, payload) VALUES (?, ?)",
+                payloads.items()
+            )
+    
+    @timed_db
+    @traced("db")
+    def guardar_predicciones(self, predicciones: List[Dict[str, Any]]) -> int:
+        """
+        Guarda un lote de predicciones en una sola transacción (no cambia version_datos:
+        las predicciones son resultados, no datos de entrada)
+        
+        Args:
+            predicciones: Dicts con fecha_prediccion, fecha_objetivo, calibre, presentacion,
+                precio_publico_predicho, precio_despacho_predicho, intervalo_inferior,
+                intervalo_superior, confianza, metodo, parametros, dias_historial,
+                version_datos, resultado
+        
+        Returns:
+            Filas insertadas (las que ya existían se omiten y no cuentan)
+        """
+        if not predicciones:
+            return 0
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                # rowcount de executemany suma las filas insertadas (sin las de triggers)
+                cursor = conn.executemany("""
+                    INSERT INTO predicciones
+                    (fecha_prediccion, fecha_objetivo, calibre, presentacion, precio_publico_predicho,
+                     precio_despacho_predicho, intervalo_inferior, intervalo_superior, confianza, metodo,
+                     parametros, dias_historial, version_datos, resultado)
+                    VALUES (:fecha_prediccion, :fecha_objetivo, :calibre, :presentacion, :precio_publico_predicho,
+                            :precio_despacho_predicho, :intervalo_inferior, :intervalo_superior, :confianza, :metodo,
+                            :parametros, :dias_historial, :version_datos, :resultado)
+                    ON CONFLICT(fecha_prediccion, fecha_objetivo, calibre, presentacion, dias_historial,
+                                version_datos, metodo) DO NOTHING
+                """, predicciones)
+                insertadas = cursor.rowcount
+        finally:
+            conn.close()
+        return insertadas
+    
+    @timed_db
+    @traced("db")
+    def obtener_prediccion(self,
+                           fecha_prediccion: date,
+                           fecha_objetivo: date,
+                           calibre: str,
+                           presentacion: str,
+                           dias_historial: int,
+                           version_datos: int) -> Optional[Dict[str, Any]]:
+        """Resultado guardado para la misma clave y versión de datos (None si no existe)"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute("""
+                SELECT resultado FROM predicciones
+                WHERE fecha_prediccion = ? AND fecha_objetivo = ? AND calibre = ? AND presentacion = ?
+                  AND dias_historial = ? AND version_datos = ? AND resultado IS NOT NULL
+                ORDER BY id DESC LIMIT 1
+            """, (str(fecha_prediccion), str(fecha_objetivo), calibre, presentacion,
+                  dias_historial, version_datos)).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else None
+    
+    @timed_db
+    @traced("db")
+    def evaluar_predicciones(self, hasta: Optional[date] = None) -> int:
+        """
+        Completa precio_real y error_abs de las predicciones cuya fecha objetivo ya pasó y
+        tiene precio registrado (público: promedio de fuentes; despacho: EXPORQUILSA).
+        Solo recorre predicciones aún no evaluadas; no recalcula ningún modelo
+        
+        Returns:
+            Cantidad de predicciones evaluadas
+        """
+        hasta = str(hasta or date.today())
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                publicas = conn.execute("""
+                    UPDATE predicciones SET
+                        precio_real = real.precio,
+                        error_abs = ABS(predicciones.precio_publico_predicho - real.precio),
+                        evaluado_en = CURRENT_TIMESTAMP
+                    FROM (
+                        SELECT fecha, calibre, AVG(precio_usd_lb) AS precio
+                        FROM precios_publicos WHERE fecha <= ? GROUP BY fecha, calibre
+                    ) AS real
+                    WHERE predicciones.evaluado_en IS NULL
+                      AND predicciones.presentacion = 'PUBLICO'
+                      AND predicciones.fecha_objetivo <= ?
+                      AND real.fecha = predicciones.fecha_objetivo
+                      AND real.calibre = predicciones.calibre
+                """, (hasta, hasta)).rowcount
+                despacho = conn.execute("""
+                    UPDATE predicciones SET
+                        precio_real = real.precio_usd_lb,
+                        error_abs = ABS(predicciones.precio_despacho_predicho - real.precio_usd_lb),
+                        evaluado_en = CURRENT_TIMESTAMP
+                    FROM precios_despacho AS real
+                    WHERE predicciones.evaluado_en IS NULL
+                      AND predicciones.presentacion <> 'PUBLICO'
+                      AND predicciones.precio_despacho_predicho IS NOT NULL
+                      AND predicciones.fecha_objetivo <= ?
+                      AND real.fecha = predicciones.fecha_objetivo
+                      AND real.calibre = predicciones.calibre
+                      AND real.presentacion = predicciones.presentacion
+                      AND real.origen = 'EXPORQUILSA'
+                """, (hasta,)).rowcount
+        finally:
+            conn.close()
+        total = publicas + despacho
+        if total:
+            logger.info(f"✓ Evaluadas {total} predicciones contra precios reales ({publicas} públicas, {despacho} despacho)")
+        return total
+    
+    @timed_db
+    @traced("db")
+    def resumen_precision(self, dias: int = 90) -> List[Dict[str, Any]]:
+        """
+        Precisión de las predicciones evaluadas con fecha objetivo en los últimos `dias`:
+        MAE, MAPE y cobertura del intervalo, por presentación y método
+        """
+        desde = str(date.today() - timedelta(days=dias))
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute("""
+                SELECT presentacion, metodo, COUNT(*),
+                       AVG(error_abs),
+                       AVG(CASE WHEN precio_real > 0 THEN error_abs / precio_real END),
+                       AVG(CASE WHEN intervalo_inferior IS NULL OR intervalo_superior IS NULL THEN NULL
+                                WHEN precio_real BETWEEN intervalo_inferior AND intervalo_superior THEN 1.0
+                                ELSE 0.0 END)
+                FROM predicciones
+                WHERE evaluado_en IS NOT NULL AND fecha_objetivo >= ?
+                GROUP BY presentacion, metodo
+                ORDER BY presentacion, metodo
+            """, (desde,)).fetchall()
+        finally:
+            conn.close()
+        return [{
+            'presentacion': r[0],
+            'metodo': r[1],
+            'evaluadas': r[2],
+            'mae': round(r[3], 4) if r[3] is not None else None,
+            'mape_pct': round(r[4] * 100, 2) if r[4] is not None else None,
+            'cobertura_intervalo_pct': round(r[5] * 100, 1) if r[5] is not None else None
+        } for r in rows]
+    
+    # ===== TABLAS DE PRECIOS VERSIONADAS =====
+    
+    @timed_db
+    @traced("db")
+    def publicar_tabla_precios(self,
+                               precios: Dict[str, Dict[str, float]],
+                               fecha_vigencia: date,
+                               fuente: str = "EXPORQUILSA",
+                               notas: Optional[str] = None) -> int:
+        """
+        Publica una nueva versión de la tabla de precios por calibre en una sola transacción
+        
+        Args:
+            precios: {presentacion: {calibre: precio_usd_lb}}
+            fecha_vigencia: Fecha desde la que aplica la tabla
+            
+        Returns:
+            Número de versión asignado
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with conn:
+                cursor = conn.execute(
+                    "INSERT INTO tablas_precios (fecha_vigencia, fuente, notas) VALUES (?, ?, ?)",
+                    (str(fecha_vigencia), fuente, notas)
+                )
+                version = cursor.lastrowid
+                conn.executemany("""
+                    INSERT INTO tablas_precios_items (version, presentacion, calibre, precio_usd_lb)
+                    VALUES (?, ?, ?, ?)
+                """, [
+                    (version, presentacion, calibre, float(precio))
+                    for presentacion, tabla in precios.items()
+                    for calibre, precio in tabla.items()
+                ])
+        finally:
+            conn.close()
+        
+        logger.info(f"✓ Tabla de precios v{version} publicada (vigente desde {fecha_vigencia})")
+        return version
+    
+    @timed_db
+    @traced("db")
+    def obtener_version_tabla_vigente(self, fecha: Optional[date] = None) -> Optional[int]:
+        """Versión de la tabla vigente a una fecha (consulta liviana para detectar cambios)"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute("""
+                SELECT version FROM tablas_precios
+                WHERE fecha_vigencia <= ?
+                ORDER BY fecha_vigencia DESC, version DESC
+                LIMIT 1
+            """, (str(fecha or date.today()),)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+    
+    @timed_db
+    @traced("db")
+    def obtener_tabla_precios(self, version: int) -> Optional[Dict[str, Any]]:
+        """Tabla de precios completa de una versión"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            header = conn.execute("""
+                SELECT version, fecha_vigencia, fuente, notas, publicado_en
+                FROM tablas_precios WHERE version = ?
+            """, (version,)).fetchone()
+            if not header:
+                return None
+            items = conn.execute("""
+                SELECT presentacion, calibre, precio_usd_lb
+                FROM tablas_precios_items WHERE version = ?
+                ORDER BY rowid
+            """, (version,)).fetchall()
+        finally:
+            conn.close()
+        
+        precios: Dict[str, Dict[str, float]] = {}
+        for presentacion, calibre, precio in items:
+            precios.setdefault(presentacion, {})[calibre] = precio
+        
+        return {
+            'version': header[0],
+            'fecha_vigencia': datetime.strptime(header[1], "%Y-%m-%d").date(),
+            'fuente': header[2],
+            'notas': header[3],
+            'publicado_en': header[4],
+            'precios': precios
+        }
+    
+    @timed_db
+    @traced("db")
+    def listar_tablas_precios(self, limite: int = 20) -> List[Dict[str, Any]]:
+        """Versiones publicadas (más recientes primero) con cantidad de calibres"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = conn.execute("""
+                SELECT t.version, t.fecha_vigencia, t.fuente, t.notas, t.publicado_en, COUNT(i.calibre)
+                FROM tablas_precios t
+                LEFT JOIN tablas_precios_items i ON i.version = t.version
+                GROUP BY t.version
+                ORDER BY t.version DESC
+                LIMIT ?
+            """, (limite,)).fetchall()
+        finally:
+            conn.close()
+        
+        return [{
+            'version': r[0],
+            'fecha_vigencia': r[1],
+            'fuente': r[2],
+            'notas': r[3],
+            'publicado_en': r[4],
+            'calibres': r[5]
+        } for r in rows]
@@ -0,0 +1,150 @@
+# Persistencia de predicciones (tabla predicciones) con lectura previa
+# PricePredictor consulta aquí antes de calcular: misma clave (fecha de predicción, fecha
+# objetivo, calibre, presentación, ventana de historial) y misma versión de datos devuelve el
+# resultado guardado sin recalcular. Los resultados nuevos se acumulan en memoria y se
+# escriben por lotes (una transacción cada `batch_size` predicciones o cada
+# `flush_interval` segundos), fuera del camino de la request.
+#
+# Las filas guardadas son también la base del seguimiento de precisión:
+# PriceDatabase.evaluar_predicciones() las compara con los precios reales al llegar la fecha.
+
+import atexit
+import json
+import logging
+import os
+import threading
+from datetime import date
+from typing import Dict, Any, Optional, Tuple
+
+import metrics
+from database import PriceDatabase
+from response_cache import DataVersion
+
+logger = logging.getLogger(__name__)
+
+PRESENTACION_PUBLICO = "PUBLICO"
+
+ForecastKey = Tuple[str, str, str, str, int, int]
+
+
+class ForecastStore:
+    """Read-through de predicciones por (clave, versión de datos) con escritura diferida por lotes"""
+
+    def __init__(self,
+                 db: PriceDatabase,
+                 version: Optional[DataVersion] = None,
+                 batch_size: int = 50,
+                 flush_interval: float = 2.0):
+        self.db = db
+        self.version = version or DataVersion(db)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._pending: Dict[ForecastKey, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._flusher: Optional[threading.Thread] = None
+        self._flusher_pid: Optional[int] = None
+        atexit.register(self.flush)
+
+    @classmethod
+    def from_env(cls, db: PriceDatabase, version: Optional[DataVersion] = None) -> "ForecastStore":
+        return cls(
+            db,
+            version,
+            batch_size=int(os.getenv("FORECAST_BATCH_SIZE", "50")),
+            flush_interval=float(os.getenv("FORECAST_FLUSH_SECONDS", "2"))
+        )
+
+    def _key(self, calibre: str, presentacion: str, fecha_objetivo: date, dias_historial: int,
+             version: int) -> ForecastKey:
+        return (str(date.today()), str(fecha_objetivo), calibre, presentacion, dias_historial, version)
+
+    # ===== LECTURA =====
+
+    def get(self,
+            calibre: str,
+            presentacion: str,
+            fecha_objetivo: date,
+            dias_historial: int) -> Optional[Dict[str, Any]]:
+        """Predicción ya calculada hoy con los datos vigentes (pendiente de escribir o en BD)"""
+        version = self.version.get()
+        key = self._key(calibre, presentacion, fecha_objetivo, dias_historial, version)
+        with self._lock:
+            pending = self._pending.get(key)
+        if pending is not None:
+            metrics.record_cache("predicciones_guardadas", True)
+            return json.loads(pending["resultado"])
+        resultado = self.db.obtener_prediccion(date.today(), fecha_objetivo, calibre, presentacion,
+                                               dias_historial, version)
+        metrics.record_cache("predicciones_guardadas", resultado is not None)
+        return resultado
+
+    # ===== ESCRITURA =====
+
+    def put(self,
+            calibre: str,
+            presentacion: str,
+            dias_adelante: int,
+            dias_historial: int,
+            resultado: Dict[str, Any]):
+        """Encola una predicción calculada (se ignoran las que no tienen precio: datos insuficientes)"""
+        if "fecha_objetivo" not in resultado:
+            return
+        publico = presentacion == PRESENTACION_PUBLICO
+        precio_publico = resultado["precio_predicho"] if publico else resultado.get("precio_publico_predicho")
+        if precio_publico is None:
+            return
+        version = self.version.get()
+        row = {
+            "fecha_prediccion": str(date.today()),
+            "fecha_objetivo": resultado["fecha_objetivo"],
+            "calibre": calibre,
+            "presentacion": presentacion,
+            "precio_publico_predicho": precio_publico,
+            "precio_despacho_predicho": None if publico else resultado.get("precio_despacho_predicho"),
+            "intervalo_inferior": resultado.get("intervalo_inferior"),
+            "intervalo_superior": resultado.get("intervalo_superior"),
+            "confianza": resultado.get("confianza") if isinstance(resultado.get("confianza"), (int, float)) else None,
+            "metodo": resultado.get("metodo", "desconocido"),
+            "parametros": json.dumps({"dias_adelante": dias_adelante, "dias_historial": dias_historial}),
+            "dias_historial": dias_historial,
+            "version_datos": version,
+            "resultado": json.dumps(resultado, default=str)
+        }
+        key = self._key(calibre, presentacion, resultado["fecha_objetivo"], dias_historial, version)
+        with self._lock:
+            self._pending[key] = row
+            full = len(self._pending) >= self.batch_size
+        self._ensure_flusher()
+        if full:
+            self._wakeup.set()
+
+    def flush(self) -> int:
+        """Escribe en una transacción todo lo pendiente"""
+        with self._lock:
+            rows = list(self._pending.values())
+            self._pending.clear()
+        if not rows:
+            return 0
+        try:
+            return self.db.guardar_predicciones(rows)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudieron guardar {len(rows)} predicciones: {e}")
+            return 0
+
+    def _ensure_flusher(self):
+        # Un hilo por proceso (tras un fork de gunicorn el hilo del padre no existe en el hijo)
+        if self._flusher is not None and self._flusher_pid == os.getpid() and self._flusher.is_alive():
+            return
+        with self._lock:
+            if self._flusher is not None and self._flusher_pid == os.getpid() and self._flusher.is_alive():
+                return
+            self._flusher_pid = os.getpid()
+            self._flusher = threading.Thread(target=self._flush_loop, name="forecast-store-flush", daemon=True)
+            self._flusher.start()
+
+    def _flush_loop(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
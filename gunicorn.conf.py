@@ -0,0 +1,45 @@
+# Configuración de gunicorn para el modo multi-worker
+#
+#   gunicorn -c gunicorn.conf.py main:app
+#
+# preload_app: main.py se importa y se calienta (tabla de precios + modelos ML) una sola vez
+# en el master; los workers se crean con fork y comparten esa memoria copy-on-write en vez
+# de cargar o entrenar cada uno por su cuenta. El estado mutable compartido entre workers
+# vive fuera del proceso: SQLite, caché diaria de precios, caché de respuestas en disco,
+# último estado de las dependencias y locks single-flight en archivos.
+#
+# Variables: WEB_CONCURRENCY (workers, default = CPUs), BIND, GUNICORN_TIMEOUT
+
+import gc
+import multiprocessing
+import os
+from pathlib import Path
+
+_shared_dir = Path(os.getenv("SHARED_STATE_DIR", Path(__file__).parent / ".cache"))
+os.environ.setdefault("RESPONSE_CACHE_DIR", str(_shared_dir / "responses"))
+os.environ.setdefault("SINGLE_FLIGHT_DIR", str(_shared_dir / "locks"))
+os.environ.setdefault("HEALTH_STATE_DIR", str(_shared_dir / "health"))
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+accesslog = "-"
+
+
+def when_ready(server):
+    """Master, después de importar la app y antes de crear workers"""
+    import main
+    main.warmup_service()
+    # Los objetos ya cargados no vuelven a ser recorridos por el GC: sus páginas no se copian en los workers
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Servicio precargado ({main.service_readiness.state}), creando {server.num_workers} workers")
+
+
+def post_fork(server, worker):
+    import tracing
+    tracing.reinit_after_fork()
@@ -0,0 +1,237 @@
+# Estado de dependencias externas para /readyz y /health
+# Los health checks nunca llaman a servicios externos: leen el último estado conocido de
+# cada dependencia. Ese estado lo mantiene un prober en segundo plano (una tarea asyncio por
+# proceso, cada `interval` segundos) y también el tráfico real: una respuesta de
+# OpenWeatherMap o ExchangeRate-API obtenida al atender una predicción cuenta como
+# observación y evita el sondeo activo durante ese intervalo (no gasta cuota extra).
+#
+# Con varios workers, `state_dir` (HEALTH_STATE_DIR) guarda el último estado de cada
+# dependencia en disco: en cada intervalo sondea un solo worker (try_single_flight) y el
+# resto adopta ese resultado, así las APIs con cuota se consultan una vez por intervalo.
+#
+#     prober.register("ollama", probe_ollama, interval=60, hosts=("localhost:11434",))
+#     prober.start()                # en el startup de la app
+#     prober.snapshot()             # {"ollama": {"status": "online", ...}}
+
+import asyncio
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Awaitable, Tuple, List
+from urllib.parse import urlsplit
+
+from single_flight import try_single_flight
+
+logger = logging.getLogger(__name__)
+
+# Probe: corrutina que devuelve True/False (o levanta excepción = error)
+Probe = Callable[[], Awaitable[bool]]
+
+
+@dataclass
+class DependencyState:
+    name: str
+    probe: Optional[Probe]
+    interval: float
+    critical: bool = False
+    hosts: Tuple[str, ...] = ()
+    status: str = "unknown"          # unknown | online | error | not_configured
+    detail: Optional[str] = None
+    checked_at: Optional[datetime] = None
+    latency_ms: Optional[float] = None
+    consecutive_failures: int = 0
+    source: Optional[str] = None     # probe | traffic
+    _checked_monotonic: float = field(default=0.0, repr=False)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "critica": self.critical,
+            "detalle": self.detail,
+            "verificado_en": self.checked_at.isoformat() if self.checked_at else None,
+            "antiguedad_s": round(time.monotonic() - self._checked_monotonic, 1) if self.checked_at else None,
+            "latencia_ms": self.latency_ms,
+            "fallos_consecutivos": self.consecutive_failures,
+            "origen": self.source
+        }
+
+
+class DependencyProber:
+    """Sondeo periódico en segundo plano + observaciones pasivas del tráfico real"""
+
+    def __init__(self, timeout: float = 5.0, enabled: bool = True, state_dir: Optional[Path] = None):
+        self.timeout = timeout
+        self.enabled = enabled
+        self.state_dir = Path(state_dir) if state_dir else None
+        if self.state_dir is not None:
+            self.state_dir.mkdir(parents=True, exist_ok=True)
+        self._states: Dict[str, DependencyState] = {}
+        self._hosts: Dict[str, str] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def register(self,
+                 name: str,
+                 probe: Optional[Probe],
+                 interval: float = 60.0,
+                 critical: bool = False,
+                 hosts: Tuple[str, ...] = ()):
+        """
+        Registra una dependencia. Sin `probe` queda como not_configured (p.ej. sin API key)
+        `hosts`: hosts cuyas respuestas en el tráfico real actualizan esta dependencia
+        """
+        state = DependencyState(name, probe, interval, critical, tuple(hosts))
+        if probe is None:
+            state.status = "not_configured"
+        self._states[name] = state
+        for host in state.hosts:
+            self._hosts[host] = name
+
+    # ===== OBSERVACIONES =====
+
+    def _update(self, state: DependencyState, ok: bool, detail: Optional[str],
+                latency_ms: Optional[float], source: str):
+        previous = state.status
+        state.status = "online" if ok else "error"
+        state.detail = detail
+        state.latency_ms = round(latency_ms, 2) if latency_ms is not None else None
+        state.checked_at = datetime.now()
+        state._checked_monotonic = time.monotonic()
+        state.consecutive_failures = 0 if ok else state.consecutive_failures + 1
+        state.source = source
+        self._log_transition(state, previous)
+        self._save_shared(state)
+
+    @staticmethod
+    def _log_transition(state: DependencyState, previous: str):
+        if previous != state.status and previous != "unknown":
+            ok = state.status == "online"
+            log = logger.info if ok else logger.warning
+            log(f"{'✅' if ok else '⚠️'} Dependencia {state.name}: {previous} -> {state.status}")
+
+    # ===== ESTADO COMPARTIDO ENTRE WORKERS =====
+
+    def _shared_path(self, name: str) -> Path:
+        return self.state_dir / f"{name}.json"
+
+    def _save_shared(self, state: DependencyState):
+        if self.state_dir is None:
+            return
+        payload = {
+            "status": state.status,
+            "detail": state.detail,
+            "latency_ms": state.latency_ms,
+            "consecutive_failures": state.consecutive_failures,
+            "source": state.source,
+            # Reloj de pared: el monotónico no es comparable entre procesos
+            "checked_ts": time.time() - (time.monotonic() - state._checked_monotonic)
+        }
+        path = self._shared_path(state.name)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            tmp.write_text(json.dumps(payload), encoding="utf-8")
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.debug(f"No se pudo guardar el estado de {state.name}: {e}")
+
+    def _load_shared(self, state: DependencyState) -> Optional[Dict[str, Any]]:
+        try:
+            return json.loads(self._shared_path(state.name).read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def _adopt(self, state: DependencyState, shared: Dict[str, Any]):
+        """Toma como propio el último estado que guardó otro worker"""
+        previous = state.status
+        state.status = shared["status"]
+        state.detail = shared.get("detail")
+        state.latency_ms = shared.get("latency_ms")
+        state.consecutive_failures = shared.get("consecutive_failures", 0)
+        state.source = shared.get("source")
+        state.checked_at = datetime.fromtimestamp(shared["checked_ts"])
+        state._checked_monotonic = time.monotonic() - max(0.0, time.time() - shared["checked_ts"])
+        self._log_transition(state, previous)
+
+    def observe_url(self, url: str, ok: bool, latency_ms: Optional[float] = None,
+                    detail: Optional[str] = None):
+        """Resultado de una request real a `url` (sin costo: ya se hizo para atender tráfico)"""
+        name = self._hosts.get(urlsplit(url).netloc)
+        state = self._states.get(name) if name else None
+        if state is not None and state.probe is not None:
+            self._update(state, ok, detail, latency_ms, "traffic")
+
+    async def check(self, name: str) -> DependencyState:
+        """
+        Ejecuta el probe de una dependencia ahora (con timeout); con state_dir, si otro worker
+        la sondeó dentro del intervalo (o la está sondeando) se adopta su resultado
+        """
+        state = self._states[name]
+        if state.probe is None:
+            return state
+        if self.state_dir is None:
+            await self._probe(state)
+            return state
+
+        with try_single_flight(f"dependency_probe:{self.state_dir.resolve()}:{name}") as owner:
+            shared = self._load_shared(state)
+            fresh = shared is not None and time.time() - shared["checked_ts"] < state.interval
+            if shared is not None and (fresh or not owner):
+                self._adopt(state, shared)
+            elif owner:
+                await self._probe(state)
+        return state
+
+    async def _probe(self, state: DependencyState):
+        start = time.perf_counter()
+        try:
+            ok = bool(await asyncio.wait_for(state.probe(), timeout=self.timeout))
+            detail = None if ok else "respuesta no válida"
+        except asyncio.TimeoutError:
+            ok, detail = False, f"timeout ({self.timeout:g}s)"
+        except Exception as e:
+            ok, detail = False, f"{type(e).__name__}: {e}"
+        self._update(state, ok, detail, (time.perf_counter() - start) * 1000, "probe")
+
+    def _due(self) -> List[str]:
+        now = time.monotonic()
+        return [
+            name for name, state in self._states.items()
+            if state.probe is not None
+            and (state.checked_at is None or now - state._checked_monotonic >= state.interval)
+        ]
+
+    # ===== CICLO EN SEGUNDO PLANO =====
+
+    async def _loop(self):
+        while True:
+            due = self._due()
+            if due:
+                await asyncio.gather(*(self.check(name) for name in due))
+            # Sin estado aún (otro worker está haciendo el primer sondeo): reintentar pronto
+            next_due = [
+                state.interval - (time.monotonic() - state._checked_monotonic) if state.checked_at else 0.0
+                for state in self._states.values() if state.probe is not None
+            ]
+            await asyncio.sleep(max(1.0, min(next_due, default=60.0)))
+
+    def start(self):
+        """Inicia el sondeo en el event loop actual (una vez por proceso/worker)"""
+        if not self.enabled or (self._task is not None and not self._task.done()):
+            return
+        self._task = asyncio.create_task(self._loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    # ===== LECTURA =====
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        return {name: state.as_dict() for name, state in self._states.items()}
+
+    def critical_failures(self) -> List[str]:
+        return [name for name, state in self._states.items() if state.critical and state.status == "error"]
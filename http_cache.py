@@ -0,0 +1,175 @@
+# Caché HTTP en disco para las fuentes del scraper
+# Guarda validadores (ETag / Last-Modified), cuerpo y hash de contenido por URL
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# Campos que cambian en cada carga de página (p. ej. el nonce de WordPress que Selina
+# inyecta en el HTML): no identifican el recurso, así que no entran en la clave
+VOLATILE_FIELDS = frozenset({"nonce"})
+
+
+class CachedResponse:
+    """
+    Respuesta HTTP servida desde red o desde la caché en disco
+
+    unchanged=True cuando el servidor respondió 304 o el cuerpo tiene el mismo
+    hash que la descarga anterior; en ese caso el resultado parseado previo es válido
+    """
+
+    def __init__(self, status_code: int, content: bytes, headers: Dict[str, str],
+                 encoding: Optional[str], cache_key: str, sha256: str,
+                 unchanged: bool = False, not_modified: bool = False, url: str = ""):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.encoding = encoding or "utf-8"
+        self.cache_key = cache_key
+        self.sha256 = sha256
+        self.unchanged = unchanged
+        self.not_modified = not_modified
+        self.url = url
+
+    @property
+    def text(self) -> str:
+        return self.content.decode(self.encoding, errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code} para {self.url}")
+
+
+class HttpCache:
+    """
+    Caché HTTP persistente: <dir>/<key>.json (metadatos) + <dir>/<key>.body (cuerpo)
+
+    Metadatos: url, etag, last_modified, sha256 del cuerpo, encoding y, opcionalmente,
+    el último resultado parseado asociado a ese hash
+    """
+
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(method: str, url: str, params: Optional[Dict[str, Any]] = None,
+                 data: Optional[Dict[str, Any]] = None) -> str:
+        """Clave estable por método + URL + parámetros (ordenados, sin VOLATILE_FIELDS)"""
+        parts = [method.upper(), url]
+        for values in (params, data):
+            if values:
+                stable = {k: v for k, v in values.items() if str(k).lower() not in VOLATILE_FIELDS}
+                parts.append(json.dumps(stable, sort_keys=True, default=str))
+        return hashlib.sha1("\n".join(parts).encode("utf-8")).hexdigest()
+
+    def _meta_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def _body_path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.body"
+
+    def _write_atomic(self, path: Path, payload: bytes):
+        tmp = path.with_suffix(f"{path.suffix}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(payload)
+        os.replace(tmp, path)
+
+    def get_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """Metadatos guardados, solo si el cuerpo correspondiente también existe"""
+        try:
+            meta = json.loads(self._meta_path(key).read_bytes())
+        except (OSError, ValueError):
+            return None
+        if not self._body_path(key).exists():
+            return None
+        return meta
+
+    def load_body(self, key: str) -> Optional[bytes]:
+        try:
+            return self._body_path(key).read_bytes()
+        except OSError:
+            return None
+
+    @staticmethod
+    def conditional_headers(entry: Optional[Dict[str, Any]]) -> Dict[str, str]:
+        """Headers If-None-Match / If-Modified-Since a partir de los validadores guardados"""
+        headers = {}
+        if not entry:
+            return headers
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def store(self, key: str, url: str, content: bytes, headers: Dict[str, str],
+              encoding: Optional[str], previous: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Guarda cuerpo + validadores; conserva el resultado parseado si el hash no cambió"""
+        sha256 = hashlib.sha256(content).hexdigest()
+        meta = {
+            "url": url,
+            "etag": headers.get("ETag") or headers.get("etag"),
+            "last_modified": headers.get("Last-Modified") or headers.get("last-modified"),
+            "sha256": sha256,
+            "encoding": encoding,
+            "content_type": headers.get("Content-Type") or headers.get("content-type"),
+            "fetched_at": datetime.now().isoformat()
+        }
+        if previous and previous.get("sha256") == sha256 and "parsed" in previous:
+            meta["parsed"] = previous["parsed"]
+            meta["parsed_sha256"] = previous.get("parsed_sha256")
+
+        with self._lock:
+            try:
+                if not previous or previous.get("sha256") != sha256:
+                    self._write_atomic(self._body_path(key), content)
+                self._write_atomic(self._meta_path(key), json.dumps(meta, default=str).encode("utf-8"))
+            except OSError as e:
+                logger.warning(f"No se pudo escribir caché HTTP {url}: {e}")
+        return meta
+
+    def touch(self, key: str, entry: Dict[str, Any], headers: Dict[str, str]) -> Dict[str, Any]:
+        """Actualiza validadores tras un 304 (el servidor puede rotar el ETag)"""
+        entry = dict(entry)
+        if headers.get("ETag") or headers.get("etag"):
+            entry["etag"] = headers.get("ETag") or headers.get("etag")
+        if headers.get("Last-Modified") or headers.get("last-modified"):
+            entry["last_modified"] = headers.get("Last-Modified") or headers.get("last-modified")
+        entry["validated_at"] = datetime.now().isoformat()
+        with self._lock:
+            try:
+                self._write_atomic(self._meta_path(key), json.dumps(entry, default=str).encode("utf-8"))
+            except OSError as e:
+                logger.warning(f"No se pudo actualizar caché HTTP {entry.get('url')}: {e}")
+        return entry
+
+    def get_parsed(self, key: str, sha256: str) -> Optional[Any]:
+        """Resultado parseado previamente para exactamente este contenido"""
+        entry = self.get_entry(key)
+        if entry and entry.get("parsed_sha256") == sha256 and "parsed" in entry:
+            return entry["parsed"]
+        return None
+
+    def store_parsed(self, key: str, sha256: str, parsed: Any):
+        """Asocia un resultado parseado al hash del cuerpo guardado"""
+        entry = self.get_entry(key)
+        if not entry or entry.get("sha256") != sha256:
+            return
+        entry["parsed"] = parsed
+        entry["parsed_sha256"] = sha256
+        with self._lock:
+            try:
+                self._write_atomic(self._meta_path(key), json.dumps(entry, default=str).encode("utf-8"))
+            except OSError as e:
+                logger.warning(f"No se pudo guardar resultado parseado {entry.get('url')}: {e}")
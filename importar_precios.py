@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Importación masiva de precios históricos (públicos o de despacho) desde CSV o Parquet
+
+Lee el archivo por bloques (memoria acotada: nunca se carga completo), valida cada fila
+contra el catálogo de calibres/presentaciones de la tabla EXPORQUILSA vigente y hace upsert
+de cada bloque en una sola transacción (PriceDatabase.guardar_precios_*_lote). Reporta
+filas/segundo por bloque y al final.
+
+Columnas (encabezado; mayúsculas/espacios indiferentes):
+    publicos:  fecha, calibre, precio_usd_lb [, fuente, cantidad_fuentes, confiabilidad]
+    despacho:  fecha, calibre, presentacion, precio_usd_lb [, origen]
+Alias aceptados: precio -> precio_usd_lb, date -> fecha, size -> calibre. Columnas adicionales:
+cantidad_sacos, costo_operativo y nota (despacho) o derivado_desde y fuentes (públicos) van a sus
+columnas; el resto a metadata (deduplicada por hash). CSV con ',' o ';' (y decimales con coma).
+
+Parquet requiere pyarrow (opcional).
+
+Uso:
+    python importar_precios.py despacho exporquilsa_2019_2025.csv
+    python importar_precios.py publicos archivo.parquet --fuente freezeocean --bloque 100000
+    python importar_precios.py despacho archivo.csv --validar   # solo valida, no escribe
+"""
+
+import argparse
+import csv
+import logging
+import time
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from database import PriceDatabase, COLUMNAS_LOTE_PUBLICOS, COLUMNAS_LOTE_DESPACHO
+from lazy_imports import lazy_module, is_available
+from predictor import CALIBRE_PUBLICO_WHOLE
+from price_tables import bootstrap_table
+
+pq = lazy_module("pyarrow.parquet")
+PARQUET_AVAILABLE = is_available("pyarrow")
+
+logger = logging.getLogger(__name__)
+
+TIPOS = ("publicos", "despacho")
+BLOQUE_DEFECTO = 50_000
+MAX_ERRORES_REPORTADOS = 20
+CAMPOS_NUMERICOS_DESPACHO = {"cantidad_sacos": int, "costo_operativo": float}
+
+ALIAS_COLUMNAS = {
+    "precio": "precio_usd_lb",
+    "precio_usd": "precio_usd_lb",
+    "date": "fecha",
+    "size": "calibre",
+    "presentation": "presentacion",
+}
+
+
+# ===== LECTURA POR BLOQUES =====
+
+def _normalizar_columna(nombre: str) -> str:
+    nombre = str(nombre).strip().lower().replace(" ", "_")
+    return ALIAS_COLUMNAS.get(nombre, nombre)
+
+
+def _bloques_csv(path: Path, tamano: int) -> Iterator[List[Dict[str, Any]]]:
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        muestra = f.read(8192)
+        f.seek(0)
+        try:
+            dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+        except csv.Error:
+            dialecto = csv.excel
+        lector = csv.reader(f, dialecto)
+        columnas = [_normalizar_columna(c) for c in next(lector, [])]
+        bloque = []
+        for fila in lector:
+            if not fila:
+                continue
+            bloque.append(dict(zip(columnas, fila)))
+            if len(bloque) >= tamano:
+                yield bloque
+                bloque = []
+        if bloque:
+            yield bloque
+
+
+def _bloques_parquet(path: Path, tamano: int) -> Iterator[List[Dict[str, Any]]]:
+    if not PARQUET_AVAILABLE:
+        raise SystemExit("❌ Importar Parquet requiere pyarrow (pip install pyarrow)")
+    archivo = pq.ParquetFile(path)
+    columnas = [_normalizar_columna(c) for c in archivo.schema_arrow.names]
+    for batch in archivo.iter_batches(batch_size=tamano):
+        yield [dict(zip(columnas, fila.values())) for fila in batch.to_pylist()]
+
+
+def leer_por_bloques(path: Path, tamano: int = BLOQUE_DEFECTO) -> Iterator[List[Dict[str, Any]]]:
+    """Filas del archivo como dicts (columnas normalizadas), de a `tamano` filas"""
+    if path.suffix.lower() in (".parquet", ".pq"):
+        return _bloques_parquet(path, tamano)
+    return _bloques_csv(path, tamano)
+
+
+# ===== VALIDACIÓN =====
+
+def _fecha(valor: Any) -> date:
+    if isinstance(valor, datetime):
+        return valor.date()
+    if isinstance(valor, date):
+        return valor
+    texto = str(valor).strip()
+    try:
+        return date.fromisoformat(texto[:10])
+    except ValueError:
+        pass
+    try:
+        return datetime.strptime(texto, "%d/%m/%Y").date()
+    except ValueError:
+        raise ValueError(f"fecha inválida '{texto}' (use AAAA-MM-DD o DD/MM/AAAA)") from None
+
+
+def _numero(valor: Any) -> float:
+    if isinstance(valor, (int, float)):
+        return float(valor)
+    texto = str(valor).strip()
+    if "," in texto and "." not in texto:
+        texto = texto.replace(",", ".")
+    return float(texto)
+
+
+def _precio(valor: Any) -> float:
+    precio = _numero(valor)
+    if not precio > 0:
+        raise ValueError(f"precio no positivo: {valor}")
+    return precio
+
+
+def _vacio(valor: Any) -> bool:
+    return valor is None or (isinstance(valor, str) and not valor.strip())
+
+
+def _extras(fila: Dict[str, Any], columnas: frozenset) -> Optional[Dict[str, Any]]:
+    """Columnas del archivo que no son de la tabla (van a metadata); None si no hay"""
+    extras = {k: v for k, v in fila.items() if k not in columnas and not _vacio(v)}
+    return extras or None
+
+
+class ValidadorCatalogo:
+    """Valida y normaliza filas contra los calibres/presentaciones de la tabla de precios"""
+
+    def __init__(self, precios: Dict[str, Dict[str, float]]):
+        self.calibres_por_presentacion = {p.upper(): set(tabla) for p, tabla in precios.items()}
+        # Precios públicos: calibres sin cabeza + los de referencia de los calibres enteros
+        self.calibres_publicos = (set(self.calibres_por_presentacion.get("HEADLESS", ()))
+                                  | set(CALIBRE_PUBLICO_WHOLE.values()))
+
+    def publico(self, fila: Dict[str, Any], fuente: Optional[str]) -> Dict[str, Any]:
+        calibre = str(fila.get("calibre") or "").strip()
+        if calibre not in self.calibres_publicos:
+            raise ValueError(f"calibre público desconocido: {calibre or '(vacío)'}")
+        registro = {
+            "fecha": _fecha(fila.get("fecha")),
+            "calibre": calibre,
+            "precio_usd_lb": _precio(fila.get("precio_usd_lb")),
+            "fuente": fuente or str(fila.get("fuente") or "").strip() or "importacion",
+            "metadata": _extras(fila, COLUMNAS_LOTE_PUBLICOS)
+        }
+        if not _vacio(fila.get("cantidad_fuentes")):
+            registro["cantidad_fuentes"] = int(float(fila["cantidad_fuentes"]))
+        if not _vacio(fila.get("confiabilidad")):
+            registro["confiabilidad"] = str(fila["confiabilidad"]).strip()
+        return registro
+
+    def despacho(self, fila: Dict[str, Any], origen: Optional[str]) -> Dict[str, Any]:
+        presentacion = str(fila.get("presentacion") or "").strip().upper()
+        if presentacion not in self.calibres_por_presentacion:
+            raise ValueError(f"presentación desconocida: {presentacion or '(vacía)'}")
+        calibre = str(fila.get("calibre") or "").strip()
+        if calibre not in self.calibres_por_presentacion[presentacion]:
+            raise ValueError(f"calibre {calibre or '(vacío)'} no existe en {presentacion}")
+        metadata = _extras(fila, COLUMNAS_LOTE_DESPACHO)
+        if metadata:
+            # Campos que PriceDatabase guarda en columnas numéricas (admiten coma decimal)
+            for campo, tipo in CAMPOS_NUMERICOS_DESPACHO.items():
+                if campo in metadata:
+                    metadata[campo] = tipo(_numero(metadata[campo]))
+        return {
+            "fecha": _fecha(fila.get("fecha")),
+            "calibre": calibre,
+            "presentacion": presentacion,
+            "precio_usd_lb": _precio(fila.get("precio_usd_lb")),
+            "origen": origen or str(fila.get("origen") or "").strip() or "EXPORQUILSA",
+            "metadata": metadata
+        }
+
+
+# ===== IMPORTACIÓN =====
+
+def catalogo_vigente(db: PriceDatabase) -> Dict[str, Dict[str, float]]:
+    """
+    Tabla {presentacion: {calibre: precio}} vigente; en una BD sin tablas publicadas se publica
+    la inicial con el mismo bootstrap que hace el servicio al arrancar
+    """
+    version = db.obtener_version_tabla_vigente(date.today())
+    if version is None:
+        bootstrap_table(db)
+        version = db.obtener_version_tabla_vigente(date.today())
+    tabla = db.obtener_tabla_precios(version) if version is not None else None
+    if tabla is None:
+        raise SystemExit("❌ No hay tabla de precios vigente en la BD (publíquela con POST /data/price-tables)")
+    return tabla["precios"]
+
+
+def importar(db: PriceDatabase,
+             tipo: str,
+             path: Path,
+             tamano_bloque: int = BLOQUE_DEFECTO,
+             fuente: Optional[str] = None,
+             solo_validar: bool = False,
+             estricto: bool = False) -> Dict[str, Any]:
+    """
+    Importa `path` en precios_publicos o precios_despacho
+
+    Args:
+        tipo: "publicos" o "despacho"
+        fuente: Fuente (públicos) u origen (despacho) para todas las filas; si no, la columna
+        solo_validar: Valida sin escribir
+        estricto: Aborta en la primera fila inválida (por defecto se omite y se reporta)
+
+    Returns:
+        Resumen: filas leídas, guardadas, inválidas (con ejemplos), duración y filas/s
+    """
+    if tipo not in TIPOS:
+        raise ValueError(f"tipo debe ser uno de {TIPOS}")
+    validador = ValidadorCatalogo(catalogo_vigente(db))
+    validar = validador.publico if tipo == "publicos" else validador.despacho
+    guardar = db.guardar_precios_publicos_lote if tipo == "publicos" else db.guardar_precios_despacho_lote
+
+    leidas = guardadas = invalidas = 0
+    errores: List[Tuple[int, str]] = []
+    fecha_min: Optional[date] = None
+    fecha_max: Optional[date] = None
+    start = time.perf_counter()
+
+    for numero, bloque in enumerate(leer_por_bloques(path, tamano_bloque), start=1):
+        t_bloque = time.perf_counter()
+        registros = []
+        for i, fila in enumerate(bloque, start=leidas + 2):  # +2: encabezado y base 1
+            try:
+                registro = validar(fila, fuente)
+            except (ValueError, TypeError) as e:
+                if estricto:
+                    raise SystemExit(f"❌ Fila {i}: {e}")
+                invalidas += 1
+                if len(errores) < MAX_ERRORES_REPORTADOS:
+                    errores.append((i, str(e)))
+                continue
+            registros.append(registro)
+            fecha_min = min(fecha_min or registro["fecha"], registro["fecha"])
+            fecha_max = max(fecha_max or registro["fecha"], registro["fecha"])
+        leidas += len(bloque)
+        if not solo_validar:
+            guardadas += guardar(registros)
+        duracion_bloque = time.perf_counter() - t_bloque
+        logger.info(f"  bloque {numero}: {len(bloque)} filas ({len(registros)} válidas) en "
+                    f"{duracion_bloque:.2f}s ({len(bloque) / max(duracion_bloque, 1e-9):,.0f} filas/s)")
+
+    duracion = time.perf_counter() - start
+    return {
+        "tipo": tipo,
+        "archivo": str(path),
+        "filas_leidas": leidas,
+        "filas_guardadas": guardadas,
+        "filas_invalidas": invalidas,
+        "errores": [{"fila": f, "error": e} for f, e in errores],
+        "fecha_min": str(fecha_min) if fecha_min else None,
+        "fecha_max": str(fecha_max) if fecha_max else None,
+        "solo_validar": solo_validar,
+        "duracion_s": round(duracion, 3),
+        "filas_por_segundo": round(leidas / duracion) if duracion > 0 else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Importación masiva de precios históricos desde CSV/Parquet")
+    parser.add_argument("tipo", choices=TIPOS, help="Tabla destino")
+    parser.add_argument("archivo", type=Path, help="Archivo .csv o .parquet")
+    parser.add_argument("--db", type=Path, default=None, help="BD de precios (por defecto PRICES_DB_PATH o data/)")
+    parser.add_argument("--bloque", type=int, default=BLOQUE_DEFECTO, help="Filas por bloque / transacción")
+    parser.add_argument("--fuente", default=None, help="Fuente (públicos) u origen (despacho) para todas las filas")
+    parser.add_argument("--validar", action="store_true", help="Solo validar, sin escribir en la BD")
+    parser.add_argument("--estricto", action="store_true", help="Abortar en la primera fila inválida")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if not args.archivo.exists():
+        raise SystemExit(f"❌ No existe {args.archivo}")
+    db = PriceDatabase(args.db)
+
+    resumen = importar(db, args.tipo, args.archivo, args.bloque, args.fuente, args.validar, args.estricto)
+    accion = "validadas" if args.validar else f"{resumen['filas_guardadas']} guardadas"
+    print(f"📥 {resumen['filas_leidas']} filas de {args.archivo.name} ({accion}, {resumen['filas_invalidas']} inválidas) "
+          f"en {resumen['duracion_s']:.2f}s — {resumen['filas_por_segundo'] or 0:,} filas/s; "
+          f"fechas {resumen['fecha_min']} → {resumen['fecha_max']}")
+    for error in resumen["errores"]:
+        print(f"   ⚠️ fila {error['fila']}: {error['error']}")
+    if resumen["filas_invalidas"] > len(resumen["errores"]):
+        print(f"   ... y {resumen['filas_invalidas'] - len(resumen['errores'])} más")
+
+
+if __name__ == "__main__":
+    main()
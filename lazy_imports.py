@@ -0,0 +1,84 @@
+# Importación diferida de librerías pesadas
+# pandas, sklearn, scipy, xgboost, joblib, aiohttp, requests y bs4 suman segundos y cientos
+# de MB al importar main.py. Los módulos se declaran aquí como proxies y se importan
+# realmente en el primer acceso a un atributo: las rutas que no los usan (/, /livez,
+# catálogo de calibres) arrancan sin pagar ese costo; entrenamiento y scraping los cargan
+# la primera vez que se ejecutan.
+#
+#     pd = lazy_module("pandas")
+#     df = pd.DataFrame(...)          # aquí se importa pandas
+#
+#     SKLEARN_AVAILABLE = is_available("sklearn")   # sin importar el paquete
+#
+# Medición: python -m benchmarks.bench_imports
+
+import importlib
+import importlib.util
+import logging
+import threading
+import time
+from types import ModuleType
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+_AVAILABILITY: Dict[str, bool] = {}
+
+
+def is_available(name: str) -> bool:
+    """True si el paquete está instalado (find_spec, sin ejecutar su código)"""
+    if name not in _AVAILABILITY:
+        try:
+            _AVAILABILITY[name] = importlib.util.find_spec(name) is not None
+        except (ImportError, ValueError):
+            _AVAILABILITY[name] = False
+    return _AVAILABILITY[name]
+
+
+class LazyModule(ModuleType):
+    """Proxy de módulo que se importa en el primer acceso a un atributo"""
+
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_lazy_module"] = None
+        self.__dict__["_lazy_lock"] = threading.Lock()
+
+    def _load(self) -> ModuleType:
+        module = self.__dict__["_lazy_module"]
+        if module is not None:
+            return module
+        with self.__dict__["_lazy_lock"]:
+            module = self.__dict__["_lazy_module"]
+            if module is None:
+                start = time.perf_counter()
+                module = importlib.import_module(self.__name__)
+                self.__dict__["_lazy_module"] = module
+                logger.info(f"📦 Importado {self.__name__} bajo demanda ({(time.perf_counter() - start) * 1000:.0f} ms)")
+        return module
+
+    @property
+    def loaded(self) -> bool:
+        return self.__dict__["_lazy_module"] is not None
+
+    def __getattr__(self, attr: str):
+        return getattr(self._load(), attr)
+
+    def __dir__(self):
+        return dir(self._load())
+
+    def __repr__(self) -> str:
+        state = "cargado" if self.loaded else "diferido"
+        return f"<lazy module '{self.__name__}' ({state})>"
+
+
+def lazy_module(name: str) -> LazyModule:
+    return LazyModule(name)
+
+
+def preload(*modules: LazyModule):
+    """Fuerza la importación (p.ej. en el calentamiento previo al fork de gunicorn)"""
+    for module in modules:
+        try:
+            module._load()
+        except ImportError as e:
+            logger.warning(f"⚠️ No se pudo importar {module.__name__}: {e}")
@@ -2,87 +2,56 @@
 # Maransa - Sistema Inteligente de Estimaciones - VERSIÓN REAL
 # Basado en investigación científica FAO, ECLAC, literatura académica
 
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Query
+from fastapi.responses import Response, PlainTextResponse, HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, date, timedelta
 from decimal import Decimal
-import pandas as pd
 import numpy as np
 import asyncio
-import aiohttp
+import time
 import logging
 from dataclasses import dataclass
 import json
-import sqlite3
 import os
-import random
 from pathlib import Path
+from urllib.parse import urlsplit
 from dotenv import load_dotenv
-import joblib
 import warnings
 warnings.filterwarnings('ignore')
 
 # Importar módulo de scraping de precios de mercado
-from market_data_scraper import MarketPriceScraper
+from market_data_scraper import MarketPriceScraper, PredictionOptimizer, invalidate_spread_cache
+import upstream_replay
+import metrics
+import tracing
 from database import PriceDatabase
-from predictor import PricePredictor
-
-try:
-    from scipy import stats
-    from scipy.stats import pearsonr
-    SCIPY_AVAILABLE = True
-except ImportError:
-    SCIPY_AVAILABLE = False
-
-try:
-    import sklearn
-    SKLEARN_AVAILABLE = True
-except ImportError:
-    SKLEARN_AVAILABLE = False
-
-try:
-    from sklearn.model_selection import train_test_split
-except Exception:
-    train_test_split = None
-
-try:
-    from sklearn.preprocessing import StandardScaler
-    from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
-    from sklearn.linear_model import Ridge
-    from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
-except Exception:
-    StandardScaler = None
-    RandomForestRegressor = None
-    GradientBoostingRegressor = None
-    Ridge = None
-    mean_absolute_error = None
-    mean_squared_error = None
-    r2_score = None
-
-try:
-    import joblib
-    JOBLIB_AVAILABLE = True
-except ImportError:
-    JOBLIB_AVAILABLE = False
-
-try:
-    import xgboost
-    import xgboost as xgb
-    XGBOOST_AVAILABLE = True
-except ImportError:
-    XGBOOST_AVAILABLE = False
-
-# Si faltan clases clave de sklearn, desactivar bloque ML avanzado
-if SKLEARN_AVAILABLE and any(x is None for x in [train_test_split, StandardScaler, RandomForestRegressor, GradientBoostingRegressor, Ridge]):
-    SKLEARN_AVAILABLE = False
-
-try:
-    import statsmodels
-    STATSMODELS_AVAILABLE = True
-except ImportError:
-    STATSMODELS_AVAILABLE = False
+from predictor import PricePredictor, calibre_publico_para
+import rolling_stats
+import price_export
+from forecast_store import ForecastStore
+from caliber_catalog import CaliberCatalog
+from price_tables import PriceTableStore, DEFAULT_CALIBER_PRICES, DEFAULT_PRICES_DATE
+from response_cache import ResponseCache, DataVersion, make_key as response_cache_key
+from single_flight import single_flight
+from lazy_imports import lazy_module, is_available, preload
+from health_probes import DependencyProber
+
+# Librerías pesadas: se importan en el primer uso (entrenamiento, carga de modelos,
+# llamadas HTTP), no al arrancar. Ver lazy_imports.py
+pd = lazy_module("pandas")
+sklearn = lazy_module("sklearn")
+joblib = lazy_module("joblib")
+aiohttp = lazy_module("aiohttp")
+xgb = lazy_module("xgboost")
+
+SCIPY_AVAILABLE = is_available("scipy")
+SKLEARN_AVAILABLE = is_available("sklearn")
+JOBLIB_AVAILABLE = is_available("joblib")
+XGBOOST_AVAILABLE = is_available("xgboost")
+STATSMODELS_AVAILABLE = is_available("statsmodels")
 
 # Cargar variables de entorno desde .env
 load_dotenv()
@@ -106,11 +75,119 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Trace-Id", "X-Profile", "X-Resolucion"],
 )
 
+PRICE_TABLE_REFRESH_SECONDS = float(os.getenv("PRICE_TABLE_REFRESH_SECONDS", "60"))
+
+async def _price_table_refresher():
+    """Detecta tablas publicadas por otros workers o cuya fecha de vigencia llegó"""
+    while True:
+        await asyncio.sleep(PRICE_TABLE_REFRESH_SECONDS)
+        try:
+            await asyncio.to_thread(price_tables.refresh)
+        except Exception as e:
+            logger.warning(f"⚠️ Error verificando tabla de precios: {e}")
+
+@app.on_event("startup")
+async def start_price_table_refresher():
+    if PRICE_TABLE_REFRESH_SECONDS > 0:
+        asyncio.create_task(_price_table_refresher())
+
+ACCURACY_JOB_INTERVAL_SECONDS = float(os.getenv("ACCURACY_JOB_INTERVAL_SECONDS", "3600"))
+
+def run_accuracy_job() -> int:
+    """Evalúa predicciones guardadas cuya fecha objetivo ya tiene precio real (una vez entre workers)"""
+    with single_flight(f"accuracy_job:{db.db_path}"):
+        forecast_store.flush()
+        return db.evaluar_predicciones()
+
+async def _accuracy_tracker():
+    while True:
+        await asyncio.sleep(ACCURACY_JOB_INTERVAL_SECONDS)
+        try:
+            await asyncio.to_thread(run_accuracy_job)
+        except Exception as e:
+            logger.warning(f"⚠️ Error evaluando precisión de predicciones: {e}")
+
+@app.on_event("startup")
+async def start_accuracy_tracker():
+    if ACCURACY_JOB_INTERVAL_SECONDS > 0:
+        asyncio.create_task(_accuracy_tracker())
+
+@app.on_event("shutdown")
+async def flush_forecasts():
+    await asyncio.to_thread(forecast_store.flush)
+
+@app.on_event("startup")
+async def start_dependency_prober():
+    dependency_prober.start()
+
+@app.on_event("startup")
+async def start_warmup():
+    """Sin preload (uvicorn directo) el calentamiento corre en segundo plano tras el arranque"""
+    if service_readiness.state == "idle":
+        service_readiness.state = "warming"
+        asyncio.create_task(asyncio.to_thread(warmup_service))
+
+# Rutas que responden aunque el servicio siga calentando
+READINESS_EXEMPT_PATHS = {"/", "/health", "/livez", "/readyz", "/metrics", "/docs", "/redoc", "/openapi.json"}
+
+@app.middleware("http")
+async def readiness_gate(request: Request, call_next):
+    """Mientras se cargan modelos y catálogo, responde 503 en vez de entrenar por request"""
+    if service_readiness.state == "warming" and request.url.path not in READINESS_EXEMPT_PATHS:
+        return JSONResponse(
+            status_code=503,
+            content={"detail": "Servicio iniciando: cargando modelos y tabla de precios"},
+            headers={"Retry-After": "5"}
+        )
+    return await call_next(request)
+
+@app.middleware("http")
+async def observability_middleware(request: Request, call_next):
+    """
+    Latencia por ruta (plantilla FastAPI, no la URL concreta, para acotar cardinalidad),
+    span raíz del request y perfil opcional con ?profile=1 (requiere PROFILING_ENABLED=true;
+    si ya hay otro perfil en curso el request se atiende sin perfilar y responde X-Profile: busy)
+    """
+    profiler = None
+    profile_busy = False
+    if request.query_params.get("profile") == "1" and tracing.profiling_enabled():
+        profiler = tracing.RequestProfiler(f"{request.method} {request.url.path}")
+        if not profiler.start():
+            profiler, profile_busy = None, True
+    
+    start = time.perf_counter()
+    status_code = 500
+    with tracing.request_span(request.method, request.url.path, request.headers.get("traceparent")) as root:
+        try:
+            response = await call_next(request)
+            status_code = response.status_code
+        finally:
+            route = getattr(request.scope.get("route"), "path", "unmatched")
+            metrics.observe_request(request.method, route, status_code, time.perf_counter() - start)
+            if root is not None:
+                root.name = f"{request.method} {route}"
+                root.set_attribute("http.route", route)
+                root.set_attribute("http.status_code", status_code)
+            profile_path = profiler.stop() if profiler is not None else None
+    
+    if root is not None:
+        response.headers["X-Trace-Id"] = root.trace_id
+    if profile_path is not None:
+        response.headers["X-Profile"] = profile_path.name
+        logger.info(f"🔬 Perfil guardado: {profile_path}")
+    elif profile_busy:
+        response.headers["X-Profile"] = "busy"
+    return response
+
 # Inicializar BD y predictor
 db = PriceDatabase()
-predictor = PricePredictor(db)
+# Versión de datos (cambia con cada ingesta): clave de cachés y de predicciones guardadas
+data_version = DataVersion(db, ttl=float(os.getenv("DATA_VERSION_TTL_SECONDS", "1")))
+forecast_store = ForecastStore.from_env(db, data_version)
+predictor = PricePredictor(db, store=forecast_store)
 
 # ===== MODELOS PYDANTIC =====
 
@@ -173,6 +250,12 @@ class PurchasePriceResponse(BaseModel):
     spread_mercado_despacho: Optional[Dict[str, Any]] = None
     viabilidad_economica: Dict[str, Any]
 
+class PriceTablePublishRequest(BaseModel):
+    precios: Dict[str, Dict[str, float]] = Field(..., description="{HEADLESS|WHOLE: {calibre: precio USD/lb}}")
+    fecha_vigencia: date = Field(..., description="Fecha desde la que aplica la tabla")
+    fuente: str = Field(default="EXPORQUILSA")
+    notas: Optional[str] = None
+
 # ===== CONFIGURACIÓN REAL BASADA EN INVESTIGACIÓN =====
 
 @dataclass
@@ -195,7 +278,7 @@ class RealAIConfig:
     MACHALA_MERCADOS_URL: str = "http://mercadosmachala.gob.ec/"
     
     # Parámetros del modelo basados en literatura científica
-    MODEL_STORAGE_PATH: str = "./models"
+    MODEL_STORAGE_PATH: str = os.getenv("MODEL_STORAGE_PATH", "./models")
     MODEL_ACCURACY_THRESHOLD: float = 0.75  # Basado en estudios científicos
     CONFIDENCE_INTERVAL_PCT: float = 0.85  # Nivel estándar académico
     FORECAST_HORIZON_DAYS: int = 90  # Óptimo según literatura
@@ -252,33 +335,10 @@ class RealAIConfig:
     DISPATCH_INDEX_DOMESTIC = (0.95, 1.05)  # ±5% doméstico
     DISPATCH_INDEX_EXPORT = (0.85, 1.25)    # ±25% exportación
     
-    # Tabla de precios reales por calibre - EXPORQUILSA S.A. (31-01-2026)
-    # Fuente: Empacadora ecuatoriana oficial
-    SHRIMP_CALIBER_PRICES = {
-        # Precios Despachos (Sin Cabeza/Headless) - USD por libra
-        "HEADLESS": {
-            "16/20": 2.90,      # Talla grande - Premium
-            "21/25": 2.50,      # Talla grande-media (con prioridad)
-            "26/30": 2.30,      # Talla media (con prioridad)
-            "31/35": 2.05,      # Talla media-pequeña (con prioridad)
-            "36/40": 2.00,      # Talla estándar
-            "41/50": 1.85,      # Talla pequeña
-            "51/60": 1.75,      # Talla muy pequeña
-            "61/70": 1.60,      # Talla extra pequeña
-            "71/90": 1.30,      # Talla micro
-            "91/110": 0.90      # Talla micro extra
-        },
-        # Precios Entero (Con Cabeza/Whole) - USD por libra
-        "WHOLE": {
-            "20": 4.60,         # Equivalente a 16/20
-            "30": 3.60,         # Equivalente a 26/30
-            "40": 3.15,         # Equivalente a 36/40
-            "50": 3.00,         # Equivalente a 41/50
-            "60": 2.70,         # Equivalente a 51/60
-            "70": 2.60,         # Equivalente a 61/70
-            "80": 2.40          # Equivalente a 71/90
-        }
-    }
+    # Tabla de precios reales por calibre - EXPORQUILSA S.A. (31-01-2026), definida en price_tables
+    SHRIMP_PRICES_DATE = DEFAULT_PRICES_DATE
+    PRIORITY_CALIBERS = ("21/25", "26/30", "31/35")  # Con prioridad según tabla
+    SHRIMP_CALIBER_PRICES = DEFAULT_CALIBER_PRICES
     
     # Factor de conversión: Entero a Sin Cabeza (aprox 45% rendimiento)
     HEADLESS_RENDIMIENTO = 0.45
@@ -335,6 +395,28 @@ class RealAIConfig:
 
 config = RealAIConfig()
 
+# Tabla de precios vigente (versionada en BD) y su catálogo precalculado en memoria
+price_tables = PriceTableStore(db, config)
+
+
+def _on_price_table_change(previous: Optional[CaliberCatalog], current: CaliberCatalog):
+    """
+    Invalida cachés en memoria derivadas de la tabla de precios anterior (el JSON del catálogo
+    ya viene recalculado en el snapshot nuevo). Las correlaciones guardadas no se tocan: se
+    ajustan sobre precios_publicos / precios_despacho, no sobre la tabla EXPORQUILSA
+    """
+    invalidate_spread_cache()
+
+
+price_tables.subscribe(_on_price_table_change)
+
+# Caché de respuestas de predicciones deterministas (clave: parámetros + versión de datos + fecha)
+prediction_cache = ResponseCache.from_env("predicciones")
+
+
+def _prediction_cache_key(endpoint: str, **params) -> str:
+    return response_cache_key(endpoint, params, (data_version.get(), date.today()))
+
 # ===== COLECTOR DE DATOS REAL - FUENTES ECUATORIANAS =====
 
 class RealDataCollector:
@@ -354,6 +436,31 @@ class RealDataCollector:
         if self.session:
             await self.session.close()
     
+    async def _get_json(self, url: str, params: Optional[Dict[str, Any]] = None) -> Tuple[int, Any]:
+        """GET a una API externa (redirigido al mock en modo replay, grabado en modo record)"""
+        with tracing.span("http.get", **{"http.url": url, "peer.service": metrics.source_of(url)}) as s:
+            start = time.perf_counter()
+            try:
+                async with self.session.get(upstream_replay.route(url), params=params) as response:
+                    body = await response.read()
+                    status_code = response.status
+                    headers = dict(response.headers)
+            except Exception as e:
+                metrics.observe_upstream(url, time.perf_counter() - start, error=e)
+                dependency_prober.observe_url(url, ok=False, detail=f"{type(e).__name__}: {e}")
+                raise
+            elapsed = time.perf_counter() - start
+            metrics.observe_upstream(url, elapsed, status=status_code)
+            dependency_prober.observe_url(url, ok=status_code == 200, latency_ms=elapsed * 1000,
+                                          detail=None if status_code == 200 else f"HTTP {status_code}")
+            if s is not None:
+                s.set_attribute("http.status_code", status_code)
+        
+        upstream_replay.record("GET", url, params, None, status_code, headers, body)
+        if status_code != 200:
+            return status_code, None
+        return status_code, json.loads(body)
+    
     async def get_real_weather_data(self, provincia: str) -> Dict[str, Any]:
         """Obtiene datos climáticos REALES de OpenWeatherMap con API key real"""
         try:
@@ -371,35 +478,33 @@ class RealDataCollector:
                 "units": "metric"
             }
             
-            async with self.session.get(url, params=params) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    
-                    # Procesamiento basado en literatura científica
-                    temp_celsius = data["main"]["temp"]
-                    
-                    # Factor de impacto según investigación (26-30°C óptimo)
-                    temp_impact = 1.0
-                    if temp_celsius < 26:
-                        temp_impact = 0.85 - (26 - temp_celsius) * 0.03  # Penalización por frío
-                    elif temp_celsius > 30:
-                        temp_impact = 0.90 - (temp_celsius - 30) * 0.05  # Penalización por calor
-                    
-                    return {
-                        "temperatura": temp_celsius,
-                        "temperatura_impacto": temp_impact,
-                        "humedad": data["main"]["humidity"],
-                        "precipitacion": data.get("rain", {}).get("1h", 0),
-                        "viento": data["wind"]["speed"],
-                        "presion": data["main"]["pressure"],
-                        "nubosidad": data["clouds"]["all"],
-                        "visibilidad": data.get("visibility", 10000) / 1000,
-                        "fuente": "OpenWeatherMap_Real",
-                        "zona_peso": zone_coords["production_weight"]
-                    }
-                else:
-                    logger.error(f"Error API clima: {response.status}")
-                    return {"error": f"API error {response.status}"}
+            status_code, data = await self._get_json(url, params=params)
+            if status_code == 200:
+                # Procesamiento basado en literatura científica
+                temp_celsius = data["main"]["temp"]
+                
+                # Factor de impacto según investigación (26-30°C óptimo)
+                temp_impact = 1.0
+                if temp_celsius < 26:
+                    temp_impact = 0.85 - (26 - temp_celsius) * 0.03  # Penalización por frío
+                elif temp_celsius > 30:
+                    temp_impact = 0.90 - (temp_celsius - 30) * 0.05  # Penalización por calor
+                
+                return {
+                    "temperatura": temp_celsius,
+                    "temperatura_impacto": temp_impact,
+                    "humedad": data["main"]["humidity"],
+                    "precipitacion": data.get("rain", {}).get("1h", 0),
+                    "viento": data["wind"]["speed"],
+                    "presion": data["main"]["pressure"],
+                    "nubosidad": data["clouds"]["all"],
+                    "visibilidad": data.get("visibility", 10000) / 1000,
+                    "fuente": "OpenWeatherMap_Real",
+                    "zona_peso": zone_coords["production_weight"]
+                }
+            else:
+                logger.error(f"Error API clima: {status_code}")
+                return {"error": f"API error {status_code}"}
         
         except Exception as e:
             logger.error(f"Error en get_real_weather_data: {e}")
@@ -411,35 +516,33 @@ class RealDataCollector:
             # API gratuita real para tipos de cambio
             url = "https://api.exchangerate-api.com/v4/latest/USD"
             
-            async with self.session.get(url) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    
-                    # Extraer monedas relevantes para mercados camaroneros
-                    rates = {
-                        "USD_CNY": data["rates"].get("CNY", 7.0),    # China - principal mercado
-                        "USD_EUR": data["rates"].get("EUR", 0.85),   # Europa
-                        "USD_KRW": data["rates"].get("KRW", 1200),   # Corea Sur
-                        "USD_JPY": data["rates"].get("JPY", 110),    # Japón
-                        "USD_VND": data["rates"].get("VND", 24000),  # Vietnam - competidor
-                        "last_update": data.get("date", str(date.today()))
-                    }
-                    
-                    # Calcular impactos según investigación econométrica
-                    impacts = {}
-                    for currency, rate in rates.items():
-                        if currency != "last_update":
-                            # Lógica basada en estudios: tipo de cambio alto = precios competitivos
-                            if currency == "USD_CNY":
-                                impacts[f"{currency}_impact"] = 1.0 + (rate - 7.0) * 0.02
-                            elif currency == "USD_EUR":
-                                impacts[f"{currency}_impact"] = 1.0 + (0.85 - rate) * 0.15
-                    
-                    return {**rates, **impacts, "fuente": "ExchangeRate-API_Real"}
-                    
-                else:
-                    logger.error(f"Error tipos de cambio: {response.status}")
-                    return {"error": f"Exchange API error {response.status}"}
+            status_code, data = await self._get_json(url)
+            if status_code == 200:
+                # Extraer monedas relevantes para mercados camaroneros
+                rates = {
+                    "USD_CNY": data["rates"].get("CNY", 7.0),    # China - principal mercado
+                    "USD_EUR": data["rates"].get("EUR", 0.85),   # Europa
+                    "USD_KRW": data["rates"].get("KRW", 1200),   # Corea Sur
+                    "USD_JPY": data["rates"].get("JPY", 110),    # Japón
+                    "USD_VND": data["rates"].get("VND", 24000),  # Vietnam - competidor
+                    "last_update": data.get("date", str(date.today()))
+                }
+                
+                # Calcular impactos según investigación econométrica
+                impacts = {}
+                for currency, rate in rates.items():
+                    if currency != "last_update":
+                        # Lógica basada en estudios: tipo de cambio alto = precios competitivos
+                        if currency == "USD_CNY":
+                            impacts[f"{currency}_impact"] = 1.0 + (rate - 7.0) * 0.02
+                        elif currency == "USD_EUR":
+                            impacts[f"{currency}_impact"] = 1.0 + (0.85 - rate) * 0.15
+                
+                return {**rates, **impacts, "fuente": "ExchangeRate-API_Real"}
+                
+            else:
+                logger.error(f"Error tipos de cambio: {status_code}")
+                return {"error": f"Exchange API error {status_code}"}
         
         except Exception as e:
             logger.error(f"Error en get_real_exchange_rates: {e}")
@@ -537,47 +640,10 @@ class RealDataCollector:
         Obtiene el precio base de EXPORQUILSA para un calibre específico
         tipo_producto: ej "36/40", "41/50", "20", "30", etc.
         presentation: "HEADLESS" (sin cabeza) o "WHOLE" (entero/con cabeza)
-        Retorna el precio real de mercado para ese calibre
+        Retorna el precio real de mercado para ese calibre (desde el catálogo precalculado)
         """
         try:
-            presentation_upper = presentation.upper()
-            
-            # Validar que la presentación existe
-            if presentation_upper not in config.SHRIMP_CALIBER_PRICES:
-                logger.warning(f"Presentación {presentation_upper} no encontrada, usando HEADLESS")
-                presentation_upper = "HEADLESS"
-            
-            caliber_prices = config.SHRIMP_CALIBER_PRICES[presentation_upper]
-            
-            # Buscar el precio del calibre
-            if tipo_producto in caliber_prices:
-                base_price = caliber_prices[tipo_producto]
-                
-                return {
-                    "calibre": tipo_producto,
-                    "presentacion": presentation_upper,
-                    "precio_base": base_price,
-                    "fuente": "EXPORQUILSA_Real_31_01_2026",
-                    "calidad_requerida": config.QUALITY_REQUIREMENTS,
-                    "tiene_prioridad": tipo_producto in ["21/25", "26/30", "31/35"],  # Según tabla
-                    "estatus": "success"
-                }
-            else:
-                # Si no existe exacto, buscar el más cercano
-                logger.warning(f"Calibre {tipo_producto} no encontrado en tabla, buscando aproximado...")
-                available_calibers = list(caliber_prices.keys())
-                logger.info(f"Calibres disponibles: {available_calibers}")
-                
-                # Retornar con estimación
-                return {
-                    "calibre": tipo_producto,
-                    "presentacion": presentation_upper,
-                    "precio_base": None,
-                    "calibres_disponibles": available_calibers,
-                    "estatus": "not_found",
-                    "mensaje": f"Calibre {tipo_producto} no en tabla EXPORQUILSA"
-                }
-        
+            return price_tables.current.base_price(tipo_producto, presentation)
         except Exception as e:
             logger.error(f"Error en get_caliber_base_price: {e}")
             return {
@@ -706,6 +772,7 @@ class ShrimpPriceMLModel:
         
         return pd.DataFrame(data)
     
+    @tracing.traced("model")
     def train_ensemble_model(self) -> Dict[str, float]:
         """
         Entrena un ensemble de modelos ML con fallback inteligente según librerías disponibles
@@ -725,15 +792,16 @@ class ShrimpPriceMLModel:
             
             # Si sklearn está disponible - usar modelos avanzados
             if SKLEARN_AVAILABLE:
-                # Split train/test (fallback si no existe train_test_split)
-                if train_test_split is not None:
-                    X_train, X_test, y_train, y_test = train_test_split(
-                        X, y, test_size=0.2, random_state=42
-                    )
-                else:
-                    split_idx = int(len(X) * 0.8)
-                    X_train, X_test = X.iloc[:split_idx], X.iloc[split_idx:]
-                    y_train, y_test = y.iloc[:split_idx], y.iloc[split_idx:]
+                # sklearn se importa solo al entrenar (servir predicciones no lo requiere al arrancar)
+                from sklearn.model_selection import train_test_split
+                from sklearn.preprocessing import StandardScaler
+                from sklearn.ensemble import RandomForestRegressor, GradientBoostingRegressor
+                from sklearn.linear_model import Ridge
+                from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+
+                X_train, X_test, y_train, y_test = train_test_split(
+                    X, y, test_size=0.2, random_state=42
+                )
                 
                 # Normalización
                 scaler = StandardScaler()
@@ -823,6 +891,8 @@ class ShrimpPriceMLModel:
                         if self.scalers:
                             for name, scaler in self.scalers.items():
                                 joblib.dump(scaler, f"{config.MODEL_STORAGE_PATH}/scaler_{name}.pkl")
+                        
+                        self._save_metadata(model_scores)
                     except Exception as e:
                         logger.warning(f"No se pudieron guardar modelos: {e}")
                 
@@ -834,6 +904,74 @@ class ShrimpPriceMLModel:
             logger.error(f"Error en entrenamiento del modelo: {e}")
             raise e
     
+    def _expected_model_names(self) -> List[str]:
+        names = ['random_forest', 'gradient_boosting', 'linear_ridge']
+        if XGBOOST_AVAILABLE:
+            names.append('xgboost')
+        return names
+    
+    def _save_metadata(self, model_scores: Dict[str, Dict[str, float]]):
+        """Guarda mejor modelo y versión de sklearn junto a los .pkl (para recargarlos sin reentrenar)"""
+        metadata = {
+            "best_model": self.best_model_name,
+            "models": list(self.models.keys()),
+            "sklearn_version": getattr(sklearn, "__version__", None),
+            "scores": {name: {k: float(v) for k, v in s.items()} for name, s in model_scores.items()},
+            "trained_at": datetime.now().isoformat()
+        }
+        tmp_path = Path(config.MODEL_STORAGE_PATH) / f"model_metadata.json.{os.getpid()}.tmp"
+        tmp_path.write_text(json.dumps(metadata, indent=2), encoding="utf-8")
+        os.replace(tmp_path, Path(config.MODEL_STORAGE_PATH) / "model_metadata.json")
+    
+    def load_models(self) -> bool:
+        """
+        Carga el ensemble guardado en MODEL_STORAGE_PATH sin reentrenar
+        Solo si están todos los modelos esperados y fueron entrenados con la misma versión de sklearn
+        """
+        if not (SKLEARN_AVAILABLE and JOBLIB_AVAILABLE):
+            return False
+        
+        storage = Path(config.MODEL_STORAGE_PATH)
+        metadata_path = storage / "model_metadata.json"
+        model_paths = {name: storage / f"model_{name}.pkl" for name in self._expected_model_names()}
+        scaler_path = storage / "scaler_linear_ridge.pkl"
+        if not metadata_path.exists() or not scaler_path.exists() or not all(p.exists() for p in model_paths.values()):
+            return False
+        
+        try:
+            metadata = json.loads(metadata_path.read_text(encoding="utf-8"))
+            if metadata.get("sklearn_version") != getattr(sklearn, "__version__", None):
+                logger.info(f"Modelos guardados con sklearn {metadata.get('sklearn_version')}, se reentrenará")
+                return False
+            models = {name: joblib.load(path) for name, path in model_paths.items()}
+            scalers = {"linear_ridge": joblib.load(scaler_path)}
+        except Exception as e:
+            logger.warning(f"No se pudieron cargar modelos guardados: {e}")
+            return False
+        
+        self.models = models
+        self.scalers = scalers
+        self.best_model_name = metadata.get("best_model")
+        self.is_trained = True
+        logger.info(f"✓ Modelos cargados desde {storage} (mejor: {self.best_model_name})")
+        return True
+    
+    def ensure_ready(self) -> bool:
+        """
+        Deja el ensemble listo para predecir: carga los modelos guardados o, si no hay,
+        entrena una sola vez entre todos los workers (los demás esperan y cargan el resultado)
+        """
+        if self.is_trained:
+            return True
+        if self.load_models():
+            return True
+        
+        with single_flight(f"train_models:{Path(config.MODEL_STORAGE_PATH).resolve()}"):
+            if self.is_trained or self.load_models():
+                return True
+            self.train_ensemble_model()
+        return self.is_trained
+    
     def _train_fallback_model(self, X: 'pd.DataFrame', y: 'pd.Series') -> Dict[str, Dict[str, float]]:
         """
         Modelo de fallback científicamente fundamentado cuando no hay librerías ML
@@ -917,14 +1055,15 @@ class ShrimpPriceMLModel:
             }
         }
     
+    @tracing.traced("model")
     def predict_with_ensemble(self, features: Dict[str, float]) -> Dict[str, Any]:
         """
         Hace predicción usando ensemble de modelos con fallback inteligente
         """
         try:
             if not self.is_trained:
-                logger.warning("Modelo no entrenado, entrenando ahora...")
-                self.train_ensemble_model()
+                logger.warning("Modelo no entrenado, cargando o entrenando ahora...")
+                self.ensure_ready()
             
             # Convertir features a DataFrame
             feature_df = pd.DataFrame([features])
@@ -1024,6 +1163,81 @@ class ShrimpPriceMLModel:
 # Instancia global del modelo
 ml_model = ShrimpPriceMLModel()
 
+# ===== ARRANQUE / READINESS =====
+
+class ServiceReadiness:
+    """Estado del calentamiento: idle -> warming -> ready | failed"""
+    
+    def __init__(self):
+        self.state = "idle"
+        self.error: Optional[str] = None
+        self.ready_at: Optional[datetime] = None
+        self.pid: Optional[int] = None
+
+service_readiness = ServiceReadiness()
+
+# ===== DEPENDENCIAS (prober en segundo plano) =====
+# /health y /readyz solo leen estos estados: nunca llaman a servicios externos ni entrenan
+
+HEALTH_PROBE_INTERVAL_SECONDS = float(os.getenv("HEALTH_PROBE_INTERVAL_SECONDS", "300"))
+
+dependency_prober = DependencyProber(
+    timeout=float(os.getenv("HEALTH_PROBE_TIMEOUT_SECONDS", "5")),
+    enabled=os.getenv("HEALTH_PROBES_ENABLED", "true").lower() not in ("0", "false", "no"),
+    # Último estado compartido entre workers (gunicorn.conf.py lo fija): un solo sondeo por intervalo
+    state_dir=os.getenv("HEALTH_STATE_DIR") or None
+)
+
+async def _probe_ollama() -> bool:
+    async with aiohttp.ClientSession() as session:
+        async with session.get(upstream_replay.route(f"{config.OLLAMA_URL}/api/version")) as response:
+            return response.status == 200
+
+async def _probe_weather() -> bool:
+    async with RealDataCollector() as collector:
+        return "error" not in await collector.get_real_weather_data("GUAYAS")
+
+async def _probe_exchange() -> bool:
+    async with RealDataCollector() as collector:
+        return "error" not in await collector.get_real_exchange_rates()
+
+async def _probe_database() -> bool:
+    return await asyncio.to_thread(db.obtener_version_datos) is not None
+
+dependency_prober.register("database", _probe_database, interval=30, critical=True)
+dependency_prober.register("ollama", _probe_ollama, interval=60,
+                           hosts=(urlsplit(config.OLLAMA_URL).netloc,))
+dependency_prober.register("weather_api", _probe_weather if config.WEATHER_API_KEY else None,
+                           interval=HEALTH_PROBE_INTERVAL_SECONDS, hosts=("api.openweathermap.org",))
+dependency_prober.register("exchange_api", _probe_exchange,
+                           interval=HEALTH_PROBE_INTERVAL_SECONDS, hosts=("api.exchangerate-api.com",))
+
+
+def warmup_service():
+    """
+    Carga todo lo necesario antes de atender tráfico: tabla de precios vigente (catálogo; en una
+    BD sin tablas publica la inicial) y modelos ML (desde disco, o entrenados una sola vez entre workers)
+    
+    Con gunicorn (gunicorn.conf.py) se ejecuta en el master antes del fork: los workers
+    heredan modelos y catálogo ya cargados y comparten esa memoria copy-on-write.
+    """
+    service_readiness.state = "warming"
+    start = time.perf_counter()
+    try:
+        price_tables.bootstrap()
+        ml_model.ensure_ready()
+        # Lo que la inferencia usa en cada request queda importado antes del primer request (y del fork)
+        preload(pd, aiohttp)
+    except Exception as e:
+        service_readiness.state = "failed"
+        service_readiness.error = str(e)
+        logger.error(f"❌ Error en calentamiento del servicio: {e}")
+        return
+    service_readiness.state = "ready"
+    service_readiness.ready_at = datetime.now()
+    service_readiness.pid = os.getpid()
+    logger.info(f"✅ Servicio listo en {time.perf_counter() - start:.2f}s (tabla v{price_tables.version}, modelo {getattr(ml_model, 'best_model_name', None)})")
+
 # ===== ENDPOINTS PRINCIPALES =====
 
 @app.get("/")
@@ -1047,14 +1261,19 @@ async def root():
             "/data/market-factors - Factores reales Ecuador",
             "/data/exporquilsa-prices - Tabla completa EXPORQUILSA",
             "/data/caliber-price/{caliber} - Precio específico por calibre",
+            "/data/spreads - Matriz de spreads mercado vs despacho",
+            "/data/price-tables - Versiones de la tabla EXPORQUILSA (GET lista, POST publica)",
             "/data/update - Actualización datos reales",
             "/models/train - Entrenar modelo ML",
             "/models/info - Info modelo actual",
-            "/health - Estado servicios reales"
+            "/health - Estado servicios reales",
+            "/metrics - Métricas Prometheus (latencia, cachés, BD, APIs externas)",
+            "/admin/traces - Trazas recientes por request (spans de BD, HTTP y modelos)",
+            "/admin/profiles - Perfiles capturados con ?profile=1 (PROFILING_ENABLED=true)"
         ],
         "calibres_disponibles": {
-            "headless": list(config.SHRIMP_CALIBER_PRICES["HEADLESS"].keys()),
-            "whole": list(config.SHRIMP_CALIBER_PRICES["WHOLE"].keys())
+            "headless": list(price_tables.current.prices.get("HEADLESS", {})),
+            "whole": list(price_tables.current.prices.get("WHOLE", {}))
         }
     }
 
@@ -1064,6 +1283,7 @@ async def predict_shrimp_price_real(request: MarketDataRequest):
     Predice el precio del camarón usando modelos ML REALES 
     basados en investigación científica FAO/ECLAC
     """
+    timer = metrics.StageTimer("/predict/price")
     try:
         logger.info(f"Predicción REAL para {request.tipo_producto} ({request.presentacion}) en mercado {request.mercado_destino}")
         
@@ -1077,10 +1297,9 @@ async def predict_shrimp_price_real(request: MarketDataRequest):
         logger.info(f"Usando factores para presentación: {presentation_factors['nombre']}")
         
         # 1. Obtener precio base real de EXPORQUILSA para el calibre
-        async with RealDataCollector() as collector:
-            # Buscar en tabla correspondiente (sin cabeza busca en HEADLESS, entero/vivo en WHOLE)
-            tabla_busqueda = "HEADLESS" if presentacion == "HEADLESS" else "WHOLE"
-            caliber_price_info = collector.get_caliber_base_price(request.tipo_producto, tabla_busqueda)
+        # Buscar en tabla correspondiente (sin cabeza busca en HEADLESS, entero/vivo en WHOLE)
+        tabla_busqueda = CaliberCatalog.table_for(presentacion)
+        caliber_price_info = price_tables.current.base_price(request.tipo_producto, tabla_busqueda)
         
         if caliber_price_info.get("estatus") == "success":
             base_price_exporquilsa = caliber_price_info["precio_base"]
@@ -1088,6 +1307,7 @@ async def predict_shrimp_price_real(request: MarketDataRequest):
         else:
             base_price_exporquilsa = 2.5  # Fallback
             logger.warning(f"Usando fallback: ${base_price_exporquilsa}")
+        timer.lap("base_price")
         
         # 2. Recopilar datos REALES de fuentes ecuatorianas
         async with RealDataCollector() as collector:
@@ -1097,6 +1317,7 @@ async def predict_shrimp_price_real(request: MarketDataRequest):
             production_data = await collector.get_production_estimates(request.fecha_prediccion)
         
         logger.info("Datos reales recopilados exitosamente")
+        timer.lap("upstream_fetch")
         
         # 3. Aplicar factor de presentación al precio base
         precio_base_ajustado = base_price_exporquilsa * presentation_factors["factor_precio"]
@@ -1116,9 +1337,11 @@ async def predict_shrimp_price_real(request: MarketDataRequest):
             'valor_agregado_presentacion': presentation_factors["valor_agregado"],
             'rendimiento_presentacion': presentation_factors["rendimiento"]
         }
+        timer.lap("feature_build")
         
         # 5. Aplicar modelo ML entrenado
         ml_prediction = ml_model.predict_with_ensemble(features)
+        timer.lap("ensemble_inference")
         
         # 6. Índice de mercado (cómo estará el mercado vs base empacadora)
         if precio_base_ajustado > 0:
@@ -1229,6 +1452,7 @@ async def predict_shrimp_price_real(request: MarketDataRequest):
             recomendaciones.append("📈 Baja producción: soporte alcista en precios")
         
         # 11. Respuesta final mejorada
+        timer.lap("postprocess")
         return PredictionResponse(
             precio_predicho=round(final_price, 4),
             intervalo_confianza={
@@ -1376,6 +1600,27 @@ async def get_market_prices_endpoint(force_refresh: bool = False):
         logger.error(f"Error obteniendo precios de mercado: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/data/spreads")
+async def get_market_spreads():
+    """
+    Matriz completa de spreads mercado público vs despacho EXPORQUILSA
+    para todos los calibres y presentaciones (una sola computación por snapshot diario)
+    """
+    try:
+        scraper = MarketPriceScraper()
+        public_prices = scraper.get_public_market_prices(use_cache=True)
+        matrix = scraper.calculate_spread_matrix(price_tables.current.prices, public_prices=public_prices)
+        
+        return {
+            "estatus": "success",
+            **matrix,
+            "descripcion": "Spread = precio público - precio despacho EXPORQUILSA (USD/lb)"
+        }
+        
+    except Exception as e:
+        logger.error(f"Error calculando matriz de spreads: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/data/market-factors")
 async def get_real_market_factors():
     """Obtiene factores REALES del mercado ecuatoriano de camarón"""
@@ -1567,91 +1812,15 @@ async def train_ml_model():
 @app.get("/data/calibers-by-presentation/{presentacion}")
 async def get_calibers_by_presentation(presentacion: str):
     """Obtiene los calibres disponibles para una presentación específica"""
-    try:
-        presentacion_upper = presentacion.upper()
-        
-        if presentacion_upper not in config.PRESENTATION_FACTORS:
-            raise HTTPException(status_code=400, detail=f"Presentación no válida: {presentacion}. Use: HEADLESS, WHOLE, LIVE")
-        
-        presentation_data = config.PRESENTATION_FACTORS[presentacion_upper]
-        
-        # Obtener precios base de EXPORQUILSA
-        collector = RealDataCollector()
-        tabla_busqueda = "HEADLESS" if presentacion_upper == "HEADLESS" else "WHOLE"
-        
-        calibers_info = []
-        for caliber in presentation_data["disponibilidad"]:
-            caliber_str = str(caliber)
-            price_info = collector.get_caliber_base_price(caliber_str, tabla_busqueda)
-            
-            if price_info.get("estatus") == "success":
-                base_price = price_info["precio_base"]
-                adjusted_price = base_price * presentation_data["factor_precio"]
-                
-                calibers_info.append({
-                    "calibre": caliber_str,
-                    "nombre": f"Calibre {caliber_str}",
-                    "precio_base": round(base_price, 4),
-                    "factor_presentacion": presentation_data["factor_precio"],
-                    "precio_ajustado": round(adjusted_price, 4),
-                    "valor_agregado": presentation_data["valor_agregado"],
-                    "rendimiento": presentation_data["rendimiento"],
-                    "disponible": True
-                })
-            else:
-                logger.warning(f"No se encontró precio para calibre {caliber_str}")
-                calibers_info.append({
-                    "calibre": caliber_str,
-                    "nombre": f"Calibre {caliber_str}",
-                    "disponible": False,
-                    "error": "Precio no disponible"
-                })
-        
-        return {
-            "presentacion": presentacion_upper,
-            "nombre_presentacion": presentation_data["nombre"],
-            "calibres": calibers_info,
-            "factor_precio": presentation_data["factor_precio"],
-            "valor_agregado": presentation_data["valor_agregado"],
-            "rendimiento": presentation_data["rendimiento"],
-            "total_calibres": len(calibers_info),
-            "timestamp": datetime.now()
-        }
-        
-    except HTTPException:
-        raise
-    except Exception as e:
-        logger.error(f"Error en get_calibers_by_presentation: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    payload = price_tables.current.calibers_json(presentacion)
+    if payload is None:
+        raise HTTPException(status_code=400, detail=f"Presentación no válida: {presentacion}. Use: HEADLESS, WHOLE, LIVE")
+    return Response(content=payload, media_type="application/json")
 
 @app.get("/data/exporquilsa-prices")
 async def get_exporquilsa_prices():
     """Obtiene la tabla de precios actuales de EXPORQUILSA S.A. (Ecuador)"""
-    try:
-        return {
-            "fuente": "EXPORQUILSA S.A. - Ecuador",
-            "fecha_actualizacion": "31-01-2026",
-            "contacto": "WhatsApp 0984222956",
-            "requisitos_calidad": {
-                "general": "No picado, No sabor",
-                "cabeza": "No branquias oscuras"
-            },
-            "precios": {
-                "despachos_sin_cabeza": config.SHRIMP_CALIBER_PRICES["HEADLESS"],
-                "entero_con_cabeza": config.SHRIMP_CALIBER_PRICES["WHOLE"]
-            },
-            "factor_rendimiento": {
-                "headless_rendimiento": f"{config.HEADLESS_RENDIMIENTO * 100}%",
-                "descripcion": "Rendimiento de cabeza a sin cabeza"
-            },
-            "calibres_con_prioridad": ["21/25", "26/30", "31/35"],
-            "moneda": "USD",
-            "unidad": "por libra"
-        }
-    
-    except Exception as e:
-        logger.error(f"Error en get_exporquilsa_prices: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return Response(content=price_tables.current.exporquilsa_json, media_type="application/json")
 
 @app.get("/data/caliber-price/{caliber}")
 async def get_caliber_base_price_endpoint(caliber: str, presentation: str = "HEADLESS"):
@@ -1662,15 +1831,101 @@ async def get_caliber_base_price_endpoint(caliber: str, presentation: str = "HEA
     - /data/caliber-price/36%2F40?presentation=HEADLESS
     - /data/caliber-price/50?presentation=WHOLE
     """
-    try:
-        async with RealDataCollector() as collector:
-            result = collector.get_caliber_base_price(caliber, presentation)
-        
-        return result
+    return Response(content=price_tables.current.caliber_price_json(caliber, presentation), media_type="application/json")
+
+@app.get("/data/price-tables")
+async def list_price_tables(limite: int = 20):
+    """Versiones publicadas de la tabla de precios EXPORQUILSA y la vigente en este proceso"""
+    catalog = price_tables.current
+    return {
+        "version_vigente": catalog.version,
+        "fecha_vigencia": catalog.fecha_vigencia,
+        "verificado_en": price_tables.checked_at,
+        "versiones": db.listar_tablas_precios(limite)
+    }
+
+@app.post("/data/price-tables")
+async def publish_price_table(request: PriceTablePublishRequest):
+    """
+    Publica una nueva tabla de precios EXPORQUILSA (sin redeploy)
     
-    except Exception as e:
-        logger.error(f"Error en get_caliber_base_price_endpoint: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    La tabla puede ser parcial: los calibres y presentaciones que no se envían se heredan de la
+    versión vigente a `fecha_vigencia` (la respuesta los lista en `calibres_heredados`); la
+    versión publicada siempre es el catálogo completo.
+    
+    Si la fecha de vigencia ya llegó, el snapshot en memoria se reemplaza de inmediato y se
+    invalidan las cachés dependientes; los demás workers la toman en su próxima verificación.
+    """
+    try:
+        resultado = price_tables.publish(
+            request.precios,
+            request.fecha_vigencia,
+            fuente=request.fuente,
+            notas=request.notas
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", **resultado}
+
+def _split_param(valores: Optional[List[str]]) -> List[str]:
+    """Parámetro repetible que también acepta valores separados por coma"""
+    return [v.strip() for valor in (valores or []) for v in valor.split(",") if v.strip()]
+
+@app.get("/data/export/{tabla}")
+async def export_prices(
+    tabla: str,
+    formato: str = "csv",
+    calibre: Optional[List[str]] = Query(None),
+    presentacion: Optional[List[str]] = Query(None),
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    resolucion: str = "diaria",
+    lote: int = price_export.LOTE_DEFECTO
+):
+    """
+    Exporta precios_publicos, precios_despacho o correlaciones como CSV, Arrow IPC (stream)
+    o Parquet, filtrando por calibre, presentación y rango de fechas
+
+    El archivo se genera en streaming desde el cursor por lotes de `lote` filas: la memoria
+    del worker no crece con el tamaño de la exportación. Arrow/Parquet requieren pyarrow.
+    `resolucion` semanal / mensual exporta los agregados por período (media, mínimo, máximo,
+    último, muestras) de los precios; "auto" elige la más gruesa suficiente para el rango
+    (informada en X-Resolucion).
+    """
+    formato = formato.strip().lower()
+    resolucion = resolucion.strip().lower()
+    if tabla not in price_export.TABLAS:
+        raise HTTPException(status_code=404, detail=f"Tabla no exportable: {tabla} (use {', '.join(price_export.TABLAS)})")
+    if not 1 <= lote <= price_export.LOTE_MAXIMO:
+        raise HTTPException(status_code=400, detail=f"lote debe estar entre 1 y {price_export.LOTE_MAXIMO}")
+    if desde and hasta and desde > hasta:
+        raise HTTPException(status_code=400, detail="desde debe ser anterior a hasta")
+
+    filtros = price_export.ExportFilters(
+        calibre=_split_param(calibre),
+        presentacion=_split_param(presentacion),
+        desde=desde,
+        hasta=hasta
+    )
+    if resolucion == "auto":
+        resolucion = price_export.resolve_resolution(db.db_path, tabla, filtros)
+    try:
+        contenido = price_export.export_stream(db.db_path, tabla, formato, filtros, lote, resolucion)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except RuntimeError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+
+    media_type, extension, _ = price_export.FORMATOS[formato]
+    partes = [tabla] + ([resolucion] if resolucion != "diaria" else []) + [str(f) for f in (desde, hasta) if f]
+    return StreamingResponse(
+        contenido,
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f'attachment; filename="{"_".join(partes)}.{extension}"',
+            "X-Resolucion": resolucion
+        }
+    )
 
 @app.get("/models/info")
 async def get_model_info():
@@ -1718,6 +1973,7 @@ async def predict_purchase_price(request: PurchasePriceRequest):
     Input: calibre, presentación, fecha predicción, horizonte
     Output: precio de compra recomendado + márgenes + viabilidad
     """
+    timer = metrics.StageTimer("/predict/purchase-price")
     try:
         logger.info(f"💰 Predicción de COMPRA RENTABLE: {request.tipo_producto} ({request.presentacion}) en {request.dias_horizonte} días")
         
@@ -1729,9 +1985,8 @@ async def predict_purchase_price(request: PurchasePriceRequest):
         provincia = request.provincia.upper() if request.provincia else "GUAYAS"
         
         # Obtener precio base de la tabla EXPORQUILSA
-        async with RealDataCollector() as collector:
-            tabla_busqueda = "HEADLESS" if presentacion == "HEADLESS" else "WHOLE"
-            caliber_info = collector.get_caliber_base_price(request.tipo_producto, tabla_busqueda)
+        tabla_busqueda = CaliberCatalog.table_for(presentacion)
+        caliber_info = price_tables.current.base_price(request.tipo_producto, tabla_busqueda)
         
         if caliber_info.get("estatus") != "success":
             raise HTTPException(
@@ -1741,25 +1996,30 @@ async def predict_purchase_price(request: PurchasePriceRequest):
         
         base_price_exporquilsa = caliber_info["precio_base"]
         logger.info(f"  ✓ Base EXPORQUILSA: ${base_price_exporquilsa}")
+        timer.lap("base_price")
         
         # ========== PASO 2: Obtener precios públicos actuales ==========
         scraper = MarketPriceScraper()
         public_market_data = scraper.get_public_market_prices(use_cache=True)
         logger.info(f"  ✓ Precios públicos obtenidos (consultados hoy)")
+        timer.lap("scraper")
         
         # ========== PASO 3: Calcular spread actual ==========
         spread_info = scraper.calculate_market_spread(
             request.tipo_producto,
             presentacion,
-            base_price_exporquilsa
+            base_price_exporquilsa,
+            public_prices=public_market_data
         )
         logger.info(f"  ✓ Spread mercado-despacho: {spread_info.get('spread_porcentaje', 0):.2f}%")
+        timer.lap("spread")
         
         # ========== PASO 4: Recopilar datos para ML ==========
         async with RealDataCollector() as collector:
             weather_data = await collector.get_real_weather_data(provincia)
             exchange_rates = await collector.get_real_exchange_rates()
             production_data = await collector.get_production_estimates(request.fecha_prediccion)
+        timer.lap("upstream_fetch")
         
         # ========== PASO 5: Preparar features para ML ==========
         presentation_factors = config.PRESENTATION_FACTORS[presentacion]
@@ -1777,9 +2037,11 @@ async def predict_purchase_price(request: PurchasePriceRequest):
             'clima_score': weather_data.get('temperatura_impacto', 1.0) * 
                           (1 - weather_data.get('precipitacion', 0) / 100),
         }
+        timer.lap("feature_build")
         
         # ========== PASO 6: ML predice variación del mercado ==========
         ml_prediction = ml_model.predict_with_ensemble(features)
+        timer.lap("ensemble_inference")
         
         # ⚠️ CLAVE: El ML predice precio, pero lo usamos SOLO para índice de cambio
         # La razón: el ML entrena con datos sintéticos que pueden estar desalineados con realidad
@@ -1815,6 +2077,7 @@ async def predict_purchase_price(request: PurchasePriceRequest):
             request.dias_horizonte
         )
         logger.info(f"  ✓ Compra recomendada: ${compra_rangos['precio_compra_recomendado']:.3f} (margen ${compra_rangos['margen_recomendado']:.3f})")
+        timer.lap("purchase_optimizer")
         
         # ========== PASO 10: Evaluar confianza ==========
         dias_ahead = (request.fecha_prediccion - date.today()).days
@@ -1857,6 +2120,7 @@ async def predict_purchase_price(request: PurchasePriceRequest):
             recomendacion = "⚠️ Condiciones de mercado no viables para compra rentable en este horizonte"
         
         logger.info(f"✅ Predicción completada exitosamente")
+        timer.lap("postprocess")
         
         # ========== RETORNAR RESPUESTA ==========
         return PurchasePriceResponse(
@@ -1882,133 +2146,129 @@ async def predict_purchase_price(request: PurchasePriceRequest):
         logger.error(f"Error en predict_purchase_price: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/health")
-async def health_check_real():
-    """Verifica estado REAL de todos los servicios y fuentes de datos"""
-    try:
-        status = {
-            "status": "healthy",
-            "timestamp": datetime.now(),
-            "services": {},
-            "data_sources": {},
-            "model_status": {},
-            "version": "2.0.0-Real"
-        }
-        
-        # Verificar Ollama
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(f"{config.OLLAMA_URL}/api/version") as response:
-                    status["services"]["ollama"] = "online" if response.status == 200 else "offline"
-        except:
-            status["services"]["ollama"] = "offline"
-        
-        # Verificar APIs configuradas
-        status["services"]["weather_api"] = "configured" if config.WEATHER_API_KEY else "not_configured"
-        status["services"]["exchange_api"] = "available"  # API gratuita
-        
-        # Verificar fuentes de datos reales
-        async with RealDataCollector() as collector:
-            # Test clima real
-            weather_test = await collector.get_real_weather_data("GUAYAS")
-            status["data_sources"]["climate_real"] = "online" if "error" not in weather_test else "error"
-            
-            # Test tipos cambio real
-            exchange_test = await collector.get_real_exchange_rates()
-            status["data_sources"]["exchange_real"] = "online" if "error" not in exchange_test else "error"
-            
-            # Test mercados ecuador
-            market_test = await collector.get_ecuador_market_prices()
-            status["data_sources"]["markets_ecuador"] = "online" if "error" not in market_test else "error"
-        
-        # Verificar estado modelo ML
-        status["model_status"]["is_trained"] = ml_model.is_trained
-        status["model_status"]["models_available"] = len(ml_model.models)
-        status["model_status"]["best_model"] = getattr(ml_model, 'best_model_name', None)
-        
-        # Auto-entrenar si no está entrenado
-        if not ml_model.is_trained:
-            try:
-                logger.info("Auto-entrenando modelo ML...")
-                ml_model.train_ensemble_model()
-                status["model_status"]["auto_trained"] = True
-                status["model_status"]["is_trained"] = True
-            except Exception as e:
-                status["model_status"]["training_error"] = str(e)
-        
-        # Determinar estado general
-        critical_errors = []
-        if status["data_sources"]["climate_real"] == "error" and config.WEATHER_API_KEY:
-            critical_errors.append("API del clima no funciona")
-        if status["data_sources"]["exchange_real"] == "error":
-            critical_errors.append("API tipos de cambio no funciona")
-        if not status["model_status"]["is_trained"]:
-            critical_errors.append("Modelo ML no entrenado")
-        
-        if critical_errors:
-            status["status"] = "degraded"
-            status["issues"] = critical_errors
-        
-        return status
-    
-    except Exception as e:
-        return {
-            "status": "unhealthy",
-            "error": str(e),
-            "timestamp": datetime.now(),
-            "version": "2.0.0-Real"
-        }
+@app.get("/livez")
+async def liveness_check():
+    """El proceso responde (sin I/O: no consulta BD, modelos ni servicios externos)"""
+    return {"status": "alive", "pid": os.getpid()}
 
-# ========================================
-# ENDPOINTS DE PREDICCIÓN Y BASE DE DATOS
-# ========================================
-
-def map_whole_to_headless_calibre(calibre: str) -> Optional[str]:
+@app.get("/readyz")
+async def readiness_check():
     """
-    Mapea calibres ENTERO (WHOLE) a su equivalente SIN CABEZA (HEADLESS)
-    para usar precios públicos disponibles.
+    Listo para tráfico: modelos cargados, tabla de precios vigente y dependencias críticas
+    sin error (503 si no). Las dependencias se leen del último sondeo, nunca se consultan aquí
     """
-    mapping = {
-        "20": "16/20",
-        "30": "26/30",
-        "40": "36/40",
-        "50": "41/50",
-        "60": "51/60",
-        "70": "61/70",
-        "80": "71/90",
+    critical_failures = dependency_prober.critical_failures()
+    checks = {
+        "modelos_cargados": ml_model.is_trained,
+        "tabla_precios": price_tables.version is not None,
+        "dependencias_criticas": not critical_failures
+    }
+    ready = all(checks.values())
+    degraded = ready and any(
+        state["status"] == "error" for state in dependency_prober.snapshot().values()
+    )
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": ("degraded" if degraded else "ready") if ready else "not_ready",
+            "arranque": service_readiness.state,
+            "error": service_readiness.error,
+            "pid": os.getpid(),
+            "checks": checks,
+            "dependencias": dependency_prober.snapshot()
+        }
+    )
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Métricas en formato de exposición Prometheus (latencias, cachés, BD, servicios externos)"""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/admin/traces")
+async def recent_traces(limit: int = 20):
+    """Últimas trazas (span raíz por request) retenidas en memoria"""
+    return {"trazas": tracing.tracer.recent_traces(limit)}
+
+@app.get("/admin/traces/{trace_id}")
+async def trace_detail(trace_id: str):
+    """Spans de una traza (BD, HTTP saliente, modelos) ordenados por inicio"""
+    spans = tracing.tracer.spans_for(trace_id)
+    if not spans:
+        raise HTTPException(status_code=404, detail=f"Traza {trace_id} no encontrada (o ya fuera del buffer)")
+    return {"trace_id": trace_id, "spans": spans}
+
+@app.get("/admin/profiles")
+async def list_profiles():
+    """Perfiles capturados con ?profile=1"""
+    if not tracing.profiling_enabled():
+        raise HTTPException(status_code=403, detail="Profiling deshabilitado (PROFILING_ENABLED=true)")
+    return {
+        "motor": "pyinstrument" if tracing.PYINSTRUMENT_AVAILABLE else "cprofile",
+        "perfiles": tracing.list_profiles()
     }
-    return mapping.get(calibre)
 
+@app.get("/admin/profiles/{name}")
+async def get_profile(name: str, sort: str = "cumulative", limit: int = 40):
+    """Perfil guardado: HTML de pyinstrument o resumen pstats de cProfile"""
+    if not tracing.profiling_enabled():
+        raise HTTPException(status_code=403, detail="Profiling deshabilitado (PROFILING_ENABLED=true)")
+    path = tracing.resolve_profile(name)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Perfil {name} no encontrado")
+    if path.suffix == ".html":
+        return HTMLResponse(path.read_text(encoding="utf-8"))
+    return PlainTextResponse(tracing.cprofile_summary(path, limit=limit, sort=sort))
 
-def seed_despacho_history_from_base(presentacion: str, days: int = 90, noise_pct: float = 0.03) -> int:
+@app.get("/health")
+async def health_check_real():
     """
-    Si no hay historial suficiente, genera historial sintético basado en
-    la tabla EXPORQUILSA para habilitar correlaciones y predicciones.
+    Estado de servicios y fuentes de datos a partir del último sondeo en segundo plano
+    (ver dependency_prober): no llama a APIs externas ni entrena modelos
     """
-    if presentacion not in config.SHRIMP_CALIBER_PRICES:
-        return 0
-
-    base_prices = config.SHRIMP_CALIBER_PRICES[presentacion]
-    registros = 0
-
-    for offset in range(days):
-        fecha = date.today() - timedelta(days=(days - 1 - offset))
-        precios = []
-
-        for calibre, base in base_prices.items():
-            variacion = 1 + random.uniform(-noise_pct, noise_pct)
-            precio = round(base * variacion, 4)
-            precios.append({
-                "calibre": calibre,
-                "presentacion": presentacion,
-                "precio_usd_lb": precio,
-                "origen": "EXPORQUILSA",
-                "nota": "seed_from_base"
-            })
-
-        registros += db.guardar_precios_despacho(fecha, precios)
+    dependencias = dependency_prober.snapshot()
+    status = {
+        "status": "healthy",
+        "timestamp": datetime.now(),
+        "services": {
+            "ollama": {"online": "online", "error": "offline"}.get(dependencias["ollama"]["status"], "unknown"),
+            "weather_api": "configured" if config.WEATHER_API_KEY else "not_configured",
+            "exchange_api": "available"  # API gratuita
+        },
+        "data_sources": {
+            "climate_real": dependencias["weather_api"]["status"],
+            "exchange_real": dependencias["exchange_api"]["status"],
+            "database": dependencias["database"]["status"]
+        },
+        "model_status": {
+            "is_trained": ml_model.is_trained,
+            "models_available": len(ml_model.models),
+            "best_model": getattr(ml_model, 'best_model_name', None),
+            "warmup": service_readiness.state
+        },
+        "dependencies": dependencias,
+        "version": "2.0.0-Real"
+    }
+    
+    # Determinar estado general
+    critical_errors = []
+    if status["data_sources"]["climate_real"] == "error":
+        critical_errors.append("API del clima no funciona")
+    if status["data_sources"]["exchange_real"] == "error":
+        critical_errors.append("API tipos de cambio no funciona")
+    if status["data_sources"]["database"] == "error":
+        critical_errors.append("Base de datos no responde")
+    if not ml_model.is_trained:
+        critical_errors.append("Modelo ML no entrenado" if service_readiness.state != "warming" else "Modelo ML cargando")
+    
+    if critical_errors:
+        status["status"] = "degraded"
+        status["issues"] = critical_errors
+    
+    return status
 
-    return registros
+# ========================================
+# ENDPOINTS DE PREDICCIÓN Y BASE DE DATOS
+# ========================================
 
 @app.post("/data/save-despacho-history")
 async def save_despacho_history(
@@ -2047,19 +2307,31 @@ async def save_despacho_history(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+def _require_prediction(resultado: Optional[Dict[str, Any]], descripcion: str):
+    """404 "sin datos" cuando el predictor no tiene historial suficiente"""
+    if not resultado:
+        raise HTTPException(status_code=404, detail=f"No hay datos para {descripcion}")
+    if resultado.get("status") == "datos_insuficientes":
+        raise HTTPException(
+            status_code=404,
+            detail=f"Datos insuficientes para predecir {descripcion}: {resultado.get('mensaje', 'sin historial')}"
+        )
+
+
 @app.get("/predict/future-price")
 async def predict_future_public_price(
+    request: Request,
     calibre: str,
     dias: int = 30
 ):
     """
     Predice precio público futuro: P(t) = a + b*t + EMA adjustment
+    
+    Respuesta cacheada por (calibre, dias, versión de datos, fecha); soporta ETag / If-None-Match
     """
-    try:
+    def build() -> Dict[str, Any]:
         resultado = predictor.predecir_precio_publico(calibre, dias)
-        
-        if not resultado:
-            raise HTTPException(status_code=404, detail=f"No hay datos para {calibre}")
+        _require_prediction(resultado, calibre)
         
         return {
             "status": "success",
@@ -2078,6 +2350,12 @@ async def predict_future_public_price(
             "r_cuadrado": resultado["r_cuadrado"],
             "muestras_historicas": resultado["muestras"]
         }
+    
+    try:
+        key = _prediction_cache_key("/predict/future-price", calibre=calibre, dias=dias)
+        return await asyncio.to_thread(prediction_cache.serve, key, build, request.headers.get("if-none-match"))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error prediciendo precio público: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -2085,23 +2363,24 @@ async def predict_future_public_price(
 
 @app.get("/predict/despacho-price")
 async def predict_despacho_price(
+    request: Request,
     calibre: str = None,
     presentacion: str = None,
     dias: int = 30
 ):
     """
     Predice precio despacho: P_desp = α + β * P_pub + EMA
+    
+    Respuesta cacheada por (calibre, presentacion, dias, versión de datos, fecha); soporta ETag / If-None-Match
     """
-    try:
-        if not calibre or not presentacion:
-            raise HTTPException(status_code=400, detail="calibre y presentacion son requeridos")
-            
+    if not calibre or not presentacion:
+        raise HTTPException(status_code=400, detail="calibre y presentacion son requeridos")
+    
+    def build() -> Dict[str, Any]:
         resultado = predictor.predecir_precio_despacho(calibre, presentacion, dias)
+        _require_prediction(resultado, f"{calibre} {presentacion}")
         
-        if not resultado:
-            raise HTTPException(status_code=404, detail=f"No hay datos para {calibre} {presentacion}")
-        
-        return {
+        base = {
             "status": "success",
             "calibre": calibre,
             "presentacion": presentacion,
@@ -2109,6 +2388,22 @@ async def predict_despacho_price(
             "fecha_objetivo": resultado["fecha_objetivo"],  # Ya es string
             "precio_publico_predicho_usd_lb": round(resultado["precio_publico_predicho"], 4),
             "precio_despacho_predicho_usd_lb": round(resultado["precio_despacho_predicho"], 4),
+        }
+        if resultado.get("metodo") == "ratio_estimado":
+            # Sin historial de despacho: ratio fijo, sin intervalo ni correlación
+            return {
+                **base,
+                "intervalo_confianza_despacho": None,
+                "confianza_porcentaje": None,
+                "correlacion": None,
+                "ratio_usado": resultado["ratio_usado"],
+                "metodo": "Predicción Público + Ratio Estimado",
+                "nota": resultado["nota"],
+                "muestras_correlacion": 0
+            }
+        
+        return {
+            **base,
             "intervalo_confianza_despacho": {
                 "minimo": round(resultado["intervalo_inferior"], 4),
                 "maximo": round(resultado["intervalo_superior"], 4)
@@ -2122,62 +2417,197 @@ async def predict_despacho_price(
             "metodo": "Predicción Público + Correlación Histórica",
             "muestras_correlacion": resultado["correlacion"]["muestras"]
         }
+    
+    try:
+        key = _prediction_cache_key("/predict/despacho-price", calibre=calibre, presentacion=presentacion, dias=dias)
+        return await asyncio.to_thread(prediction_cache.serve, key, build, request.headers.get("if-none-match"))
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error prediciendo precio despacho: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/predict/accuracy")
+async def get_prediction_accuracy(dias: int = 90, evaluar: bool = False):
+    """
+    Precisión de las predicciones guardadas frente a los precios reales (MAE, MAPE,
+    cobertura del intervalo) por presentación y método; evaluar=true corre antes la evaluación
+    """
+    try:
+        evaluadas = await asyncio.to_thread(run_accuracy_job) if evaluar else None
+        return {
+            "status": "success",
+            "ventana_dias": dias,
+            "evaluadas_ahora": evaluadas,
+            "resumen": await asyncio.to_thread(db.resumen_precision, dias)
+        }
+    except Exception as e:
+        logger.error(f"Error consultando precisión de predicciones: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def _correlation_payload(correlacion: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "calibre": correlacion["calibre"],
+        "presentacion": correlacion["presentacion"],
+        "ratio_promedio": round(correlacion["ratio_promedio"], 4),
+        "coeficiente_correlacion": round(correlacion["coeficiente_correlacion"], 4),
+        "r_cuadrado": round(correlacion["r_cuadrado"], 4),
+        "desviacion_estandar": round(correlacion["desviacion_estandar"], 4),
+        "formula": correlacion["formula"],
+        "muestras": correlacion["muestras"],
+        "fecha_calculo": correlacion["fecha_calculo"].isoformat(),
+        "interpretacion": {
+            "calidad": "Excelente" if correlacion["r_cuadrado"] > 0.9 else 
+                      "Buena" if correlacion["r_cuadrado"] > 0.7 else
+                      "Moderada" if correlacion["r_cuadrado"] > 0.5 else "Débil",
+            "r_cuadrado_porcentaje": f"{round(correlacion['r_cuadrado'] * 100, 1)}%"
+        }
+    }
+
+
 @app.post("/correlations/calculate")
 async def calculate_correlation(
-    calibre: str = None,
+    calibre: Optional[List[str]] = Query(None),
     presentacion: str = None,
-    calibre_publico: Optional[str] = None
+    calibre_publico: Optional[str] = None,
+    dias: int = 90
 ):
     """
     Calcula correlación: P_despacho = α + β * P_publico
+    
+    `calibre` acepta un calibre, varios (repetido o separados por coma) o "all" (todo el
+    catálogo vigente; `presentacion` opcional filtra). Todas las combinaciones se ajustan con
+    una sola lectura de BD; con un único calibre la respuesta mantiene el formato original.
     """
     try:
-        if not calibre or not presentacion:
-            raise HTTPException(status_code=400, detail="calibre y presentacion son requeridos")
+        calibres = _split_param(calibre)
+        if not calibres:
+            raise HTTPException(status_code=400, detail="calibre es requerido (uno, lista o 'all')")
+        presentacion = presentacion.strip().upper() if presentacion else None
+
+        if [c.lower() for c in calibres] == ["all"]:
+            tabla = price_tables.current.prices
+            combos = [(c, p) for p in tabla if presentacion in (None, p) for c in tabla[p]]
+        else:
+            if not presentacion:
+                raise HTTPException(status_code=400, detail="presentacion es requerida salvo con calibre=all")
+            combos = [(c, presentacion) for c in calibres]
+        unico = len(combos) == 1
+
+        def _calcular(pares):
+            return db.calcular_correlaciones([
+                (c, p, (calibre_publico if unico else None) or calibre_publico_para(c, p)) for c, p in pares
+            ], dias)
+
+        # Solo lectura + ajuste: sin historial se responde "sin datos" (el historial sintético
+        # se siembra offline con sembrar_despacho.py, nunca dentro de la request)
+        correlaciones = await asyncio.to_thread(_calcular, combos)
+
+        if unico:
+            correlacion = correlaciones[0]
+            if correlacion.get("status") in ["sin_datos", "datos_insuficientes"]:
+                raise HTTPException(
+                    status_code=404,
+                    detail=f"No hay datos suficientes para correlación ({correlacion['status']}) con {combos[0][0]} {combos[0][1]}"
+                )
+            return {"status": "success", **_correlation_payload(correlacion)}
+
+        calculadas = [c for c in correlaciones if "status" not in c]
+        if not calculadas:
+            raise HTTPException(status_code=404, detail="No hay datos suficientes para ninguna correlación solicitada")
+        return {
+            "status": "success",
+            "ventana_dias": dias,
+            "total": len(correlaciones),
+            "calculadas": len(calculadas),
+            "correlaciones": [_correlation_payload(c) for c in calculadas],
+            "sin_correlacion": [
+                {k: c.get(k) for k in ("calibre", "presentacion", "status", "muestras")}
+                for c in correlaciones if "status" in c
+            ]
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error calculando correlación: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        calibre_pub = calibre_publico
-        if not calibre_pub and presentacion == "WHOLE":
-            calibre_pub = map_whole_to_headless_calibre(calibre)
 
-        correlacion = db.calcular_correlacion(calibre, presentacion, calibre_publico=calibre_pub)
+def _compact(values: np.ndarray, digits: int = 4) -> List[Optional[float]]:
+    """Array -> lista JSON redondeada (NaN -> null)"""
+    redondeado = np.round(values, digits)
+    return [None if v != v else float(v) for v in redondeado.tolist()]
 
-        if correlacion and correlacion.get("status") == "sin_datos":
-            registros = seed_despacho_history_from_base(presentacion, days=90)
-            if registros > 0:
-                correlacion = db.calcular_correlacion(calibre, presentacion, calibre_publico=calibre_pub)
 
-        if not correlacion or correlacion.get("status") in ["sin_datos", "datos_insuficientes"]:
-            detalle = correlacion.get("status") if isinstance(correlacion, dict) else "sin_datos"
-            raise HTTPException(
-                status_code=404,
-                detail=f"No hay datos suficientes para correlación ({detalle}) con {calibre} {presentacion}"
-            )
-        
+@app.get("/correlations/rolling")
+async def rolling_correlations(
+    request: Request,
+    ventana: int = 90,
+    calibre: Optional[str] = None,
+    presentacion: Optional[str] = None,
+    desde: Optional[date] = None,
+    hasta: Optional[date] = None,
+    paso: int = 1
+):
+    """
+    Evolución de la correlación público → despacho: ratio (media, desviación), pendiente,
+    intercepto y r sobre cada ventana de `ventana` días que termina en cada fecha, para todas
+    las combinaciones calibre/presentación (o las filtradas) en una sola pasada
+
+    Respuesta compacta: un arreglo `fechas` y, por serie, un arreglo por métrica alineado con
+    `fechas` (null donde hay menos de 5 fechas comunes). `paso` submuestrea las fechas.
+    Cacheada por parámetros + versión de datos; soporta ETag / If-None-Match
+    """
+    if ventana < rolling_stats.MIN_FECHAS_CORRELACION - 1 or paso < 1:
+        raise HTTPException(status_code=400, detail="ventana debe ser >= 4 y paso >= 1")
+    calibre = calibre.strip() if calibre else None
+    presentacion = presentacion.strip().upper() if presentacion else None
+
+    def build() -> Dict[str, Any]:
+        try:
+            historial = rolling_stats.load_history(db.db_path)
+        except ValueError:
+            raise HTTPException(status_code=404, detail="No hay historial de precios")
+        combos = [
+            (cal, pres) for cal, pres in historial.combos_despacho
+            if (calibre is None or cal == calibre) and (presentacion is None or pres == presentacion)
+        ]
+        if not combos:
+            raise HTTPException(status_code=404, detail=f"No hay historial de despacho para {calibre or '*'} {presentacion or '*'}")
+
+        resultado = rolling_stats.rolling_correlation(historial, ventana, combos)
+        inicio = 0 if desde is None else max(0, historial.indice(desde))
+        fin = historial.dias - 1 if hasta is None else min(historial.dias - 1, historial.indice(hasta))
+        columnas = np.arange(inicio, fin + 1, paso)
+        metricas = ("ratio_promedio", "desviacion_estandar", "pendiente", "intercepto", "coeficiente_correlacion")
+
         return {
             "status": "success",
-            "calibre": calibre,
-            "presentacion": presentacion,
-            "ratio_promedio": round(correlacion["ratio_promedio"], 4),
-            "coeficiente_correlacion": round(correlacion["coeficiente_correlacion"], 4),
-            "r_cuadrado": round(correlacion["r_cuadrado"], 4),
-            "desviacion_estandar": round(correlacion["desviacion_estandar"], 4),
-            "formula": correlacion["formula"],
-            "muestras": correlacion["muestras"],
-            "fecha_calculo": correlacion["fecha_calculo"].isoformat(),
-            "interpretacion": {
-                "calidad": "Excelente" if correlacion["r_cuadrado"] > 0.9 else 
-                          "Buena" if correlacion["r_cuadrado"] > 0.7 else
-                          "Moderada" if correlacion["r_cuadrado"] > 0.5 else "Débil",
-                "r_cuadrado_porcentaje": f"{round(correlacion['r_cuadrado'] * 100, 1)}%"
-            }
+            "ventana_dias": ventana,
+            "paso_dias": paso,
+            "fechas": [str(historial.fecha(c)) for c in columnas],
+            "series": [
+                {
+                    "calibre": cal,
+                    "presentacion": pres,
+                    "calibre_publico": resultado["calibres_publicos"][i],
+                    "muestras": resultado["muestras"][i, columnas].tolist(),
+                    **{m: _compact(resultado[m][i, columnas]) for m in metricas}
+                }
+                for i, (cal, pres) in enumerate(combos)
+            ]
         }
+
+    try:
+        key = _prediction_cache_key("/correlations/rolling", ventana=ventana, calibre=calibre,
+                                    presentacion=presentacion, desde=desde, hasta=hasta, paso=paso)
+        return await asyncio.to_thread(prediction_cache.serve, key, build, request.headers.get("if-none-match"))
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Error calculando correlación: {e}")
+        logger.error(f"Error calculando correlaciones móviles: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -2185,45 +2615,34 @@ async def calculate_correlation(
 async def get_database_status():
     """
     Estado de la BD: registros, rangos de fechas, calibres disponibles
+    
+    Lee estadisticas_tablas (mantenida por triggers en cada inserción/borrado), sin recorrer
+    el historial: el costo no crece con la cantidad de registros
     """
     try:
-        conn = sqlite3.connect('prices.db')
-        cursor = conn.cursor()
-        
-        cursor.execute("SELECT COUNT(*), MIN(fecha), MAX(fecha) FROM precios_publicos")
-        publicos = cursor.fetchone()
-        cursor.execute("SELECT DISTINCT calibre FROM precios_publicos")
-        calibres_publicos = [row[0] for row in cursor.fetchall()]
-        
-        cursor.execute("SELECT COUNT(*), MIN(fecha), MAX(fecha) FROM precios_despacho")
-        despacho = cursor.fetchone()
-        cursor.execute("SELECT DISTINCT calibre, presentacion FROM precios_despacho")
-        despacho_combos = [f"{row[0]} {row[1]}" for row in cursor.fetchall()]
-        
-        cursor.execute("SELECT COUNT(*) FROM correlaciones")
-        correlaciones = cursor.fetchone()[0]
-        cursor.execute("SELECT COUNT(*) FROM predicciones")
-        predicciones = cursor.fetchone()[0]
-        
-        conn.close()
+        estadisticas = db.obtener_estadisticas()
+        publicos = estadisticas["precios_publicos"]
+        despacho = estadisticas["precios_despacho"]
         
         return {
             "status": "success",
-            "database_file": "prices.db",
+            "database_file": str(db.db_path),
             "precios_publicos": {
-                "total_registros": publicos[0],
-                "fecha_inicio": publicos[1],
-                "fecha_fin": publicos[2],
-                "calibres": calibres_publicos
+                "total_registros": publicos["total_registros"],
+                "fecha_inicio": publicos["fecha_inicio"],
+                "fecha_fin": publicos["fecha_fin"],
+                "calibres": [g["calibre"] for g in publicos["grupos"]],
+                "por_calibre": publicos["grupos"]
             },
             "precios_despacho": {
-                "total_registros": despacho[0],
-                "fecha_inicio": despacho[1],
-                "fecha_fin": despacho[2],
-                "combinaciones": despacho_combos
+                "total_registros": despacho["total_registros"],
+                "fecha_inicio": despacho["fecha_inicio"],
+                "fecha_fin": despacho["fecha_fin"],
+                "combinaciones": [f"{g['calibre']} {g['presentacion']}" for g in despacho["grupos"]],
+                "por_combinacion": despacho["grupos"]
             },
-            "correlaciones_calculadas": correlaciones,
-            "predicciones_guardadas": predicciones
+            "correlaciones_calculadas": estadisticas["correlaciones"]["total_registros"],
+            "predicciones_guardadas": estadisticas["predicciones"]["total_registros"]
         }
     except Exception as e:
         logger.error(f"Error consultando estado BD: {e}")
@@ -1,25 +1,99 @@
 # Módulo de Scraping y Cache de Precios Públicos de Camarón
 # Consulta fuentes públicas de internet y cachea resultados diarios
 
-import requests
-from bs4 import BeautifulSoup
 import json
 import logging
 from datetime import datetime, date, timedelta
 from pathlib import Path
-from typing import Dict, Any, Optional, List, Tuple
+from typing import Dict, Any, Optional, List, Tuple, Callable
 import os
-import re
+import threading
+import time
+import numpy as np
+
+from http_cache import HttpCache, CachedResponse
+import upstream_replay
+import metrics
+import tracing
+from single_flight import single_flight
+from predictor import calibre_publico_para
+from lazy_imports import lazy_module
+from market_parsers import (
+    CaliberLookup,
+    extract_selina_vars,
+    parse_freezeocean_products,
+    parse_selina_ajax_prices,
+    parse_selina_page_prices,
+)
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# requests / BeautifulSoup (+lxml) se importan al primer scraping, no al importar el módulo
+requests = lazy_module("requests")
+bs4 = lazy_module("bs4")
+
+
+class _FrozenDict(dict):
+    """
+    Dict inmutable para snapshots compartidos entre requests
+    Sigue siendo un dict (serializable por FastAPI/json), pero no admite mutaciones
+    """
+
+    def _readonly(self, *args, **kwargs):
+        raise TypeError("Snapshot de precios es inmutable")
+
+    __setitem__ = _readonly
+    __delitem__ = _readonly
+    __ior__ = _readonly
+    clear = _readonly
+    pop = _readonly
+    popitem = _readonly
+    setdefault = _readonly
+    update = _readonly
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+
+def _freeze(value: Any) -> Any:
+    """Convierte recursivamente dicts/listas en estructuras inmutables"""
+    if isinstance(value, dict):
+        return _FrozenDict((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+# Caché en memoria a nivel de proceso: ruta -> ((fecha, mtime_ns, tamaño), snapshot)
+_HOT_CACHE: Dict[str, Tuple[Tuple[str, int, int], Dict[str, Any]]] = {}
+_HOT_CACHE_LOCK = threading.Lock()
+
+
+def _hot_cache_put(cache_file: Path, fecha: str, snapshot: Dict[str, Any]) -> None:
+    """Registra un snapshot en la caché en memoria y descarta días anteriores"""
+    try:
+        stat = cache_file.stat()
+    except OSError:
+        return
+    stamp = (fecha, stat.st_mtime_ns, stat.st_size)
+    with _HOT_CACHE_LOCK:
+        for key in [k for k, (s, _) in _HOT_CACHE.items() if s[0] != fecha]:
+            del _HOT_CACHE[key]
+        _HOT_CACHE[str(cache_file)] = (stamp, snapshot)
+
 class MarketPriceScraper:
     """
     Scraper para obtener precios públicos de camarón de fuentes internet
     Implementa caché diario para evitar consultas repetidas
     """
     
-    CACHE_DIR = Path(__file__).parent / ".cache"
+    CACHE_DIR = Path(os.getenv("MARKET_CACHE_DIR") or Path(__file__).parent / ".cache")
     CACHE_FILE_PREFIX = "market_prices_"
     
     # Headers para evitar bloqueos en requests
@@ -50,40 +124,143 @@ class MarketPriceScraper:
     
     def __init__(self):
         """Inicializa el scraper y crea directorio de caché si no existe"""
-        self.CACHE_DIR.mkdir(exist_ok=True)
+        self.CACHE_DIR.mkdir(parents=True, exist_ok=True)
         self.today = date.today()
+        self.http_cache = HttpCache(self.CACHE_DIR / "http")
+        self.session = requests.Session()
+    
+    def _fetch(self, url: str, method: str = "GET", params: Optional[Dict[str, Any]] = None,
+               data: Optional[Dict[str, Any]] = None, timeout: int = 10) -> CachedResponse:
+        """
+        Request HTTP condicional (If-None-Match / If-Modified-Since) contra la caché en disco
+        En 304 se sirve el cuerpo guardado sin volver a descargarlo
+        """
+        key = HttpCache.make_key(method, url, params, data)
+        entry = self.http_cache.get_entry(key)
+        recording = upstream_replay.is_recording()
+        # Al grabar fixtures se pide siempre el cuerpo completo (nunca un 304)
+        conditional = {} if recording else HttpCache.conditional_headers(entry)
+        headers = {**self.HEADERS, **conditional}
+        target = upstream_replay.route(url)
+        
+        response = self._send(method, url, target, headers, params, data, timeout)
+        if conditional:
+            metrics.record_cache("http_conditional", response.status_code == 304)
+        
+        if response.status_code == 304 and entry:
+            body = self.http_cache.load_body(key)
+            if body is not None:
+                self.http_cache.touch(key, entry, response.headers)
+                logger.info(f"  ↺ 304 Not Modified: {url}")
+                return CachedResponse(200, body, dict(response.headers), entry.get("encoding"), key,
+                                      entry["sha256"], unchanged=True, not_modified=True, url=url)
+            response = self._send(method, url, target, self.HEADERS, params, data, timeout)
+        
+        if recording:
+            upstream_replay.record(method, url, params, data, response.status_code, response.headers, response.content)
+        
+        if response.status_code != 200:
+            return CachedResponse(response.status_code, response.content, dict(response.headers),
+                                  response.encoding, key, "", url=url)
+        
+        meta = self.http_cache.store(key, url, response.content, response.headers, response.encoding, previous=entry)
+        unchanged = bool(entry) and entry.get("sha256") == meta["sha256"]
+        return CachedResponse(200, response.content, dict(response.headers), response.encoding, key,
+                              meta["sha256"], unchanged=unchanged, url=url)
+    
+    def _send(self, method: str, url: str, target: str, headers: Dict[str, str],
+              params: Optional[Dict[str, Any]], data: Optional[Dict[str, Any]], timeout: int):
+        """Request saliente con métricas de latencia / errores y span por host de origen"""
+        with tracing.span(f"http.{method.lower()}", **{"http.url": url, "peer.service": metrics.source_of(url)}) as s:
+            start = time.perf_counter()
+            try:
+                response = self.session.request(method, target, headers=headers, params=params, data=data, timeout=timeout)
+            except Exception as e:
+                metrics.observe_upstream(url, time.perf_counter() - start, error=e)
+                raise
+            metrics.observe_upstream(url, time.perf_counter() - start, status=response.status_code)
+            if s is not None:
+                s.set_attribute("http.status_code", response.status_code)
+            return response
+    
+    def _parse_cached(self, response: CachedResponse, parse: Callable[[CachedResponse], Any]) -> Any:
+        """Omite el parseo si el contenido no cambió desde la última ejecución"""
+        if response.unchanged and response.sha256:
+            parsed = self.http_cache.get_parsed(response.cache_key, response.sha256)
+            metrics.record_cache("http_parsed", parsed is not None)
+            if parsed is not None:
+                logger.info(f"  ↺ Sin cambios, reutilizando resultado parseado: {response.url}")
+                return parsed
+        
+        parsed = parse(response)
+        if response.sha256:
+            self.http_cache.store_parsed(response.cache_key, response.sha256, parsed)
+        return parsed
         
     def _get_cache_file(self) -> Path:
         """Retorna la ruta del archivo de caché para hoy"""
         return self.CACHE_DIR / f"{self.CACHE_FILE_PREFIX}{self.today}.json"
     
     def _load_cache(self) -> Optional[Dict[str, Any]]:
-        """Carga datos de caché si existen para hoy"""
+        """
+        Carga datos de caché si existen para hoy
+        El archivo se parsea una sola vez por proceso; mientras su mtime no cambie
+        se sirve el mismo snapshot inmutable desde memoria
+        """
         cache_file = self._get_cache_file()
+        fecha = str(self.today)
         
-        if cache_file.exists():
-            try:
-                with open(cache_file, 'r') as f:
-                    cache_data = json.load(f)
-                    logger.info(f"✓ Datos de caché cargados para {self.today}")
-                    return cache_data
-            except Exception as e:
-                logger.warning(f"Error cargando caché: {e}")
-                return None
+        try:
+            stat = cache_file.stat()
+        except OSError:
+            metrics.record_cache("market_prices_daily", False)
+            return None
+        metrics.record_cache("market_prices_daily", True)
+        
+        stamp = (fecha, stat.st_mtime_ns, stat.st_size)
+        with _HOT_CACHE_LOCK:
+            entry = _HOT_CACHE.get(str(cache_file))
+        metrics.record_cache("market_prices_memory", bool(entry and entry[0] == stamp))
+        if entry and entry[0] == stamp:
+            logger.debug(f"Caché en memoria para {fecha}")
+            return entry[1]
+        
+        try:
+            raw = cache_file.read_bytes()
+            cache_data = orjson.loads(raw) if ORJSON_AVAILABLE else json.loads(raw)
+        except Exception as e:
+            logger.warning(f"Error cargando caché: {e}")
+            return None
         
-        return None
+        snapshot = _freeze(cache_data)
+        with _HOT_CACHE_LOCK:
+            _HOT_CACHE[str(cache_file)] = (stamp, snapshot)
+        logger.info(f"✓ Datos de caché cargados para {fecha}")
+        return snapshot
     
     def _save_cache(self, data: Dict[str, Any]) -> bool:
-        """Guarda datos en caché con fecha actual"""
+        """Guarda datos en caché con fecha actual (formato compacto, escritura atómica)"""
         cache_file = self._get_cache_file()
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.tmp")
         
         try:
-            with open(cache_file, 'w') as f:
-                json.dump(data, f, indent=2, default=str)
+            if ORJSON_AVAILABLE:
+                payload = orjson.dumps(data, default=str)
+            else:
+                payload = json.dumps(data, separators=(',', ':'), default=str).encode('utf-8')
+            tmp_file.write_bytes(payload)
+            os.replace(tmp_file, cache_file)
+            # El snapshot en memoria se arma desde el payload escrito para ser idéntico a una carga en frío
+            parsed = orjson.loads(payload) if ORJSON_AVAILABLE else json.loads(payload)
+            _hot_cache_put(cache_file, str(self.today), _freeze(parsed))
             logger.info(f"✓ Datos de caché guardados para {self.today}")
             return True
         except Exception as e:
             logger.error(f"Error guardando caché: {e}")
+            try:
+                tmp_file.unlink()
+            except OSError:
+                pass
             return False
     
     def scrape_alibaba_prices(self) -> Dict[str, Any]:
@@ -108,34 +285,16 @@ class MarketPriceScraper:
                     # URL de búsqueda Alibaba
                     url = f"https://www.alibaba.com/trade/search?SearchText={query}"
                     
-                    response = requests.get(url, headers=self.HEADERS, timeout=10)
+                    response = self._fetch(url, timeout=10)
                     response.raise_for_status()
                     
-                    soup = BeautifulSoup(response.content, 'lxml')
-                    
-                    # Buscar elementos de precio (estructura Alibaba)
-                    price_elements = soup.find_all('span', {'class': 'search-card-e-price'})
-                    
-                    for elem in price_elements[:5]:  # Top 5 resultados
-                        price_text = elem.get_text(strip=True)
-                        # Extraer precio numérico (ej: "$2.50-$3.00/Piece")
-                        if '$' in price_text:
-                            # Procesar para extraer rango de precios
-                            parts = price_text.split('-')
-                            if len(parts) >= 2:
-                                try:
-                                    price_min = float(parts[0].replace('$', '').split('/')[0])
-                                    price_max = float(parts[1].split('/')[0].replace('$', '').strip())
-                                    avg_price = (price_min + price_max) / 2
-                                    
-                                    # Mapear a calibre si es posible
-                                    for cal, label in self.CALIBER_MAPPING.items():
-                                        if label in query.lower():
-                                            if cal not in prices_by_caliber:
-                                                prices_by_caliber[cal] = []
-                                            prices_by_caliber[cal].append(avg_price)
-                                except:
-                                    pass
+                    for avg_price in self._parse_cached(response, self._parse_alibaba_listing):
+                        # Mapear a calibre si es posible
+                        for cal, label in self.CALIBER_MAPPING.items():
+                            if label in query.lower():
+                                if cal not in prices_by_caliber:
+                                    prices_by_caliber[cal] = []
+                                prices_by_caliber[cal].append(avg_price)
                 except Exception as e:
                     logger.warning(f"Error scraping query '{query}': {e}")
             
@@ -157,6 +316,30 @@ class MarketPriceScraper:
             logger.error(f"Error en scrape_alibaba_prices: {e}")
             return {}
     
+    @staticmethod
+    def _parse_alibaba_listing(response: CachedResponse) -> List[float]:
+        """Precios promedio de los 5 primeros resultados de búsqueda de Alibaba"""
+        soup = bs4.BeautifulSoup(response.content, 'lxml')
+        
+        # Buscar elementos de precio (estructura Alibaba)
+        price_elements = soup.find_all('span', {'class': 'search-card-e-price'})
+        
+        avg_prices = []
+        for elem in price_elements[:5]:  # Top 5 resultados
+            price_text = elem.get_text(strip=True)
+            # Extraer precio numérico (ej: "$2.50-$3.00/Piece")
+            if '$' in price_text:
+                # Procesar para extraer rango de precios
+                parts = price_text.split('-')
+                if len(parts) >= 2:
+                    try:
+                        price_min = float(parts[0].replace('$', '').split('/')[0])
+                        price_max = float(parts[1].split('/')[0].replace('$', '').strip())
+                        avg_prices.append((price_min + price_max) / 2)
+                    except:
+                        pass
+        return avg_prices
+    
     def get_fao_market_index(self) -> Dict[str, Any]:
         """
         Obtiene el Índice de Precios de Alimentos de la FAO
@@ -203,32 +386,10 @@ class MarketPriceScraper:
             
             url = "https://tradingeconomics.com/commodities"
             
-            response = requests.get(url, headers=self.HEADERS, timeout=10)
+            response = self._fetch(url, timeout=10)
             response.raise_for_status()
             
-            soup = BeautifulSoup(response.content, 'lxml')
-            
-            # Buscar datos de pescado/mariscos en la página
-            seafood_data = {}
-            
-            # Estructura genérica (requiere inspección HTML real de TE)
-            rows = soup.find_all('tr')
-            
-            for row in rows:
-                cells = row.find_all('td')
-                if len(cells) >= 4:
-                    commodity = cells[0].get_text(strip=True)
-                    if 'shrimp' in commodity.lower() or 'camaron' in commodity.lower():
-                        try:
-                            price = float(cells[1].get_text(strip=True).replace('$', ''))
-                            change = cells[2].get_text(strip=True)
-                            seafood_data[commodity] = {
-                                'precio': price,
-                                'cambio': change,
-                                'fuente': 'TradingEconomics'
-                            }
-                        except:
-                            pass
+            seafood_data = self._parse_cached(response, self._parse_trading_economics)
             
             logger.info(f"✓ Trading Economics: {len(seafood_data)} commodities")
             return seafood_data
@@ -237,6 +398,34 @@ class MarketPriceScraper:
             logger.error(f"Error en get_trading_economics_data: {e}")
             return {}
 
+    @staticmethod
+    def _parse_trading_economics(response: CachedResponse) -> Dict[str, Any]:
+        """Filas de commodities de camarón en la tabla de Trading Economics"""
+        soup = bs4.BeautifulSoup(response.content, 'lxml')
+        
+        # Buscar datos de pescado/mariscos en la página
+        seafood_data = {}
+        
+        # Estructura genérica (requiere inspección HTML real de TE)
+        rows = soup.find_all('tr')
+        
+        for row in rows:
+            cells = row.find_all('td')
+            if len(cells) >= 4:
+                commodity = cells[0].get_text(strip=True)
+                if 'shrimp' in commodity.lower() or 'camaron' in commodity.lower():
+                    try:
+                        price = float(cells[1].get_text(strip=True).replace('$', ''))
+                        change = cells[2].get_text(strip=True)
+                        seafood_data[commodity] = {
+                            'precio': price,
+                            'cambio': change,
+                            'fuente': 'TradingEconomics'
+                        }
+                    except:
+                        pass
+        return seafood_data
+
     def scrape_selina_wamucii(self) -> Dict[str, Any]:
         """
         Obtiene precio promedio de camarón en Ecuador (USD/lb)
@@ -246,21 +435,15 @@ class MarketPriceScraper:
             logger.info("🌐 Consultando Selina Wamucii (Ecuador shrimp)...")
             url = "https://www.selinawamucii.com/insights/prices/ecuador/shrimps-prawns/"
 
-            response = requests.get(url, headers=self.HEADERS, timeout=12)
+            response = self._fetch(url, timeout=12)
             response.raise_for_status()
 
             html = response.text
-            soup = BeautifulSoup(response.content, 'lxml')
-            text = soup.get_text(" ", strip=True)
-
-            def _extract_var(pattern: str) -> Optional[str]:
-                match = re.search(pattern, html, re.IGNORECASE)
-                return match.group(1) if match else None
-
-            produce_id = _extract_var(r"var\s+produce_id\s*=\s*\"([^\"]+)\"")
-            country_id = _extract_var(r"var\s+country_id\s*=\s*\"([^\"]+)\"")
-            nonce = _extract_var(r"var\s+nonce\s*=\s*\"([^\"]+)\"")
-            produce_category = _extract_var(r"var\s+produce_category\s*=\s*(\d+)")
+            selina_vars = extract_selina_vars(html)
+            produce_id = selina_vars["produce_id"]
+            country_id = selina_vars["country_id"]
+            nonce = selina_vars["nonce"]
+            produce_category = selina_vars["produce_category"]
 
             prices: List[float] = []
 
@@ -276,58 +459,21 @@ class MarketPriceScraper:
                     "filtering": "true"
                 }
 
-                ajax_response = requests.post(ajax_url, headers=self.HEADERS, data=payload, timeout=15)
+                ajax_response = self._fetch(ajax_url, method="POST", data=payload, timeout=15)
                 if ajax_response.status_code == 200:
-                    try:
-                        ajax_data = ajax_response.json()
-                        ajax_text = json.dumps(ajax_data)
-                    except Exception:
-                        ajax_text = ajax_response.text
+                    def _parse_ajax(resp: CachedResponse) -> List[float]:
+                        try:
+                            ajax_payload = resp.json()
+                        except Exception:
+                            ajax_payload = resp.text
+                        return parse_selina_ajax_prices(ajax_payload)
 
                     # Buscar valores en USD/lb o USD/kg dentro de la respuesta
-                    lb_matches = re.findall(
-                        r"\$\s*([0-9]+(?:\.[0-9]+)?)\s*(?:/\s*lb|per\s*lb|per\s*pound)",
-                        ajax_text,
-                        re.IGNORECASE
-                    )
-                    prices.extend([float(m) for m in lb_matches if m])
-
-                    if not prices:
-                        kg_matches = re.findall(
-                            r"\$\s*([0-9]+(?:\.[0-9]+)?)\s*(?:/\s*kg|per\s*kg|per\s*kilogram)",
-                            ajax_text,
-                            re.IGNORECASE
-                        )
-                        for m in kg_matches:
-                            try:
-                                prices.append(float(m) / 2.20462)
-                            except Exception:
-                                pass
+                    prices.extend(self._parse_cached(ajax_response, _parse_ajax))
 
             # Fallback HTML: rango por libra o por kilo en el texto público
             if not prices:
-                range_per_lb = re.findall(
-                    r"between\s+US\$\s*([0-9]+(?:\.[0-9]+)?)\s+and\s+US\$\s*([0-9]+(?:\.[0-9]+)?)\s+per\s+pound",
-                    text,
-                    re.IGNORECASE
-                )
-                for a, b in range_per_lb:
-                    try:
-                        prices.append((float(a) + float(b)) / 2)
-                    except Exception:
-                        pass
-
-            if not prices:
-                range_per_kg = re.findall(
-                    r"between\s+US\$\s*([0-9]+(?:\.[0-9]+)?)\s+and\s+US\$\s*([0-9]+(?:\.[0-9]+)?)\s+per\s+kilogram",
-                    text,
-                    re.IGNORECASE
-                )
-                for a, b in range_per_kg:
-                    try:
-                        prices.append(((float(a) + float(b)) / 2) / 2.20462)
-                    except Exception:
-                        pass
+                prices = self._parse_cached(response, lambda resp: parse_selina_page_prices(html))
 
             if not prices:
                 return {}
@@ -356,154 +502,17 @@ class MarketPriceScraper:
                 "per_page": 100
             }
 
-            response = requests.get(api_url, headers=self.HEADERS, params=params, timeout=12)
+            response = self._fetch(api_url, params=params, timeout=12)
             response.raise_for_status()
 
-            try:
-                products = response.json()
-            except Exception:
-                products = []
-
-            def _strip_html(value: str) -> str:
-                if not value:
-                    return ""
-                return BeautifulSoup(value, "lxml").get_text(" ", strip=True)
-
-            def _to_float(value: str) -> Optional[float]:
-                if not value:
-                    return None
+            def _parse_products(resp: CachedResponse) -> Dict[str, Any]:
                 try:
-                    return float(value.replace(",", ".").strip())
+                    products = resp.json()
                 except Exception:
-                    return None
-
-            def _map_size_to_caliber(size: int) -> Optional[str]:
-                for key in self.CALIBER_MAPPING.keys():
-                    try:
-                        low, high = key.split("/")
-                        if int(low) <= size <= int(high):
-                            return key
-                    except Exception:
-                        continue
-                return None
-
-            def _normalize_caliber(start: int, end: int) -> Optional[str]:
-                raw = f"{start}/{end}"
-                if raw in self.CALIBER_MAPPING:
-                    return raw
-
-                target_mid = (start + end) / 2
-                best_key = None
-                best_diff = None
-
-                for key in self.CALIBER_MAPPING.keys():
-                    try:
-                        low, high = key.split("/")
-                        mid = (int(low) + int(high)) / 2
-                        diff = abs(mid - target_mid)
-                        if best_diff is None or diff < best_diff:
-                            best_diff = diff
-                            best_key = key
-                    except Exception:
-                        continue
-
-                if best_diff is not None and best_diff <= 6:
-                    return best_key
-
-                return None
-
-            def _extract_caliber(text: str) -> Optional[str]:
-                if not text:
-                    return None
-
-                range_pattern = re.compile(
-                    r"(\d{2})\s*[–-]\s*(\d{2})\s*(?:u|unidades|und|u\.|en\s*libra|lb)",
-                    re.IGNORECASE
-                )
-                match = range_pattern.search(text)
-                if match:
-                    start, end = match.groups()
-                    try:
-                        return _normalize_caliber(int(start), int(end))
-                    except Exception:
-                        return None
-
-                talla_match = re.search(r"talla\s*(\d{2})", text, re.IGNORECASE)
-                if talla_match:
-                    try:
-                        size = int(talla_match.group(1))
-                        return _map_size_to_caliber(size)
-                    except Exception:
-                        return None
-
-                return None
-
-            def _extract_price_per_lb(text: str) -> Optional[float]:
-                if not text:
-                    return None
-
-                lb_patterns = [
-                    r"(?:precio\s*:)?\s*libra\s*[:\-]?\s*\$?\s*([0-9]+(?:[\.,][0-9]+)?)",
-                    r"(?:lb|libra)\s*\$?\s*([0-9]+(?:[\.,][0-9]+)?)"
-                ]
-                for pattern in lb_patterns:
-                    match = re.search(pattern, text, re.IGNORECASE)
-                    if match:
-                        value = _to_float(match.group(1))
-                        if value:
-                            return value
-
-                kg_match = re.search(r"(?:kilo|kg)\s*[:\-]?\s*\$?\s*([0-9]+(?:[\.,][0-9]+)?)", text, re.IGNORECASE)
-                if kg_match:
-                    value = _to_float(kg_match.group(1))
-                    if value:
-                        return value / 2.20462
-
-                return None
-
-            prices_by_caliber: Dict[str, List[float]] = {}
-
-            for product in products if isinstance(products, list) else []:
-                name = product.get("name", "")
-                short_desc = product.get("short_description", "")
-                description = product.get("description", "")
-                combined = " ".join([
-                    _strip_html(name),
-                    _strip_html(short_desc),
-                    _strip_html(description)
-                ]).strip()
-
-                if not combined:
-                    continue
-
-                caliber = _extract_caliber(combined)
-                if not caliber:
-                    continue
-
-                price_per_lb = _extract_price_per_lb(combined)
-                if price_per_lb is None:
-                    prices_data = product.get("prices", {}) if isinstance(product, dict) else {}
-                    raw_price = prices_data.get("price")
-                    minor_unit = prices_data.get("currency_minor_unit", 2)
-                    try:
-                        if raw_price is not None:
-                            price_per_lb = float(raw_price) / (10 ** int(minor_unit))
-                    except Exception:
-                        price_per_lb = None
-
-                if price_per_lb is None:
-                    continue
+                    products = []
+                return parse_freezeocean_products(products, _CALIBER_LOOKUP)
 
-                prices_by_caliber.setdefault(caliber, []).append(price_per_lb)
-
-            result = {}
-            for cal, prices in prices_by_caliber.items():
-                if prices:
-                    result[cal] = {
-                        "precio_promedio": round(sum(prices) / len(prices), 3),
-                        "cantidad_fuentes": len(prices),
-                        "fuente": "FreezeOcean"
-                    }
+            result = self._parse_cached(response, _parse_products)
 
             logger.info(f"✓ FreezeOcean: {len(result)} calibres encontrados")
             return result
@@ -553,28 +562,16 @@ class MarketPriceScraper:
                             "&rg=2&reporter=218&partner=0&fmt=json"
                         )
 
-                        response = requests.get(url, headers=self.HEADERS, timeout=15)
+                        response = self._fetch(url, timeout=15)
                         if response.status_code != 200:
                             logger.warning(f"Comtrade HTTP {response.status_code} para {code} ({freq}-{y})")
                             continue
 
-                        data = response.json()
-                        dataset = data.get("dataset", [])
-                        if not dataset:
-                            continue
-
-                        # Tomar el periodo más reciente con datos válidos
-                        dataset_sorted = sorted(dataset, key=lambda d: d.get("period", 0), reverse=True)
-                        for row in dataset_sorted:
-                            trade_value = row.get("tradeValue")
-                            net_weight = row.get("netWeight")
-                            period = row.get("period")
-                            if trade_value and net_weight and net_weight > 0:
-                                usd_per_kg = trade_value / net_weight
-                                usd_per_lb = usd_per_kg / 2.20462
-                                unit_values.append(usd_per_lb)
-                                latest_period = period if latest_period is None else max(latest_period, period)
-                                break
+                        latest = self._parse_cached(response, self._parse_comtrade_latest)
+                        if latest:
+                            unit_values.append(latest["usd_per_lb"])
+                            period = latest["period"]
+                            latest_period = period if latest_period is None else max(latest_period, period)
                         if unit_values:
                             break
                     if unit_values:
@@ -597,6 +594,22 @@ class MarketPriceScraper:
             logger.error(f"Error en get_comtrade_unit_value: {e}")
             return {}
     
+    @staticmethod
+    def _parse_comtrade_latest(response: CachedResponse) -> Dict[str, Any]:
+        """Valor unitario USD/lb del periodo más reciente con datos válidos ({} si no hay)"""
+        data = response.json()
+        dataset = data.get("dataset", [])
+        
+        # Tomar el periodo más reciente con datos válidos
+        dataset_sorted = sorted(dataset, key=lambda d: d.get("period", 0), reverse=True)
+        for row in dataset_sorted:
+            trade_value = row.get("tradeValue")
+            net_weight = row.get("netWeight")
+            if trade_value and net_weight and net_weight > 0:
+                usd_per_kg = trade_value / net_weight
+                return {"usd_per_lb": usd_per_kg / 2.20462, "period": row.get("period")}
+        return {}
+    
     def get_public_market_prices(self, use_cache: bool = True) -> Dict[str, Any]:
         """
         Obtiene precios públicos del mercado desde múltiples fuentes
@@ -610,11 +623,22 @@ class MarketPriceScraper:
         """
         
         # Intentar cargar del caché primero
-        if use_cache:
+        if not use_cache:
+            return self._collect_public_market_prices()
+        
+        cached_data = self._load_cache()
+        if cached_data:
+            return cached_data
+        
+        # Un solo hilo/worker hace el scraping del día; el resto espera y lee su caché
+        with single_flight(f"market_prices:{self.CACHE_DIR}:{self.today}"):
             cached_data = self._load_cache()
             if cached_data:
                 return cached_data
-        
+            return self._collect_public_market_prices()
+    
+    def _collect_public_market_prices(self) -> Dict[str, Any]:
+        """Consulta todas las fuentes, consolida y guarda la caché del día"""
         logger.info("📊 Recopilando precios públicos del mercado...")
         
         all_prices = {
@@ -681,7 +705,7 @@ class MarketPriceScraper:
             all_prices['warnings'].append('sin_precios_consolidados')
         
         logger.info(f"✓ Precios públicos consolidados: {len(all_prices['precios_consolidados'])} calibres")
-        return all_prices
+        return _freeze(all_prices)
     
     def _consolidate_prices(self, sources: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -712,20 +736,21 @@ class MarketPriceScraper:
                 if caliber in sources['alibaba']:
                     precio = sources['alibaba'][caliber].get('precio_promedio')
                     if precio:
-                        prices_list.append((precio, source_weights['alibaba']))
+                        prices_list.append((precio, source_weights['alibaba'], 'alibaba'))
 
             if 'freezeocean' in sources:
                 if caliber in sources['freezeocean']:
                     precio = sources['freezeocean'][caliber].get('precio_promedio')
                     if precio:
-                        prices_list.append((precio, source_weights['freezeocean']))
+                        prices_list.append((precio, source_weights['freezeocean'], 'freezeocean'))
             
             # Si tenemos al menos una fuente
             if prices_list:
-                weighted_avg = sum(p * w for p, w in prices_list) / sum(w for _, w in prices_list)
+                weighted_avg = sum(p * w for p, w, _ in prices_list) / sum(w for _, w, _ in prices_list)
                 consolidado[caliber] = {
                     'precio_publico_promedio': round(weighted_avg, 3),
                     'cantidad_fuentes': len(prices_list),
+                    'fuentes': [fuente for _, _, fuente in prices_list],
                     'actualizado': str(self.today)
                 }
 
@@ -760,7 +785,8 @@ class MarketPriceScraper:
     def calculate_market_spread(self, 
                                caliber: str, 
                                presentacion: str,
-                               exporquilsa_price: float) -> Dict[str, Any]:
+                               exporquilsa_price: float,
+                               public_prices: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         """
         Calcula el spread entre precio de despacho (EXPORQUILSA)
         y precio público del mercado
@@ -769,38 +795,146 @@ class MarketPriceScraper:
             caliber: Ej "16/20", "21/25"
             presentacion: "HEADLESS" o "WHOLE"
             exporquilsa_price: Precio base de EXPORQUILSA para ese calibre
+            public_prices: Snapshot ya cargado de get_public_market_prices (evita recargarlo)
             
         Returns:
             Dict con análisis del spread
         """
         
-        public_prices = self.get_public_market_prices(use_cache=True)
+        if public_prices is None:
+            public_prices = self.get_public_market_prices(use_cache=True)
+        
+        matrix = compute_spread_matrix(public_prices, {presentacion: {caliber: exporquilsa_price}})
+        row = matrix['presentaciones'][presentacion][caliber]
         
-        if caliber not in public_prices.get('precios_consolidados', {}):
+        if row.get('status') == 'no_data':
             logger.warning(f"No hay datos públicos para calibre {caliber}")
-            return {
+        
+        return row
+
+    def calculate_spread_matrix(self,
+                                price_table: Dict[str, Dict[str, float]],
+                                public_prices: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Matriz de spreads para todos los calibres y presentaciones de la tabla de precios
+        Se calcula una sola vez por snapshot de precios públicos y tabla de despacho
+        """
+        if public_prices is None:
+            public_prices = self.get_public_market_prices(use_cache=True)
+        return get_spread_matrix(public_prices, price_table)
+
+
+def compute_spread_matrix(public_prices: Dict[str, Any],
+                          price_table: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
+    """
+    Calcula spreads, ratios y porcentajes mercado vs despacho para todas las
+    combinaciones (presentación, calibre) en una sola pasada vectorizada
+    
+    Args:
+        public_prices: Snapshot de get_public_market_prices
+        price_table: {presentacion: {calibre: precio_despacho}}
+        
+    Returns:
+        Dict con filas por presentación/calibre y resumen
+    """
+    consolidados = public_prices.get('precios_consolidados', {}) or {}
+    fecha = public_prices.get('fecha') or str(date.today())
+    
+    keys: List[Tuple[str, str, str]] = []
+    for presentacion, calibres in price_table.items():
+        for calibre in calibres:
+            calibre_publico = calibre
+            if calibre not in consolidados:
+                calibre_publico = calibre_publico_para(calibre, presentacion)
+            keys.append((presentacion, calibre, calibre_publico))
+    
+    base = np.array([price_table[p][c] or 0.0 for p, c, _ in keys], dtype=float)
+    publico = np.array([
+        consolidados[cp]['precio_publico_promedio'] if cp in consolidados else np.nan
+        for _, _, cp in keys
+    ], dtype=float)
+    
+    with np.errstate(divide='ignore', invalid='ignore'):
+        spread = publico - base
+        valid_base = base > 0
+        spread_pct = np.where(valid_base, spread / base * 100, 0.0)
+        ratio = np.where(valid_base, publico / base, 0.0)
+    has_data = ~np.isnan(publico)
+    
+    presentaciones: Dict[str, Dict[str, Any]] = {p: {} for p in price_table}
+    for i, (presentacion, calibre, calibre_publico) in enumerate(keys):
+        if not has_data[i]:
+            presentaciones[presentacion][calibre] = {
                 'status': 'no_data',
-                'caliber': caliber,
+                'caliber': calibre,
                 'mensaje': 'Sin datos públicos disponibles'
             }
-        
-        public_price = public_prices['precios_consolidados'][caliber]['precio_publico_promedio']
-        
-        # Calcular spread
-        spread_absoluto = public_price - exporquilsa_price
-        spread_porcentaje = (spread_absoluto / exporquilsa_price * 100) if exporquilsa_price > 0 else 0
-        
-        return {
-            'caliber': caliber,
+            continue
+        presentaciones[presentacion][calibre] = {
+            'caliber': calibre,
+            'calibre_publico': calibre_publico,
             'presentacion': presentacion,
-            'precio_exporquilsa': exporquilsa_price,
-            'precio_publico_promedio': public_price,
-            'spread_absoluto': round(spread_absoluto, 3),
-            'spread_porcentaje': round(spread_porcentaje, 2),
-            'ratio_mercado_despacho': round(public_price / exporquilsa_price, 3) if exporquilsa_price > 0 else 0,
-            'fecha': str(self.today),
+            'precio_exporquilsa': float(base[i]),
+            'precio_publico_promedio': float(publico[i]),
+            'spread_absoluto': round(float(spread[i]), 3),
+            'spread_porcentaje': round(float(spread_pct[i]), 2),
+            'ratio_mercado_despacho': round(float(ratio[i]), 3),
+            'fecha': fecha,
             'confiabilidad': 'media'  # Depende de fuentes disponibles
         }
+    
+    resumen = {'combinaciones': len(keys), 'con_datos': int(has_data.sum())}
+    if has_data.any():
+        resumen.update({
+            'spread_porcentaje_promedio': round(float(spread_pct[has_data].mean()), 2),
+            'spread_porcentaje_min': round(float(spread_pct[has_data].min()), 2),
+            'spread_porcentaje_max': round(float(spread_pct[has_data].max()), 2),
+            'ratio_promedio': round(float(ratio[has_data].mean()), 3)
+        })
+    
+    return {
+        'fecha': fecha,
+        'timestamp_precios': public_prices.get('timestamp'),
+        'presentaciones': presentaciones,
+        'resumen': resumen
+    }
+
+
+# Caché de la última matriz calculada: (fecha, timestamp, tabla) -> matriz
+_SPREAD_CACHE: Dict[str, Any] = {}
+_SPREAD_CACHE_LOCK = threading.Lock()
+
+
+def get_spread_matrix(public_prices: Dict[str, Any],
+                      price_table: Dict[str, Dict[str, float]]) -> Dict[str, Any]:
+    """Devuelve la matriz de spreads, recalculando solo si cambió el snapshot o la tabla"""
+    key = (
+        public_prices.get('fecha'),
+        public_prices.get('timestamp'),
+        tuple((p, tuple(sorted(c.items()))) for p, c in sorted(price_table.items()))
+    )
+    with _SPREAD_CACHE_LOCK:
+        hit = _SPREAD_CACHE.get('key') == key
+        matrix = _SPREAD_CACHE.get('matrix')
+    metrics.record_cache("spread_matrix", hit)
+    if hit:
+        return matrix
+    
+    matrix = _freeze(compute_spread_matrix(public_prices, price_table))
+    with _SPREAD_CACHE_LOCK:
+        _SPREAD_CACHE['key'] = key
+        _SPREAD_CACHE['matrix'] = matrix
+    return matrix
+
+
+def invalidate_spread_cache():
+    """Descarta la matriz de spreads en memoria (p.ej. al publicarse una tabla de precios nueva)"""
+    with _SPREAD_CACHE_LOCK:
+        _SPREAD_CACHE.clear()
+
+
+# Lookup talla -> calibre precomputado una vez por proceso
+_CALIBER_LOOKUP = CaliberLookup(MarketPriceScraper.CALIBER_MAPPING.keys())
 
 
 class PredictionOptimizer:
@@ -0,0 +1,267 @@
+# Parsers de páginas de precios públicos de camarón
+# Patrones precompilados y tablas de lookup para FreezeOcean y Selina Wamucii
+
+import html as html_lib
+import json
+import re
+from typing import Dict, Any, Optional, List, Iterable
+
+LB_PER_KG = 2.20462
+
+# ===== PATRONES PRECOMPILADOS =====
+
+_SCRIPT_STYLE_RE = re.compile(r"<(script|style)\b[^>]*>.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_TAG_RE = re.compile(r"<[^>]*>")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+# FreezeOcean: "16-20 u/lb", "talla 36", "Libra: $5,92", "Kilo $13.05"
+_RANGE_RE = re.compile(
+    r"(\d{2})\s*[–-]\s*(\d{2})\s*(?:u|unidades|und|u\.|en\s*libra|lb)",
+    re.IGNORECASE
+)
+_TALLA_RE = re.compile(r"talla\s*(\d{2})", re.IGNORECASE)
+_LB_PRICE_RES = (
+    re.compile(r"(?:precio\s*:)?\s*libra\s*[:\-]?\s*\$?\s*([0-9]+(?:[\.,][0-9]+)?)", re.IGNORECASE),
+    re.compile(r"(?:lb|libra)\s*\$?\s*([0-9]+(?:[\.,][0-9]+)?)", re.IGNORECASE),
+)
+_KG_PRICE_RE = re.compile(r"(?:kilo|kg)\s*[:\-]?\s*\$?\s*([0-9]+(?:[\.,][0-9]+)?)", re.IGNORECASE)
+
+# Selina Wamucii: variables JS de la página y precios en la respuesta AJAX
+_SELINA_VAR_RES = {
+    "produce_id": re.compile(r"var\s+produce_id\s*=\s*\"([^\"]+)\"", re.IGNORECASE),
+    "country_id": re.compile(r"var\s+country_id\s*=\s*\"([^\"]+)\"", re.IGNORECASE),
+    "nonce": re.compile(r"var\s+nonce\s*=\s*\"([^\"]+)\"", re.IGNORECASE),
+    "produce_category": re.compile(r"var\s+produce_category\s*=\s*(\d+)", re.IGNORECASE),
+}
+_SELINA_LB_RE = re.compile(
+    r"\$\s*([0-9]+(?:\.[0-9]+)?)\s*(?:/\s*lb|per\s*lb|per\s*pound)",
+    re.IGNORECASE
+)
+_SELINA_KG_RE = re.compile(
+    r"\$\s*([0-9]+(?:\.[0-9]+)?)\s*(?:/\s*kg|per\s*kg|per\s*kilogram)",
+    re.IGNORECASE
+)
+_SELINA_RANGE_LB_RE = re.compile(
+    r"between\s+US\$\s*([0-9]+(?:\.[0-9]+)?)\s+and\s+US\$\s*([0-9]+(?:\.[0-9]+)?)\s+per\s+pound",
+    re.IGNORECASE
+)
+_SELINA_RANGE_KG_RE = re.compile(
+    r"between\s+US\$\s*([0-9]+(?:\.[0-9]+)?)\s+and\s+US\$\s*([0-9]+(?:\.[0-9]+)?)\s+per\s+kilogram",
+    re.IGNORECASE
+)
+
+
+def strip_html(value: str) -> str:
+    """
+    Convierte HTML a texto plano sin construir un árbol DOM
+    Equivalente a BeautifulSoup(value).get_text(" ", strip=True) para descripciones de producto
+    """
+    if not value:
+        return ""
+    if "<" in value:
+        value = _SCRIPT_STYLE_RE.sub(" ", value)
+        value = _TAG_RE.sub(" ", value)
+    if "&" in value:
+        value = html_lib.unescape(value)
+    return _WHITESPACE_RE.sub(" ", value).strip()
+
+
+def _to_float(value: str) -> Optional[float]:
+    if not value:
+        return None
+    try:
+        return float(value.replace(",", ".").strip())
+    except Exception:
+        return None
+
+
+class CaliberLookup:
+    """
+    Tablas precomputadas talla -> calibre comercial
+
+    - by_size: índice directo por talla (unidades/lb) al calibre cuyo intervalo la contiene
+    - by_sum: índice por (inicio + fin) de un rango al calibre con punto medio más cercano (≤ 6)
+    """
+
+    MAX_MID_DIFF = 6
+
+    def __init__(self, calibers: Iterable[str]):
+        self.calibers = tuple(calibers)
+        self._known = frozenset(self.calibers)
+
+        intervals = []
+        for key in self.calibers:
+            try:
+                low, high = key.split("/")
+                intervals.append((key, int(low), int(high)))
+            except Exception:
+                continue
+
+        max_size = max((high for _, _, high in intervals), default=0)
+        self.by_size: List[Optional[str]] = [None] * (max_size + 1)
+        # Primer intervalo en orden de declaración gana (mismo criterio que el escaneo lineal)
+        for key, low, high in reversed(intervals):
+            for size in range(max(low, 0), high + 1):
+                self.by_size[size] = key
+
+        # Rangos de dos dígitos: inicio + fin ∈ [0, 198]
+        self.by_sum: List[Optional[str]] = [None] * 199
+        for total in range(len(self.by_sum)):
+            target_mid = total / 2
+            best_key = None
+            best_diff = None
+            for key, low, high in intervals:
+                diff = abs((low + high) / 2 - target_mid)
+                if best_diff is None or diff < best_diff:
+                    best_diff = diff
+                    best_key = key
+            if best_diff is not None and best_diff <= self.MAX_MID_DIFF:
+                self.by_sum[total] = best_key
+
+    def from_size(self, size: int) -> Optional[str]:
+        if 0 <= size < len(self.by_size):
+            return self.by_size[size]
+        return None
+
+    def from_range(self, start: int, end: int) -> Optional[str]:
+        raw = f"{start}/{end}"
+        if raw in self._known:
+            return raw
+        total = start + end
+        if 0 <= total < len(self.by_sum):
+            return self.by_sum[total]
+        return None
+
+
+def extract_caliber(text: str, lookup: CaliberLookup) -> Optional[str]:
+    """Extrae el calibre comercial de una descripción de producto"""
+    if not text:
+        return None
+
+    match = _RANGE_RE.search(text)
+    if match:
+        start, end = match.groups()
+        return lookup.from_range(int(start), int(end))
+
+    talla_match = _TALLA_RE.search(text)
+    if talla_match:
+        return lookup.from_size(int(talla_match.group(1)))
+
+    return None
+
+
+def extract_price_per_lb(text: str) -> Optional[float]:
+    """Extrae el precio por libra (o por kilo convertido) de una descripción"""
+    if not text:
+        return None
+
+    for pattern in _LB_PRICE_RES:
+        match = pattern.search(text)
+        if match:
+            value = _to_float(match.group(1))
+            if value:
+                return value
+
+    kg_match = _KG_PRICE_RE.search(text)
+    if kg_match:
+        value = _to_float(kg_match.group(1))
+        if value:
+            return value / LB_PER_KG
+
+    return None
+
+
+def parse_freezeocean_products(products: Any, lookup: CaliberLookup) -> Dict[str, Any]:
+    """
+    Agrupa precios USD/lb por calibre desde la respuesta de la Store API de FreezeOcean
+
+    Returns:
+        Dict {calibre: {precio_promedio, cantidad_fuentes, fuente}}
+    """
+    prices_by_caliber: Dict[str, List[float]] = {}
+
+    for product in products if isinstance(products, list) else []:
+        if not isinstance(product, dict):
+            continue
+        combined = " ".join([
+            strip_html(product.get("name", "")),
+            strip_html(product.get("short_description", "")),
+            strip_html(product.get("description", ""))
+        ]).strip()
+
+        if not combined:
+            continue
+
+        caliber = extract_caliber(combined, lookup)
+        if not caliber:
+            continue
+
+        price_per_lb = extract_price_per_lb(combined)
+        if price_per_lb is None:
+            prices_data = product.get("prices", {}) or {}
+            raw_price = prices_data.get("price")
+            minor_unit = prices_data.get("currency_minor_unit", 2)
+            try:
+                if raw_price is not None:
+                    price_per_lb = float(raw_price) / (10 ** int(minor_unit))
+            except Exception:
+                price_per_lb = None
+
+        if price_per_lb is None:
+            continue
+
+        prices_by_caliber.setdefault(caliber, []).append(price_per_lb)
+
+    result = {}
+    for cal, prices in prices_by_caliber.items():
+        if prices:
+            result[cal] = {
+                "precio_promedio": round(sum(prices) / len(prices), 3),
+                "cantidad_fuentes": len(prices),
+                "fuente": "FreezeOcean"
+            }
+    return result
+
+
+def extract_selina_vars(page_html: str) -> Dict[str, Optional[str]]:
+    """Extrae produce_id, country_id, nonce y produce_category de la página de Selina Wamucii"""
+    result = {}
+    for name, pattern in _SELINA_VAR_RES.items():
+        match = pattern.search(page_html)
+        result[name] = match.group(1) if match else None
+    return result
+
+
+def parse_selina_ajax_prices(ajax_payload: Any) -> List[float]:
+    """Precios USD/lb presentes en la respuesta AJAX (texto o JSON ya decodificado)"""
+    ajax_text = ajax_payload if isinstance(ajax_payload, str) else json.dumps(ajax_payload)
+
+    prices = [float(m) for m in _SELINA_LB_RE.findall(ajax_text) if m]
+    if not prices:
+        for m in _SELINA_KG_RE.findall(ajax_text):
+            try:
+                prices.append(float(m) / LB_PER_KG)
+            except Exception:
+                pass
+    return prices
+
+
+def parse_selina_page_prices(page_html: str) -> List[float]:
+    """Fallback: rango 'between US$ a and US$ b per pound/kilogram' en el texto público"""
+    text = strip_html(page_html)
+    prices = []
+
+    for a, b in _SELINA_RANGE_LB_RE.findall(text):
+        try:
+            prices.append((float(a) + float(b)) / 2)
+        except Exception:
+            pass
+
+    if not prices:
+        for a, b in _SELINA_RANGE_KG_RE.findall(text):
+            try:
+                prices.append(((float(a) + float(b)) / 2) / LB_PER_KG)
+            except Exception:
+                pass
+
+    return prices
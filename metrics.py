@@ -0,0 +1,264 @@
+# Métricas del microservicio en formato de exposición Prometheus
+# Latencia por ruta, tiempos por etapa de predicción, cachés, BD y servicios externos
+#
+# Sin dependencias externas: contadores e histogramas en memoria, protegidos con lock
+# y renderizados como texto en GET /metrics
+
+import functools
+import threading
+import time
+from typing import Dict, Any, Optional, Tuple, Callable, List
+from urllib.parse import urlsplit
+
+# Buckets en segundos (mismos por defecto que el cliente oficial de Prometheus + 30s para scraping)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    TYPE = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.TYPE}"]
+
+
+class Counter(_Metric):
+    """Contador monotónico con etiquetas"""
+
+    TYPE = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def values(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for key, value in sorted(self.values().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value:g}")
+        return lines
+
+
+class Histogram(_Metric):
+    """Histograma acumulativo (buckets le=...) con _sum y _count por combinación de etiquetas"""
+
+    TYPE = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # [conteo por bucket..., +Inf, sum]
+                series = self._series[key] = [0.0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+                    break
+            else:
+                series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._series.items())
+        for key, series in items:
+            cumulative = 0.0
+            for i, bound in enumerate(self.buckets):
+                cumulative += series[i]
+                labels = _format_labels(self.labelnames, key, 'le="%g"' % bound)
+                lines.append(f"{self.name}_bucket{labels} {cumulative:g}")
+            cumulative += series[len(self.buckets)]
+            labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative:g}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {cumulative:g}")
+        return lines
+
+
+# ===== MÉTRICAS DEL SERVICIO =====
+
+REQUEST_LATENCY = Histogram(
+    "maransa_http_request_duration_seconds",
+    "Latencia de requests HTTP por ruta (plantilla), método y status",
+    ("method", "route", "status")
+)
+STAGE_LATENCY = Histogram(
+    "maransa_stage_duration_seconds",
+    "Tiempo por etapa interna de los endpoints de predicción",
+    ("endpoint", "stage")
+)
+CACHE_REQUESTS = Counter(
+    "maransa_cache_requests_total",
+    "Consultas a cachés internas por resultado (hit/miss)",
+    ("cache", "result")
+)
+DB_QUERIES = Counter(
+    "maransa_db_queries_total",
+    "Operaciones de PriceDatabase por método y resultado",
+    ("operation", "status")
+)
+DB_LATENCY = Histogram(
+    "maransa_db_query_duration_seconds",
+    "Duración de operaciones de PriceDatabase por método",
+    ("operation",)
+)
+UPSTREAM_REQUESTS = Counter(
+    "maransa_upstream_requests_total",
+    "Requests a servicios externos por host y status HTTP",
+    ("source", "status")
+)
+UPSTREAM_ERRORS = Counter(
+    "maransa_upstream_errors_total",
+    "Errores de servicios externos por host y tipo (http_4xx, http_5xx o excepción)",
+    ("source", "kind")
+)
+UPSTREAM_LATENCY = Histogram(
+    "maransa_upstream_request_duration_seconds",
+    "Latencia de servicios externos por host",
+    ("source",)
+)
+
+_ALL_METRICS = (
+    REQUEST_LATENCY, STAGE_LATENCY, CACHE_REQUESTS, DB_QUERIES, DB_LATENCY,
+    UPSTREAM_REQUESTS, UPSTREAM_ERRORS, UPSTREAM_LATENCY
+)
+
+
+# ===== HELPERS DE INSTRUMENTACIÓN =====
+
+def record_cache(cache: str, hit: bool):
+    """Registra un hit o miss de una caché interna"""
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def source_of(url: str) -> str:
+    """Etiqueta de servicio externo: host de la URL"""
+    return urlsplit(url).netloc or url
+
+
+def observe_upstream(url: str, seconds: float, status: Optional[int] = None,
+                     error: Optional[BaseException] = None):
+    """Registra latencia, status y errores de una request saliente"""
+    source = source_of(url)
+    UPSTREAM_LATENCY.observe(seconds, source=source)
+    if error is not None:
+        UPSTREAM_REQUESTS.inc(source=source, status="error")
+        UPSTREAM_ERRORS.inc(source=source, kind=type(error).__name__)
+        return
+    UPSTREAM_REQUESTS.inc(source=source, status=str(status))
+    if status is not None and status >= 400:
+        UPSTREAM_ERRORS.inc(source=source, kind=f"http_{status // 100}xx")
+
+
+def timed_db(fn: Callable) -> Callable:
+    """Decorador para métodos de PriceDatabase: cuenta y mide cada llamada"""
+    operation = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        status = "ok"
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            status = "error"
+            raise
+        finally:
+            DB_LATENCY.observe(time.perf_counter() - start, operation=operation)
+            DB_QUERIES.inc(operation=operation, status=status)
+
+    return wrapper
+
+
+class StageTimer:
+    """
+    Cronómetro por etapas de un endpoint: cada lap() registra el tiempo desde el lap anterior
+
+        timer = StageTimer("/predict/price")
+        ...  # buscar precio base
+        timer.lap("base_price")
+    """
+
+    def __init__(self, endpoint: str):
+        self.endpoint = endpoint
+        self._last = time.perf_counter()
+        self.stages: Dict[str, float] = {}
+
+    def lap(self, stage: str) -> float:
+        now = time.perf_counter()
+        elapsed = now - self._last
+        self._last = now
+        self.stages[stage] = self.stages.get(stage, 0.0) + elapsed
+        STAGE_LATENCY.observe(elapsed, endpoint=self.endpoint, stage=stage)
+        return elapsed
+
+    def reset(self):
+        """Descarta el tiempo transcurrido desde el último lap (p.ej. logging no relevante)"""
+        self._last = time.perf_counter()
+
+
+def observe_request(method: str, route: str, status: int, seconds: float):
+    REQUEST_LATENCY.observe(seconds, method=method, route=route, status=str(status))
+
+
+def _cache_ratios() -> List[str]:
+    totals: Dict[str, Dict[str, float]] = {}
+    for (cache, result), value in CACHE_REQUESTS.values().items():
+        totals.setdefault(cache, {}).setdefault(result, 0.0)
+        totals[cache][result] += value
+    lines = [
+        "# HELP maransa_cache_hit_ratio Proporción de hits sobre el total de consultas por caché",
+        "# TYPE maransa_cache_hit_ratio gauge"
+    ]
+    for cache, counts in sorted(totals.items()):
+        total = counts.get("hit", 0.0) + counts.get("miss", 0.0)
+        ratio = counts.get("hit", 0.0) / total if total else 0.0
+        lines.append(f'maransa_cache_hit_ratio{{cache="{_escape(cache)}"}} {ratio:.6f}')
+    return lines
+
+
+def render() -> str:
+    """Texto de exposición Prometheus (version=0.0.4) con todas las métricas"""
+    lines: List[str] = []
+    for metric in _ALL_METRICS:
+        lines.extend(metric.render())
+    lines.extend(_cache_ratios())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
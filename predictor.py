@@ -3,14 +3,46 @@
 # Basado en análisis de series temporales, tendencias y correlaciones
 
 import numpy as np
-from scipy import stats, optimize
 from datetime import date, timedelta
 from typing import Dict, Any, List, Tuple, Optional
 import logging
-from database import PriceDatabase
+from database import PriceDatabase, resolucion_para_ventana
+from tracing import traced
+from lazy_imports import lazy_module
+from forecast_store import PRESENTACION_PUBLICO
+
+stats = lazy_module("scipy.stats")
 
 logger = logging.getLogger(__name__)
 
+# Calibre ENTERO (WHOLE) -> calibre del precio público de referencia (sin cabeza)
+CALIBRE_PUBLICO_WHOLE = {
+    "20": "16/20",
+    "30": "26/30",
+    "40": "36/40",
+    "50": "41/50",
+    "60": "51/60",
+    "70": "61/70",
+    "80": "71/90",
+}
+
+
+# Ratio despacho/público cuando no hay historial suficiente para la correlación
+RATIO_DESPACHO_HEADLESS = 0.65
+RATIO_DESPACHO_OTRAS = 0.70
+
+
+def ratio_despacho_estimado(presentacion: str) -> float:
+    return RATIO_DESPACHO_HEADLESS if presentacion == 'HEADLESS' else RATIO_DESPACHO_OTRAS
+
+
+def calibre_publico_para(calibre: str, presentacion: str) -> str:
+    """Calibre de precios públicos usado para predecir un calibre/presentación de despacho"""
+    if presentacion == "WHOLE":
+        return CALIBRE_PUBLICO_WHOLE.get(calibre, calibre)
+    return calibre
+
+
 class PricePredictor:
     """
     Predictor de precios de camarón basado en modelos matemáticos
@@ -21,10 +53,19 @@ class PricePredictor:
     3. Correlación Precio Público → Precio Despacho
     """
     
-    def __init__(self, db: Optional[PriceDatabase] = None):
-        """Inicializa el predictor con conexión a base de datos"""
+    def __init__(self, db: Optional[PriceDatabase] = None, store=None):
+        """
+        Inicializa el predictor con conexión a base de datos
+        
+        Args:
+            db: Base de datos de precios
+            store: ForecastStore opcional; con él cada predicción se guarda en `predicciones`
+                y se reutiliza mientras no cambien los datos (misma versión, mismo día)
+        """
         self.db = db or PriceDatabase()
+        self.store = store
     
+    @traced("model")
     def predecir_precio_publico(self, 
                                 calibre: str,
                                 dias_adelante: int = 30,
@@ -50,8 +91,22 @@ class PricePredictor:
         Returns:
             Dict con predicción y estadísticas
         """
-        # Obtener historial
-        historial = self.db.obtener_historial_publico(calibre, dias_historial)
+        fecha_objetivo = date.today() + timedelta(days=dias_adelante)
+        if self.store is not None:
+            guardada = self.store.get(calibre, PRESENTACION_PUBLICO, fecha_objetivo, dias_historial)
+            if guardada is not None:
+                return guardada
+        
+        resultado = self._predecir_precio_publico(calibre, dias_adelante, dias_historial)
+        if self.store is not None:
+            self.store.put(calibre, PRESENTACION_PUBLICO, dias_adelante, dias_historial, resultado)
+        return resultado
+    
+    def _predecir_precio_publico(self, calibre: str, dias_adelante: int, dias_historial: int) -> Dict[str, Any]:
+        # Obtener historial: ventanas largas usan medias semanales / mensuales (agregados_precios)
+        # en lugar de cada fila diaria; hasta ~1 año es diario (ver resolucion_para_ventana)
+        resolucion = resolucion_para_ventana(dias_historial)
+        historial = self.db.obtener_historial_publico(calibre, dias_historial, resolucion)
         
         if len(historial) < 5:
             return {
@@ -99,10 +154,12 @@ class PricePredictor:
             'volatilidad': round(float(volatilidad), 3),
             'confianza': self._calcular_confianza(r_value, len(historial)),
             'muestras': len(historial),
+            'resolucion': resolucion,
             'metodo': 'regresion_lineal_ema',
             'formula': f'P(t) = {intercept:.3f} + {slope:.5f}*t + EMA_ajuste'
         }
     
+    @traced("model")
     def predecir_precio_despacho(self,
                                  calibre: str,
                                  presentacion: str,
@@ -130,19 +187,24 @@ class PricePredictor:
         Returns:
             Dict con predicción completa
         """
+        fecha_objetivo = date.today() + timedelta(days=dias_adelante)
+        if self.store is not None:
+            guardada = self.store.get(calibre, presentacion, fecha_objetivo, dias_historial)
+            if guardada is not None:
+                return guardada
+        
+        resultado = self._predecir_precio_despacho(calibre, presentacion, dias_adelante, dias_historial)
+        if self.store is not None:
+            self.store.put(calibre, presentacion, dias_adelante, dias_historial, resultado)
+        return resultado
+    
+    def _predecir_precio_despacho(self,
+                                  calibre: str,
+                                  presentacion: str,
+                                  dias_adelante: int,
+                                  dias_historial: int) -> Dict[str, Any]:
         # Paso 1: Predecir precio público
-        calibre_publico = calibre
-        if presentacion == "WHOLE":
-            mapping = {
-                "20": "16/20",
-                "30": "26/30",
-                "40": "36/40",
-                "50": "41/50",
-                "60": "51/60",
-                "70": "61/70",
-                "80": "71/90",
-            }
-            calibre_publico = mapping.get(calibre, calibre)
+        calibre_publico = calibre_publico_para(calibre, presentacion)
 
         prediccion_publico = self.predecir_precio_publico(calibre_publico, dias_adelante, dias_historial)
         
@@ -150,11 +212,12 @@ class PricePredictor:
             return prediccion_publico
         
         # Paso 2: Obtener correlación público → despacho
-        correlacion = self.db.calcular_correlacion(calibre, presentacion, dias_historial, calibre_publico=calibre_publico)
+        correlacion = self.db.calcular_correlacion(calibre, presentacion, dias_historial, calibre_publico=calibre_publico,
+                                                   resolucion=resolucion_para_ventana(dias_historial))
         
         if correlacion.get('status') in ['sin_datos', 'datos_insuficientes']:
             # Fallback: usar ratio promedio histórico general o estimado
-            ratio_fallback = 0.65 if presentacion == 'HEADLESS' else 0.70
+            ratio_fallback = ratio_despacho_estimado(presentacion)
             precio_despacho = prediccion_publico['precio_predicho'] * ratio_fallback
             
             return {
@@ -0,0 +1,273 @@
+# Exportación columnar de precios históricos (CSV / Arrow IPC / Parquet) en streaming
+# Las filas se leen del cursor por lotes (fetchmany) y cada lote se serializa y se entrega
+# antes de leer el siguiente: la memoria del worker queda acotada a un lote por descarga,
+# sin importar el rango exportado. GET /data/export/{tabla} envuelve estos generadores en un
+# StreamingResponse (Starlette los itera en el threadpool, fuera del event loop).
+#
+#     for chunk in export_stream(db_path, "precios_despacho", "csv", ExportFilters(calibre=["16/20"])):
+#         f.write(chunk)
+#
+# Arrow IPC y Parquet requieren pyarrow (opcional); CSV funciona siempre.
+#
+# Con resolucion="semanal" / "mensual" se exportan los agregados materializados
+# (agregados_precios: un punto por período en vez de cada fila diaria); "auto" elige la
+# resolución más gruesa que da suficientes puntos para el rango pedido.
+
+import csv
+import io
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from database import RESOLUCIONES_AGREGADAS, TABLAS_AGREGADAS, resolucion_para_ventana
+from lazy_imports import lazy_module, is_available
+
+pa = lazy_module("pyarrow")
+pq = lazy_module("pyarrow.parquet")
+ARROW_AVAILABLE = is_available("pyarrow")
+
+LOTE_DEFECTO = 10_000
+LOTE_MAXIMO = 100_000
+
+FORMATOS = {
+    # formato: (media type, extensión, requiere pyarrow)
+    "csv": ("text/csv; charset=utf-8", "csv", False),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows", True),
+    "parquet": ("application/vnd.apache.parquet", "parquet", True),
+}
+
+
+RESOLUCIONES = ("diaria", *RESOLUCIONES_AGREGADAS, "auto")
+
+
+@dataclass(frozen=True)
+class ExportTable:
+    """Columnas exportables de una tabla y cómo filtrarla"""
+    nombre: str
+    columnas: Tuple[Tuple[str, str], ...]   # (columna, tipo arrow: date/string/float/int)
+    columna_fecha: str
+    filtra_presentacion: bool
+    condiciones_fijas: Tuple[Tuple[str, str], ...] = ()   # (columna, valor) siempre aplicados
+
+
+TABLAS: Dict[str, ExportTable] = {
+    "precios_publicos": ExportTable(
+        "precios_publicos",
+        (("fecha", "date"), ("calibre", "string"), ("precio_usd_lb", "float"), ("fuente", "string"),
+         ("cantidad_fuentes", "int"), ("confiabilidad", "string")),
+        "fecha", False),
+    "precios_despacho": ExportTable(
+        "precios_despacho",
+        (("fecha", "date"), ("calibre", "string"), ("presentacion", "string"),
+         ("precio_usd_lb", "float"), ("origen", "string")),
+        "fecha", True),
+    "correlaciones": ExportTable(
+        "correlaciones",
+        (("fecha_calculo", "date"), ("calibre", "string"), ("presentacion", "string"),
+         ("ratio_promedio", "float"), ("coeficiente_correlacion", "float"),
+         ("desviacion_estandar", "float"), ("muestras", "int"), ("formula", "string")),
+        "fecha_calculo", True),
+}
+
+# (tabla, resolución) -> vista sobre agregados_precios
+TABLAS_AGREGADAS_EXPORT: Dict[Tuple[str, str], ExportTable] = {
+    (tabla, resolucion): ExportTable(
+        "agregados_precios",
+        (("periodo", "date"), ("calibre", "string"))
+        + ((("presentacion", "string"),) if "presentacion" in grupo else ())
+        + (("muestras", "int"), ("media", "float"), ("minimo", "float"), ("maximo", "float"),
+           ("ultimo", "float"), ("fecha_ultimo", "date")),
+        "periodo", "presentacion" in grupo,
+        (("tabla", tabla), ("resolucion", resolucion)))
+    for tabla, grupo in TABLAS_AGREGADAS.items()
+    for resolucion in RESOLUCIONES_AGREGADAS
+}
+
+
+@dataclass
+class ExportFilters:
+    calibre: List[str] = field(default_factory=list)
+    presentacion: List[str] = field(default_factory=list)
+    desde: Optional[date] = None
+    hasta: Optional[date] = None
+
+
+def build_query(tabla: ExportTable, filtros: ExportFilters) -> Tuple[str, list]:
+    """SELECT parametrizado con los filtros, ordenado por fecha (usa idx_*_fecha)"""
+    condiciones = [f"{columna} = ?" for columna, _ in tabla.condiciones_fijas]
+    params = [valor for _, valor in tabla.condiciones_fijas]
+    if filtros.calibre:
+        condiciones.append(f"calibre IN ({','.join('?' * len(filtros.calibre))})")
+        params.extend(filtros.calibre)
+    if filtros.presentacion:
+        if not tabla.filtra_presentacion:
+            nombre = dict(tabla.condiciones_fijas).get("tabla", tabla.nombre)
+            raise ValueError(f"{nombre} no tiene columna presentacion")
+        condiciones.append(f"presentacion IN ({','.join('?' * len(filtros.presentacion))})")
+        params.extend(p.upper() for p in filtros.presentacion)
+    if filtros.desde:
+        condiciones.append(f"{tabla.columna_fecha} >= ?")
+        params.append(str(filtros.desde))
+    if filtros.hasta:
+        condiciones.append(f"{tabla.columna_fecha} <= ?")
+        params.append(str(filtros.hasta))
+
+    columnas = ", ".join(c for c, _ in tabla.columnas)
+    where = f" WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    orden = f"{tabla.columna_fecha}, calibre" + (", presentacion" if tabla.filtra_presentacion else "")
+    return f"SELECT {columnas} FROM {tabla.nombre}{where} ORDER BY {orden}", params
+
+
+def iter_batches(db_path, tabla: ExportTable, filtros: ExportFilters,
+                 lote: int = LOTE_DEFECTO) -> Iterator[List[tuple]]:
+    """Lotes de filas del cursor; la conexión se cierra al agotar o abandonar el generador"""
+    sql, params = build_query(tabla, filtros)
+    conn = sqlite3.connect(db_path)
+    try:
+        cursor = conn.execute(sql, params)
+        while True:
+            filas = cursor.fetchmany(lote)
+            if not filas:
+                break
+            yield filas
+    finally:
+        conn.close()
+
+
+# ===== SERIALIZADORES =====
+
+def _csv_chunks(tabla: ExportTable, lotes: Iterator[List[tuple]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow([c for c, _ in tabla.columnas])
+    for filas in lotes:
+        writer.writerows(filas)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # Exportación vacía: solo el encabezado
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _DrainSink(io.RawIOBase):
+    """Destino de escritura para pyarrow que se vacía tras cada lote (no acumula el archivo)"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._posicion = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._chunks.append(data)
+        self._posicion += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._posicion
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def arrow_schema(tabla: ExportTable):
+    tipos = {"date": pa.date32(), "string": pa.string(), "float": pa.float64(), "int": pa.int64()}
+    return pa.schema([(columna, tipos[tipo]) for columna, tipo in tabla.columnas])
+
+
+def _record_batch(tabla: ExportTable, schema, filas: Sequence[tuple]):
+    columnas = list(zip(*filas))
+    arrays = []
+    for (nombre, tipo), valores in zip(tabla.columnas, columnas):
+        if tipo == "date":
+            # SQLite guarda DATE como texto ISO; el cast string -> date32 es vectorizado
+            arrays.append(pa.array(valores, pa.string()).cast(pa.date32()))
+        else:
+            arrays.append(pa.array(valores, schema.field(nombre).type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+def _arrow_chunks(tabla: ExportTable, lotes: Iterator[List[tuple]]) -> Iterator[bytes]:
+    schema = arrow_schema(tabla)
+    sink = _DrainSink()
+    with pa.ipc.new_stream(sink, schema) as writer:
+        for filas in lotes:
+            writer.write_batch(_record_batch(tabla, schema, filas))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _parquet_chunks(tabla: ExportTable, lotes: Iterator[List[tuple]]) -> Iterator[bytes]:
+    # Un row group por lote; el footer se emite al cerrar el writer
+    schema = arrow_schema(tabla)
+    sink = _DrainSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for filas in lotes:
+            writer.write_table(pa.Table.from_batches([_record_batch(tabla, schema, filas)]))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+_SERIALIZADORES = {"csv": _csv_chunks, "arrow": _arrow_chunks, "parquet": _parquet_chunks}
+
+
+def resolve_resolution(db_path, nombre_tabla: str, filtros: ExportFilters) -> str:
+    """
+    Resolución para resolucion="auto": la más gruesa con suficientes puntos en [desde, hasta]
+    (los extremos que falten salen del rango de la tabla en estadisticas_tablas)
+    """
+    if nombre_tabla not in TABLAS_AGREGADAS:
+        return "diaria"
+    desde, hasta = filtros.desde, filtros.hasta
+    if desde is None or hasta is None:
+        conn = sqlite3.connect(db_path)
+        try:
+            row = conn.execute("""
+                SELECT fecha_min, fecha_max FROM estadisticas_tablas
+                WHERE tabla = ? AND calibre = '' AND presentacion = ''
+            """, (nombre_tabla,)).fetchone()
+        finally:
+            conn.close()
+        if not row or not row[0]:
+            return "diaria"
+        desde = desde or date.fromisoformat(row[0])
+        hasta = hasta or date.fromisoformat(row[1])
+    return resolucion_para_ventana((hasta - desde).days + 1)
+
+
+def export_table(nombre_tabla: str, resolucion: str = "diaria") -> ExportTable:
+    """Tabla exportable para `nombre_tabla` en la resolución pedida (diaria = filas originales)"""
+    if nombre_tabla not in TABLAS:
+        raise KeyError(nombre_tabla)
+    if resolucion == "diaria":
+        return TABLAS[nombre_tabla]
+    if resolucion not in RESOLUCIONES_AGREGADAS:
+        raise ValueError(f"Resolución no soportada: {resolucion} (use {', '.join(RESOLUCIONES)})")
+    if nombre_tabla not in TABLAS_AGREGADAS:
+        raise ValueError(f"{nombre_tabla} no tiene agregados {resolucion}")
+    return TABLAS_AGREGADAS_EXPORT[(nombre_tabla, resolucion)]
+
+
+def export_stream(db_path, nombre_tabla: str, formato: str, filtros: ExportFilters,
+                  lote: int = LOTE_DEFECTO, resolucion: str = "diaria") -> Iterator[bytes]:
+    """
+    Generador de bytes del archivo exportado; valida tabla/formato/resolución/filtros antes de
+    leer. `resolucion` ya resuelta (no "auto": ver resolve_resolution)
+    """
+    tabla = export_table(nombre_tabla, resolucion)
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato no soportado: {formato} (use {', '.join(FORMATOS)})")
+    if FORMATOS[formato][2] and not ARROW_AVAILABLE:
+        raise RuntimeError(f"El formato {formato} requiere pyarrow")
+    build_query(tabla, filtros)   # valida filtros antes de abrir el stream
+    return _SERIALIZADORES[formato](tabla, iter_batches(db_path, tabla, filtros, lote))
@@ -0,0 +1,195 @@
+# Store de tablas de precios EXPORQUILSA versionadas
+# La tabla vigente vive en PriceDatabase (tablas_precios / tablas_precios_items) con fecha de
+# vigencia; cada proceso mantiene un snapshot inmutable (CaliberCatalog) que se reemplaza
+# atómicamente cuando aparece una versión nueva, y avisa a las cachés que dependen de ella.
+#
+# Lectura en handlers (sin locks):   catalog = price_tables.current
+# Publicación:                       price_tables.publish(precios, fecha_vigencia)
+# Otros workers detectan la versión nueva con refresh() (tarea periódica en main.py)
+
+import logging
+import threading
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Callable
+
+from caliber_catalog import CaliberCatalog
+from database import PriceDatabase
+from single_flight import single_flight
+
+logger = logging.getLogger(__name__)
+
+# Callback(catálogo_anterior, catálogo_nuevo) invocado tras cada cambio de versión
+PriceTableListener = Callable[[Optional[CaliberCatalog], CaliberCatalog], None]
+
+VALID_TABLES = ("HEADLESS", "WHOLE")
+
+# Tabla de precios reales por calibre - EXPORQUILSA S.A. (31-01-2026)
+# Fuente: Empacadora ecuatoriana oficial. Se publica como versión inicial en una BD sin
+# tablas (RealAIConfig.SHRIMP_CALIBER_PRICES / SHRIMP_PRICES_DATE apuntan aquí)
+DEFAULT_PRICES_DATE = "31-01-2026"
+DEFAULT_CALIBER_PRICES = {
+    # Precios Despachos (Sin Cabeza/Headless) - USD por libra
+    "HEADLESS": {
+        "16/20": 2.90,      # Talla grande - Premium
+        "21/25": 2.50,      # Talla grande-media (con prioridad)
+        "26/30": 2.30,      # Talla media (con prioridad)
+        "31/35": 2.05,      # Talla media-pequeña (con prioridad)
+        "36/40": 2.00,      # Talla estándar
+        "41/50": 1.85,      # Talla pequeña
+        "51/60": 1.75,      # Talla muy pequeña
+        "61/70": 1.60,      # Talla extra pequeña
+        "71/90": 1.30,      # Talla micro
+        "91/110": 0.90      # Talla micro extra
+    },
+    # Precios Entero (Con Cabeza/Whole) - USD por libra
+    "WHOLE": {
+        "20": 4.60,         # Equivalente a 16/20
+        "30": 3.60,         # Equivalente a 26/30
+        "40": 3.15,         # Equivalente a 36/40
+        "50": 3.00,         # Equivalente a 41/50
+        "60": 2.70,         # Equivalente a 51/60
+        "70": 2.60,         # Equivalente a 61/70
+        "80": 2.40          # Equivalente a 71/90
+    }
+}
+
+
+def validate_table(precios: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    """Normaliza y valida una tabla {presentacion: {calibre: precio}}; ValueError si es inválida"""
+    if not precios:
+        raise ValueError("La tabla de precios está vacía")
+    normalizada: Dict[str, Dict[str, float]] = {}
+    for presentacion, tabla in precios.items():
+        presentacion_upper = str(presentacion).upper()
+        if presentacion_upper not in VALID_TABLES:
+            raise ValueError(f"Presentación no válida: {presentacion}. Use: {', '.join(VALID_TABLES)}")
+        if not tabla:
+            raise ValueError(f"La tabla {presentacion_upper} no tiene calibres")
+        for calibre, precio in tabla.items():
+            try:
+                precio = float(precio)
+            except (TypeError, ValueError):
+                raise ValueError(f"Precio inválido para {presentacion_upper} {calibre}: {precio}")
+            if precio <= 0:
+                raise ValueError(f"Precio debe ser positivo para {presentacion_upper} {calibre}: {precio}")
+            normalizada.setdefault(presentacion_upper, {})[str(calibre)] = precio
+    return normalizada
+
+
+def bootstrap_table(db: PriceDatabase,
+                    precios: Dict[str, Dict[str, float]] = DEFAULT_CALIBER_PRICES,
+                    fecha: str = DEFAULT_PRICES_DATE) -> Optional[int]:
+    """
+    Publica `precios` (fecha dd-mm-aaaa) como versión inicial si la BD no tiene ninguna tabla
+    Un solo proceso a la vez: varios workers arrancando sobre una BD vacía publican una vez
+
+    Returns:
+        Versión publicada, o None si la BD ya tenía tablas
+    """
+    with single_flight(f"price_table_bootstrap:{Path(db.db_path).resolve()}"):
+        if db.obtener_version_tabla_vigente(date.max) is not None:
+            return None
+        return db.publicar_tabla_precios(
+            {k: dict(v) for k, v in precios.items()},
+            datetime.strptime(fecha, "%d-%m-%Y").date(),
+            notas="Tabla inicial desde RealAIConfig.SHRIMP_CALIBER_PRICES"
+        )
+
+
+class PriceTableStore:
+    """Snapshot en memoria de la tabla vigente, con swap atómico y notificación de cambios"""
+
+    def __init__(self, db: PriceDatabase, config):
+        self.db = db
+        self.config = config
+        # Hasta el bootstrap se sirve la tabla embebida en la configuración
+        self.current: CaliberCatalog = CaliberCatalog.from_config(config)
+        self.checked_at: Optional[datetime] = None
+        self._listeners: List[PriceTableListener] = []
+        self._lock = threading.Lock()
+
+    @property
+    def version(self) -> Optional[int]:
+        return self.current.version
+
+    def subscribe(self, listener: PriceTableListener):
+        """Registra un callback de invalidación para cuando cambia la tabla vigente"""
+        self._listeners.append(listener)
+
+    def bootstrap(self) -> CaliberCatalog:
+        """
+        Carga la tabla vigente; si la BD no tiene ninguna, publica la de configuración
+        (SHRIMP_CALIBER_PRICES) como versión inicial
+        """
+        with self._lock:
+            bootstrap_table(self.db, self.config.SHRIMP_CALIBER_PRICES, self.config.SHRIMP_PRICES_DATE)
+        self.refresh()
+        return self.current
+
+    def refresh(self, fecha: Optional[date] = None) -> bool:
+        """
+        Verifica la versión vigente en la BD y, si cambió, construye el nuevo snapshot,
+        lo publica con una sola asignación y notifica a los suscriptores
+
+        Returns:
+            True si hubo cambio de versión
+        """
+        with self._lock:
+            self.checked_at = datetime.now()
+            version = self.db.obtener_version_tabla_vigente(fecha)
+            if version is None or version == self.current.version:
+                return False
+            table = self.db.obtener_tabla_precios(version)
+            if table is None:
+                return False
+            previous = self.current
+            self.current = CaliberCatalog.from_table(table, self.config)
+            listeners = list(self._listeners)
+
+        logger.info(f"🔄 Tabla de precios v{previous.version} -> v{version} (vigente desde {table['fecha_vigencia']})")
+        for listener in listeners:
+            try:
+                listener(previous, self.current)
+            except Exception as e:
+                logger.warning(f"⚠️ Error invalidando caché dependiente de la tabla de precios: {e}")
+        return True
+
+    def publish(self,
+                precios: Dict[str, Dict[str, float]],
+                fecha_vigencia: date,
+                fuente: str = "EXPORQUILSA",
+                notas: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Valida y publica una nueva versión; si ya está vigente la activa en este proceso
+
+        `precios` puede ser parcial: los calibres (o presentaciones completas) que no trae se
+        heredan de la versión vigente a `fecha_vigencia`, así una actualización de algunos
+        precios no saca del catálogo al resto
+        """
+        precios = validate_table(precios)
+        anterior = self._table_at(fecha_vigencia)
+        heredados = {
+            presentacion: sorted(set(tabla) - set(precios.get(presentacion, {})))
+            for presentacion, tabla in anterior.items()
+        }
+        completa = {
+            presentacion: {**anterior.get(presentacion, {}), **precios.get(presentacion, {})}
+            for presentacion in VALID_TABLES if presentacion in anterior or presentacion in precios
+        }
+        version = self.db.publicar_tabla_precios(completa, fecha_vigencia, fuente=fuente, notas=notas)
+        activated = self.refresh()
+        return {
+            "version": version,
+            "fecha_vigencia": fecha_vigencia,
+            "activa": self.current.version == version,
+            "cambio_aplicado": activated,
+            "calibres_heredados": {p: c for p, c in heredados.items() if c}
+        }
+
+    def _table_at(self, fecha: date) -> Dict[str, Dict[str, float]]:
+        """Precios de la versión vigente a `fecha` (sin versiones publicadas: el catálogo actual)"""
+        version = self.db.obtener_version_tabla_vigente(fecha)
+        table = self.db.obtener_tabla_precios(version) if version is not None else None
+        precios = table["precios"] if table is not None else self.current.prices
+        return {presentacion: dict(tabla) for presentacion, tabla in precios.items()}
@@ -0,0 +1,257 @@
+# Caché de respuestas HTTP para endpoints de predicción deterministas
+# /predict/future-price y /predict/despacho-price dependen solo de sus parámetros, de la
+# fecha actual y de los datos en BD: la clave combina parámetros normalizados + versión de
+# datos (version_datos, incrementada por cada ingesta) + fecha, así una ingesta nunca
+# sirve respuestas viejas y no hace falta invalidar explícitamente.
+#
+# Niveles:
+#   1. Memoria del proceso: LRU acotada por cantidad de entradas y por bytes
+#   2. Disco compartido (opcional, RESPONSE_CACHE_DIR): otros workers reutilizan el cálculo
+# Las respuestas llevan ETag; con If-None-Match coincidente se responde 304 sin cuerpo.
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional, Callable, Tuple
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+
+import metrics
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+def _dumps(data: Any) -> bytes:
+    data = jsonable_encoder(data)
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def normalize_params(params: Dict[str, Any]) -> Tuple[Tuple[str, str], ...]:
+    """Parámetros en forma canónica: sin None, texto en mayúsculas y sin espacios, orden fijo"""
+    normalized = []
+    for name, value in sorted(params.items()):
+        if value is None:
+            continue
+        if isinstance(value, str):
+            value = value.strip().upper()
+        normalized.append((name, str(value)))
+    return tuple(normalized)
+
+
+def make_key(endpoint: str, params: Dict[str, Any], version: Any) -> str:
+    raw = json.dumps([endpoint, normalize_params(params), str(version)], separators=(',', ':'))
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+
+def etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha1(body).hexdigest()[:20] + '"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [c.strip() for c in if_none_match.split(",")]
+    weak = etag if etag.startswith("W/") else f"W/{etag}"
+    return "*" in candidates or etag in candidates or weak in candidates
+
+
+class ResponseCache:
+    """LRU en memoria (acotada por entradas y bytes) con respaldo opcional en disco compartido"""
+
+    def __init__(self,
+                 name: str,
+                 max_entries: int = 2048,
+                 max_bytes: int = 32 * 1024 * 1024,
+                 disk_dir: Optional[Path] = None,
+                 disk_max_files: int = 5000):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.disk_dir = Path(disk_dir) if disk_dir else None
+        self.disk_max_files = disk_max_files
+        self._entries: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        if self.disk_dir is not None:
+            self.disk_dir.mkdir(parents=True, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, name: str) -> "ResponseCache":
+        disk_dir = os.getenv("RESPONSE_CACHE_DIR")
+        return cls(
+            name,
+            max_entries=int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "2048")),
+            max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_MB", "32")) * 1024 * 1024,
+            disk_dir=Path(disk_dir) / name if disk_dir else None
+        )
+
+    # ===== MEMORIA =====
+
+    def _memory_get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def _memory_put(self, key: str, body: bytes, etag: str):
+        size = len(body)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous[0])
+            self._entries[key] = (body, etag)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (old_body, _) = self._entries.popitem(last=False)
+                self._bytes -= len(old_body)
+
+    # ===== DISCO =====
+
+    def _disk_path(self, key: str) -> Path:
+        return self.disk_dir / f"{key}.json"
+
+    def _disk_get(self, key: str) -> Optional[bytes]:
+        if self.disk_dir is None:
+            return None
+        try:
+            return self._disk_path(key).read_bytes()
+        except OSError:
+            return None
+
+    def _disk_put(self, key: str, body: bytes):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        tmp = path.with_suffix(f".{os.getpid()}.tmp")
+        try:
+            tmp.write_bytes(body)
+            os.replace(tmp, path)
+        except OSError as e:
+            logger.warning(f"⚠️ No se pudo escribir caché de respuestas en disco: {e}")
+            return
+        self._disk_writes += 1
+        if self._disk_writes % 100 == 0:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Elimina las entradas más antiguas cuando el directorio supera disk_max_files"""
+        try:
+            files = sorted(self.disk_dir.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        except OSError:
+            return
+        for path in files[:max(0, len(files) - self.disk_max_files)]:
+            try:
+                path.unlink()
+            except OSError:
+                pass
+
+    # ===== API =====
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        entry = self._memory_get(key)
+        if entry is not None:
+            metrics.record_cache(f"{self.name}_memory", True)
+            return entry
+        metrics.record_cache(f"{self.name}_memory", False)
+        body = self._disk_get(key)
+        if self.disk_dir is not None:
+            metrics.record_cache(f"{self.name}_disk", body is not None)
+        if body is None:
+            return None
+        etag = etag_for(body)
+        self._memory_put(key, body, etag)
+        return body, etag
+
+    def put(self, key: str, body: bytes) -> str:
+        etag = etag_for(body)
+        self._memory_put(key, body, etag)
+        self._disk_put(key, body)
+        return etag
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entradas": len(self._entries),
+                "bytes": self._bytes,
+                "max_entradas": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "disco": str(self.disk_dir) if self.disk_dir else None
+            }
+
+    def serve(self,
+              key: str,
+              build: Callable[[], Dict[str, Any]],
+              if_none_match: Optional[str] = None) -> Response:
+        """
+        Respuesta cacheada para `key`; si no existe la calcula con `build()` (las excepciones
+        no se cachean). Responde 304 si el cliente ya tiene la misma versión (If-None-Match)
+        """
+        entry = self.get(key)
+        if entry is None:
+            body = _dumps(build())
+            etag = self.put(key, body)
+        else:
+            body, etag = entry
+
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+        if etag_matches(if_none_match, etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body, media_type="application/json", headers=headers)
+
+
+class DataVersion:
+    """
+    Versión de datos de PriceDatabase con relectura acotada: a lo sumo una consulta
+    por `ttl` segundos (las ingestas de otros workers se ven en ese plazo; las de este
+    proceso, de inmediato)
+    """
+
+    def __init__(self, db, ttl: float = 1.0):
+        self.db = db
+        self.ttl = ttl
+        self._value: Optional[int] = None
+        self._read_at = 0.0
+        self._local_seen = -1
+        self._lock = threading.Lock()
+
+    def _stale(self) -> bool:
+        return (self._value is None
+                or self._local_seen != self.db.ingestas_locales
+                or time.monotonic() - self._read_at >= self.ttl)
+
+    def get(self) -> int:
+        if not self._stale():
+            return self._value
+        with self._lock:
+            if self._stale():
+                self._local_seen = self.db.ingestas_locales
+                self._value = self.db.obtener_version_datos()
+                self._read_at = time.monotonic()
+            return self._value
+
+    def invalidate(self):
+        """Fuerza releer la versión en la próxima consulta (p.ej. tras una ingesta local)"""
+        self._read_at = 0.0
@@ -0,0 +1,235 @@
+# Estadísticas de ventana deslizante sobre todo el historial en una pasada
+# El historial se carga como matrices densas series × días (una fila por calibre público o
+# por calibre/presentación de despacho). Cualquier suma sobre la ventana [t - ventana, t]
+# sale de la suma acumulada: S[t] - S[t - ventana - 1], así todas las ventanas de todas las
+# series cuestan O(series × días) en lugar de una consulta + regresión por ventana.
+#
+#     historial = load_history(db.db_path)
+#     correlaciones = rolling_correlation(historial, ventana=90)
+#
+# Las ventanas son las mismas que usan PriceDatabase.calcular_correlacion y PricePredictor
+# (fecha >= t - ventana): el valor en el último día coincide con el cálculo puntual.
+# Si un día tiene varias fuentes de precio público se usa el promedio del día.
+#
+# fit_batch() es el ajuste de una sola ventana (PriceDatabase.calcular_correlaciones):
+# todas las filas de una matriz calibres × días en una pasada, con máscara de NaN.
+
+import sqlite3
+from dataclasses import dataclass
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from lazy_imports import lazy_module
+
+# scipy solo para el p-value (distribución t)
+stats = lazy_module("scipy.stats")
+
+MIN_FECHAS_CORRELACION = 5
+
+
+@dataclass
+class History:
+    """Historial en matrices densas series × días (NaN / 0 donde no hay dato)"""
+    inicio: date
+    dias: int
+    calibres_publicos: List[str]
+    publico_suma: np.ndarray        # Σ precio por día (varias fuentes)
+    publico_suma2: np.ndarray       # Σ precio² por día
+    publico_n: np.ndarray           # filas por día
+    combos_despacho: List[Tuple[str, str]]
+    despacho: np.ndarray            # promedio diario por (calibre, presentación)
+
+    @property
+    def publico_media(self) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.publico_n > 0, self.publico_suma / np.maximum(self.publico_n, 1), np.nan)
+
+    def fecha(self, indice: int) -> date:
+        return self.inicio + timedelta(days=int(indice))
+
+    def indice(self, fecha: date) -> int:
+        return (fecha - self.inicio).days
+
+
+def load_history(db_path: Path) -> History:
+    """Lee precios_publicos y precios_despacho en una pasada cada una"""
+    conn = sqlite3.connect(db_path)
+    try:
+        publicos = conn.execute("""
+            SELECT fecha, calibre, SUM(precio_usd_lb), SUM(precio_usd_lb * precio_usd_lb), COUNT(*)
+            FROM precios_publicos GROUP BY fecha, calibre
+        """).fetchall()
+        despacho = conn.execute("""
+            SELECT fecha, calibre, presentacion, AVG(precio_usd_lb)
+            FROM precios_despacho GROUP BY fecha, calibre, presentacion
+        """).fetchall()
+    finally:
+        conn.close()
+
+    fechas = [r[0] for r in publicos] + [r[0] for r in despacho]
+    if not fechas:
+        raise ValueError("No hay historial de precios")
+    inicio = date.fromisoformat(min(fechas)[:10])
+    dias = (date.fromisoformat(max(fechas)[:10]) - inicio).days + 1
+
+    calibres = sorted({r[1] for r in publicos})
+    fila_cal = {c: i for i, c in enumerate(calibres)}
+    suma = np.zeros((len(calibres), dias))
+    suma2 = np.zeros((len(calibres), dias))
+    n = np.zeros((len(calibres), dias))
+    for fecha, calibre, s, s2, c in publicos:
+        d = (date.fromisoformat(fecha[:10]) - inicio).days
+        suma[fila_cal[calibre], d] = s
+        suma2[fila_cal[calibre], d] = s2
+        n[fila_cal[calibre], d] = c
+
+    combos = sorted({(r[1], r[2]) for r in despacho})
+    fila_combo = {c: i for i, c in enumerate(combos)}
+    desp = np.full((len(combos), dias), np.nan)
+    for fecha, calibre, presentacion, precio in despacho:
+        desp[fila_combo[(calibre, presentacion)], (date.fromisoformat(fecha[:10]) - inicio).days] = precio
+
+    return History(inicio, dias, calibres, suma, suma2, n, combos, desp)
+
+
+# ===== SUMAS DE VENTANA =====
+
+def window_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Suma de cada fila sobre los días [t - window, t] para todo t (vía suma acumulada)"""
+    acumulada = np.cumsum(values, axis=1)
+    salida = acumulada.copy()
+    salida[:, window + 1:] -= acumulada[:, :-(window + 1)]
+    return salida
+
+
+def regression_from_sums(n, sx, sy, sxx, syy, sxy):
+    """Pendiente, intercepto, r y error estándar de la pendiente (como scipy.stats.linregress)"""
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ssx = sxx - sx * sx / n
+        ssy = syy - sy * sy / n
+        ssxy = sxy - sx * sy / n
+        slope = ssxy / ssx
+        intercept = (sy - slope * sx) / n
+        r = np.where((ssx > 0) & (ssy > 0), ssxy / np.sqrt(ssx * ssy), 0.0)
+        r = np.clip(r, -1.0, 1.0)
+        std_err = np.sqrt(np.maximum(1 - r * r, 0) * np.maximum(ssy, 0) / ssx / (n - 2))
+    return slope, intercept, r, std_err
+
+
+# ===== AJUSTE POR LOTES =====
+
+def fit_batch(publico: np.ndarray, despacho: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Regresión despacho = a + b * público y ratio despacho/público para cada fila de dos
+    matrices alineadas filas × días (NaN = sin dato); solo cuentan los días con ambos precios
+
+    Mismos resultados que scipy.stats.linregress + np.mean/np.std fila por fila.
+    Filas con menos de 3 fechas comunes o público constante quedan en NaN.
+
+    Returns:
+        {"muestras", "pendiente", "intercepto", "coeficiente_correlacion", "p_value",
+         "error_estandar", "ratio_promedio", "desviacion_estandar"}: un valor por fila
+    """
+    comun = ~np.isnan(publico) & ~np.isnan(despacho)
+    n = comun.sum(axis=1)
+    x = np.where(comun, publico, 0.0)
+    y = np.where(comun, despacho, 0.0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        # Dos pasadas (medias y luego desvíos) como linregress: estable con precios grandes
+        mx = x.sum(axis=1) / n
+        my = y.sum(axis=1) / n
+        dx = np.where(comun, x - mx[:, None], 0.0)
+        dy = np.where(comun, y - my[:, None], 0.0)
+        ssx = (dx * dx).sum(axis=1)
+        ssy = (dy * dy).sum(axis=1)
+        ssxy = (dx * dy).sum(axis=1)
+
+        valido = (n >= 3) & (ssx > 0)
+        slope = np.where(valido, ssxy / ssx, np.nan)
+        intercept = my - slope * mx
+        r = np.where(valido & (ssy > 0), ssxy / np.sqrt(ssx * ssy), 0.0)
+        r = np.where(valido, np.clip(r, -1.0, 1.0), np.nan)
+        df = n - 2
+        std_err = np.sqrt(np.maximum(1 - r * r, 0) * ssy / ssx / df)
+        t = r * np.sqrt(df / np.maximum((1 - r) * (1 + r), 1e-300))
+        p_value = np.where(valido, 2 * stats.t.sf(np.abs(t), np.maximum(df, 1)), np.nan)
+
+        ratio = np.where(comun, y / np.where(comun, x, 1.0), 0.0)
+        ratio_medio = ratio.sum(axis=1) / n
+        ratio_std = np.sqrt((np.where(comun, ratio - ratio_medio[:, None], 0.0) ** 2).sum(axis=1) / n)
+
+    return {
+        "muestras": n,
+        "pendiente": slope,
+        "intercepto": intercept,
+        "coeficiente_correlacion": r,
+        "p_value": p_value,
+        "error_estandar": std_err,
+        "ratio_promedio": ratio_medio,
+        "desviacion_estandar": ratio_std,
+    }
+
+
+# ===== CORRELACIÓN PÚBLICO → DESPACHO =====
+
+def rolling_correlation(history: History,
+                        ventana: int = 90,
+                        combos: Optional[List[Tuple[str, str]]] = None) -> Dict[str, np.ndarray]:
+    """
+    Ratio despacho/público (media y desviación) y regresión despacho = a + b * público sobre
+    cada ventana de `ventana` días, para todas las combinaciones a la vez
+
+    Returns:
+        {"combos", "calibres_publicos", "muestras", "ratio_promedio", "desviacion_estandar",
+         "pendiente", "intercepto", "coeficiente_correlacion"}: matrices combos × días,
+        NaN donde hay menos de MIN_FECHAS_CORRELACION fechas comunes
+    """
+    from predictor import calibre_publico_para  # predictor -> database -> rolling_stats
+
+    combos = history.combos_despacho if combos is None else combos
+    fila_pub = {c: i for i, c in enumerate(history.calibres_publicos)}
+    fila_combo = {c: i for i, c in enumerate(history.combos_despacho)}
+    referencias = [calibre_publico_para(cal, pres) for cal, pres in combos]
+
+    media = history.publico_media
+    publico = np.full((len(combos), history.dias), np.nan)
+    for i, ref in enumerate(referencias):
+        if ref in fila_pub:
+            publico[i] = media[fila_pub[ref]]
+    despacho = history.despacho[[fila_combo[c] for c in combos]] if combos else np.empty((0, history.dias))
+
+    comun = ~np.isnan(publico) & ~np.isnan(despacho)
+    # Centrado por serie: evita cancelación numérica en las sumas acumuladas de historiales largos
+    x0 = np.nanmean(np.where(comun, publico, np.nan), axis=1, keepdims=True) if comun.any() else 0.0
+    y0 = np.nanmean(np.where(comun, despacho, np.nan), axis=1, keepdims=True) if comun.any() else 0.0
+    x0 = np.nan_to_num(x0)
+    y0 = np.nan_to_num(y0)
+    xp = np.where(comun, publico - x0, 0.0)
+    yd = np.where(comun, despacho - y0, 0.0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio = np.where(comun, despacho / np.where(comun, publico, 1.0), 0.0)
+
+    n = window_sum(comun.astype(float), ventana)
+    slope, intercept_c, r, _ = regression_from_sums(
+        n, window_sum(xp, ventana), window_sum(yd, ventana),
+        window_sum(xp * xp, ventana), window_sum(yd * yd, ventana), window_sum(xp * yd, ventana)
+    )
+    with np.errstate(invalid="ignore", divide="ignore"):
+        ratio_medio = window_sum(ratio, ventana) / n
+        ratio_std = np.sqrt(np.maximum(window_sum(ratio * ratio, ventana) / n - ratio_medio ** 2, 0))
+
+    suficiente = n >= MIN_FECHAS_CORRELACION
+    return {
+        "combos": list(combos),
+        "calibres_publicos": referencias,
+        "muestras": n.astype(int),
+        "ratio_promedio": np.where(suficiente, ratio_medio, np.nan),
+        "desviacion_estandar": np.where(suficiente, ratio_std, np.nan),
+        "pendiente": np.where(suficiente, slope, np.nan),
+        "intercepto": np.where(suficiente, intercept_c + y0 - slope * x0, np.nan),
+        "coeficiente_correlacion": np.where(suficiente, r, np.nan),
+    }
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Bootstrap offline de historial de despacho sintético a partir de la tabla EXPORQUILSA vigente
+
+Genera `dias` días de precios de despacho por calibre (precio base de la tabla ± ruido) para
+las combinaciones calibre/presentación que no tienen historial en la ventana, y los inserta
+con una sola transacción (PriceDatabase.guardar_precios_despacho_lote). Habilita
+correlaciones y predicciones de despacho en instalaciones nuevas.
+
+Antes esto ocurría dentro de POST /correlations/calculate al encontrar `sin_datos`; ahora
+los endpoints responden "sin datos" y el sembrado se hace explícitamente con este comando.
+Las filas quedan marcadas con nota = "seed_from_base" (columna de precios_despacho).
+
+Uso:
+    python sembrar_despacho.py                       # todas las presentaciones, 90 días
+    python sembrar_despacho.py --presentacion WHOLE --dias 180 --semilla 7
+    python sembrar_despacho.py --forzar              # también combinaciones con historial
+"""
+
+import argparse
+import logging
+import random
+import sqlite3
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Iterable
+
+from database import PriceDatabase
+from importar_precios import catalogo_vigente
+
+logger = logging.getLogger(__name__)
+
+NOTA_SEMILLA = "seed_from_base"
+
+
+def generar_historial_desde_base(precios_base: Dict[str, Dict[str, float]],
+                                 dias: int = 90,
+                                 ruido_pct: float = 0.03,
+                                 hasta: Optional[date] = None,
+                                 semilla: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Registros sintéticos {fecha, calibre, presentacion, precio_usd_lb, origen, nota} para los
+    `dias` días que terminan en `hasta` (hoy por defecto), uno por calibre y día
+    """
+    rng = random.Random(semilla)
+    hasta = hasta or date.today()
+    registros = []
+    for offset in range(dias):
+        fecha = hasta - timedelta(days=dias - 1 - offset)
+        for presentacion, tabla in precios_base.items():
+            for calibre, base in tabla.items():
+                registros.append({
+                    "fecha": fecha,
+                    "calibre": calibre,
+                    "presentacion": presentacion,
+                    "precio_usd_lb": round(base * (1 + rng.uniform(-ruido_pct, ruido_pct)), 4),
+                    "origen": "EXPORQUILSA",
+                    "nota": NOTA_SEMILLA
+                })
+    return registros
+
+
+def combinaciones_con_historial(db: PriceDatabase, desde: date) -> set:
+    """(calibre, presentacion) con al menos un precio de despacho desde `desde`"""
+    conn = sqlite3.connect(db.db_path)
+    try:
+        rows = conn.execute("""
+            SELECT DISTINCT calibre, presentacion FROM precios_despacho WHERE fecha >= ?
+        """, (str(desde),)).fetchall()
+    finally:
+        conn.close()
+    return {(c, p) for c, p in rows}
+
+
+def sembrar(db: PriceDatabase,
+            presentaciones: Optional[Iterable[str]] = None,
+            dias: int = 90,
+            ruido_pct: float = 0.03,
+            semilla: Optional[int] = None,
+            forzar: bool = False) -> Dict[str, Any]:
+    """Siembra el historial faltante desde la tabla de precios vigente; devuelve un resumen"""
+    tabla = catalogo_vigente(db)
+    version = db.obtener_version_tabla_vigente(date.today())
+
+    presentaciones = {p.upper() for p in presentaciones} if presentaciones else set(tabla)
+    hasta = date.today()
+    existentes = set() if forzar else combinaciones_con_historial(db, hasta - timedelta(days=dias))
+    precios_base = {
+        presentacion: {c: p for c, p in calibres.items() if (c, presentacion) not in existentes}
+        for presentacion, calibres in tabla.items()
+        if presentacion in presentaciones
+    }
+    combinaciones = sum(len(t) for t in precios_base.values())
+
+    start = time.perf_counter()
+    registros = generar_historial_desde_base(precios_base, dias, ruido_pct, hasta, semilla)
+    guardados = db.guardar_precios_despacho_lote(registros)
+    duracion = time.perf_counter() - start
+
+    return {
+        "version_tabla": version,
+        "combinaciones": combinaciones,
+        "omitidas_con_historial": len([c for c in existentes if c[1] in presentaciones]),
+        "registros": guardados,
+        "duracion_s": round(duracion, 3),
+        "filas_por_segundo": round(guardados / duracion) if duracion > 0 else None
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Siembra historial de despacho sintético desde la tabla EXPORQUILSA")
+    parser.add_argument("--db", type=Path, default=None, help="BD de precios (por defecto PRICES_DB_PATH o data/)")
+    parser.add_argument("--presentacion", action="append", default=[], help="HEADLESS / WHOLE (repetible; por defecto todas)")
+    parser.add_argument("--dias", type=int, default=90)
+    parser.add_argument("--ruido", type=float, default=0.03, help="Variación relativa máxima sobre el precio base")
+    parser.add_argument("--semilla", type=int, default=None, help="Semilla aleatoria (reproducible)")
+    parser.add_argument("--forzar", action="store_true", help="Sembrar también combinaciones que ya tienen historial")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    db = PriceDatabase(args.db)
+
+    resumen = sembrar(db, args.presentacion, args.dias, args.ruido, args.semilla, args.forzar)
+    print(f"🌱 {resumen['registros']} precios de despacho para {resumen['combinaciones']} combinaciones "
+          f"({args.dias} días, tabla v{resumen['version_tabla']}) en {resumen['duracion_s']:.2f}s "
+          f"({resumen['filas_por_segundo'] or 0} filas/s); {resumen['omitidas_con_historial']} con historial omitidas")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,123 @@
+# Single-flight entre hilos y entre workers
+# Garantiza que una operación cara (scraping diario, entrenamiento de modelos) la ejecute un
+# solo proceso a la vez: el resto espera y luego reutiliza el resultado que quedó en la caché
+# compartida (archivo de caché del día, modelos en MODEL_STORAGE_PATH, ...).
+#
+#     with single_flight("market_prices_2026-02-04"):
+#         data = load_cache()          # otro worker pudo terminarlo mientras esperábamos
+#         if data is None:
+#             data = scrape(); save_cache(data)
+#
+# try_single_flight no espera: quien llega tarde recibe False y sigue de largo (sondeos
+# periódicos que basta con que haga un worker).
+#
+# Entre procesos se usa flock sobre un archivo en SINGLE_FLIGHT_DIR (Linux/macOS);
+# sin fcntl (Windows) el lock queda limitado al proceso.
+
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Optional
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+_THREAD_LOCKS: Dict[str, threading.Lock] = {}
+_THREAD_LOCKS_GUARD = threading.Lock()
+
+
+def get_lock_dir() -> Path:
+    lock_dir = Path(os.getenv("SINGLE_FLIGHT_DIR") or Path(tempfile.gettempdir()) / "maransa-locks")
+    lock_dir.mkdir(parents=True, exist_ok=True)
+    return lock_dir
+
+
+def _thread_lock(name: str) -> threading.Lock:
+    with _THREAD_LOCKS_GUARD:
+        lock = _THREAD_LOCKS.get(name)
+        if lock is None:
+            lock = _THREAD_LOCKS[name] = threading.Lock()
+        return lock
+
+
+def _lock_path(name: str) -> Path:
+    digest = hashlib.sha1(name.encode("utf-8")).hexdigest()[:16]
+    return get_lock_dir() / f"{digest}.lock"
+
+
+@contextmanager
+def single_flight(name: str, timeout: Optional[float] = None):
+    """
+    Sección crítica con nombre compartida por todos los hilos y workers de la máquina
+
+    Args:
+        name: Identificador de la operación (se usa un hash como nombre de archivo)
+        timeout: Segundos máximos de espera; TimeoutError si se excede (None = sin límite)
+    """
+    deadline = None if timeout is None else time.monotonic() + timeout
+    lock = _thread_lock(name)
+    if not lock.acquire(timeout=-1 if timeout is None else timeout):
+        raise TimeoutError(f"Timeout esperando single-flight '{name}'")
+    try:
+        if not FCNTL_AVAILABLE:
+            yield
+            return
+
+        with open(_lock_path(name), "a+") as handle:
+            waited = False
+            while True:
+                try:
+                    fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    break
+                except BlockingIOError:
+                    if not waited:
+                        logger.info(f"⏳ Esperando a otro worker: {name}")
+                        waited = True
+                    if deadline is not None and time.monotonic() >= deadline:
+                        raise TimeoutError(f"Timeout esperando single-flight '{name}'")
+                    time.sleep(0.05)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    finally:
+        lock.release()
+
+
+@contextmanager
+def try_single_flight(name: str):
+    """
+    Como single_flight pero sin esperar: cede True si se obtuvo la sección crítica, False si
+    otro hilo o worker ya la tiene (en ese caso no hay que repetir la operación)
+    """
+    lock = _thread_lock(name)
+    if not lock.acquire(blocking=False):
+        yield False
+        return
+    try:
+        if not FCNTL_AVAILABLE:
+            yield True
+            return
+
+        with open(_lock_path(name), "a+") as handle:
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
+    finally:
+        lock.release()
@@ -0,0 +1,437 @@
+# Tracing por request y profiling bajo demanda
+# Spans para operaciones de BD, HTTP saliente e inferencia de modelos, anidados por request
+#
+# Sin dependencias externas: los spans se propagan con contextvars (funciona igual en
+# endpoints async, en el threadpool de FastAPI y en código síncrono como el scraper)
+# y se exportan a un archivo JSON Lines o a un colector OTLP/HTTP (JSON).
+#
+# Configuración (variables de entorno):
+#   TRACING_EXPORTER=none|file|otlp      (default: none -> spans solo en memoria)
+#   TRACING_FILE=./traces/spans.jsonl
+#   OTEL_EXPORTER_OTLP_ENDPOINT=http://localhost:4318
+#   TRACING_BUFFER_SIZE=2000             (spans recientes consultables en /admin/traces)
+#   PROFILING_ENABLED=true               (habilita ?profile=1 y /admin/profiles)
+#   PROFILE_DIR=./profiles
+
+import contextvars
+import cProfile
+import functools
+import io
+import json
+import logging
+import os
+import pstats
+import queue
+import secrets
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Callable
+
+from lazy_imports import lazy_module, is_available
+
+# Solo el exportador OTLP hace HTTP y solo ?profile=1 usa pyinstrument: ambos se importan al usarse
+requests = lazy_module("requests")
+pyinstrument = lazy_module("pyinstrument")
+PYINSTRUMENT_AVAILABLE = is_available("pyinstrument")
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "maransa-ai-service"
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("maransa_span", default=None)
+
+
+class Span:
+    """Operación medida dentro de una traza (ids en hex, compatibles con W3C / OTLP)"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns",
+                 "attributes", "status", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "ok"
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": datetime.fromtimestamp(self.start_ns / 1e9).isoformat(),
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes
+        }
+
+
+# ===== EXPORTADORES =====
+
+class FileSpanExporter:
+    """Un span por línea (JSON) en un archivo local"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str, ensure_ascii=False)
+        with self._lock:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line + "\n")
+
+    def shutdown(self):
+        pass
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class OTLPHttpExporter:
+    """
+    Envía spans en lotes a un colector OTLP/HTTP (POST {endpoint}/v1/traces, codificación JSON)
+    desde un hilo de fondo: el request nunca espera al colector
+    """
+
+    def __init__(self, endpoint: str, batch_size: int = 256, interval: float = 2.0, timeout: float = 5.0):
+        endpoint = endpoint.rstrip("/")
+        self.url = endpoint if endpoint.endswith("/v1/traces") else f"{endpoint}/v1/traces"
+        self.batch_size = batch_size
+        self.interval = interval
+        self.timeout = timeout
+        self._queue: "queue.Queue[Span]" = queue.Queue(maxsize=10000)
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="otlp-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, span: Span):
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            pass  # el colector no da abasto: se descartan spans antes que frenar requests
+
+    def _payload(self, spans: List[Span]) -> Dict[str, Any]:
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+                "scopeSpans": [{
+                    "scope": {"name": "maransa.tracing"},
+                    "spans": [{
+                        "traceId": s.trace_id,
+                        "spanId": s.span_id,
+                        **({"parentSpanId": s.parent_id} if s.parent_id else {}),
+                        "name": s.name,
+                        "kind": 2 if s.parent_id is None else 1,
+                        "startTimeUnixNano": str(s.start_ns),
+                        "endTimeUnixNano": str(s.end_ns or s.start_ns),
+                        "attributes": [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()],
+                        "status": {"code": 2, "message": s.error or ""} if s.status == "error" else {"code": 1}
+                    } for s in spans]
+                }]
+            }]
+        }
+
+    def _flush(self, spans: List[Span]):
+        if not spans:
+            return
+        try:
+            requests.post(self.url, json=self._payload(spans), timeout=self.timeout)
+        except Exception as e:
+            logger.warning(f"⚠️ No se pudieron exportar {len(spans)} spans a {self.url}: {e}")
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch: List[Span] = []
+            deadline = time.monotonic() + self.interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._flush(batch)
+
+    def shutdown(self):
+        self._stop.set()
+        pending: List[Span] = []
+        while not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        self._flush(pending)
+
+
+class Tracer:
+    """Crea spans, mantiene los recientes en memoria y los entrega al exportador configurado"""
+
+    def __init__(self, exporter=None, buffer_size: int = 2000, enabled: bool = True):
+        self.exporter = exporter
+        self.enabled = enabled
+        self.recent: deque = deque(maxlen=buffer_size)
+        self._lock = threading.Lock()
+
+    def finish(self, span: Span):
+        span.end_ns = time.time_ns()
+        with self._lock:
+            self.recent.append(span)
+        if self.exporter is not None:
+            try:
+                self.exporter.export(span)
+            except Exception as e:
+                logger.warning(f"⚠️ Error exportando span {span.name}: {e}")
+
+    def spans_for(self, trace_id: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            spans = [s for s in self.recent if s.trace_id == trace_id]
+        return [s.to_dict() for s in sorted(spans, key=lambda s: s.start_ns)]
+
+    def recent_traces(self, limit: int = 20) -> List[Dict[str, Any]]:
+        """Resumen de las últimas trazas (span raíz de cada request)"""
+        with self._lock:
+            roots = [s for s in self.recent if s.parent_id is None]
+        return [s.to_dict() for s in roots[-limit:]][::-1]
+
+
+def _build_exporter():
+    kind = os.getenv("TRACING_EXPORTER", "none").lower()
+    if kind == "file":
+        return FileSpanExporter(Path(os.getenv("TRACING_FILE", "./traces/spans.jsonl")))
+    if kind == "otlp":
+        return OTLPHttpExporter(os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318"))
+    if kind not in ("none", ""):
+        logger.warning(f"⚠️ TRACING_EXPORTER desconocido: {kind} (se usa 'none')")
+    return None
+
+
+tracer = Tracer(
+    _build_exporter(),
+    buffer_size=int(os.getenv("TRACING_BUFFER_SIZE", "2000")),
+    enabled=os.getenv("TRACING_ENABLED", "true").lower() != "false"
+)
+
+
+def reinit_after_fork():
+    """
+    En cada worker tras el fork: el hilo del exportador OTLP no sobrevive al fork
+    y los spans del master no pertenecen al worker
+    """
+    tracer.exporter = _build_exporter()
+    tracer.recent.clear()
+
+
+# ===== API DE INSTRUMENTACIÓN =====
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """
+    Abre un span hijo del span actual (o raíz si no hay uno):
+
+        with tracing.span("http.get", url=url) as s:
+            ...
+            s.set_attribute("http.status_code", 200)
+    """
+    if not tracer.enabled:
+        yield None
+        return
+    parent = _current_span.get()
+    current = Span(
+        name,
+        trace_id=parent.trace_id if parent else secrets.token_hex(16),
+        parent_id=parent.span_id if parent else None,
+        attributes=attributes
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        tracer.finish(current)
+
+
+def traced(prefix: str, name: Optional[str] = None) -> Callable:
+    """Decorador: cada llamada a la función queda en un span '<prefix>.<nombre>'"""
+
+    def decorator(fn: Callable) -> Callable:
+        span_name = f"{prefix}.{name or fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(span_name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Dict[str, str]]:
+    """Lee un header W3C traceparent (00-<trace_id>-<parent_id>-<flags>)"""
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    return {"trace_id": parts[1], "parent_id": parts[2]}
+
+
+@contextmanager
+def request_span(method: str, route: str, traceparent: Optional[str] = None):
+    """Span raíz de un request HTTP; continúa la traza del cliente si envía traceparent"""
+    if not tracer.enabled:
+        yield None
+        return
+    remote = parse_traceparent(traceparent)
+    current = Span(
+        f"{method} {route}",
+        trace_id=remote["trace_id"] if remote else secrets.token_hex(16),
+        parent_id=remote["parent_id"] if remote else None,
+        attributes={"http.method": method, "http.route": route}
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = "error"
+        current.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        tracer.finish(current)
+
+
+# ===== PROFILING BAJO DEMANDA =====
+
+def profiling_enabled() -> bool:
+    return os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+
+
+def get_profile_dir() -> Path:
+    return Path(os.getenv("PROFILE_DIR", "./profiles"))
+
+
+# Un perfil a la vez por proceso: cProfile mide todo lo que corre en el hilo del event loop
+# (también los requests concurrentes) y en Python 3.12+ enable() lanza ValueError si ya hay
+# otro perfilador activo
+_profile_lock = threading.Lock()
+
+
+class RequestProfiler:
+    """
+    Perfil de un único request: pyinstrument (HTML, entiende async) si está instalado,
+    si no cProfile (.prof, legible con pstats / snakeviz)
+    """
+
+    def __init__(self, label: str, engine: Optional[str] = None):
+        self.label = label
+        self.engine = engine or ("pyinstrument" if PYINSTRUMENT_AVAILABLE else "cprofile")
+        self._profiler = None
+
+    def start(self) -> bool:
+        """Inicia el perfil; retorna False (sin perfilar) si ya hay otro en curso"""
+        if not _profile_lock.acquire(blocking=False):
+            return False
+        try:
+            if self.engine == "pyinstrument":
+                self._profiler = pyinstrument.Profiler(async_mode="enabled")
+                self._profiler.start()
+            else:
+                self._profiler = cProfile.Profile()
+                self._profiler.enable()
+        except Exception as e:
+            # Otro perfilador fuera de este módulo (sys.setprofile / sys.monitoring)
+            logger.warning(f"⚠️ No se pudo iniciar el perfil de {self.label}: {e}")
+            self._profiler = None
+            _profile_lock.release()
+            return False
+        return True
+
+    def stop(self) -> Path:
+        """Detiene el perfil y lo guarda en PROFILE_DIR; retorna la ruta del archivo"""
+        try:
+            if self.engine == "pyinstrument":
+                self._profiler.stop()
+            else:
+                self._profiler.disable()
+        finally:
+            _profile_lock.release()
+        profile_dir = get_profile_dir()
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        safe_label = "".join(c if c.isalnum() else "_" for c in self.label).strip("_")
+        stem = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{safe_label}"
+        if self.engine == "pyinstrument":
+            path = profile_dir / f"{stem}.html"
+            path.write_text(self._profiler.output_html(), encoding="utf-8")
+        else:
+            path = profile_dir / f"{stem}.prof"
+            self._profiler.dump_stats(str(path))
+        return path
+
+
+def list_profiles(limit: int = 50) -> List[Dict[str, Any]]:
+    profile_dir = get_profile_dir()
+    if not profile_dir.exists():
+        return []
+    files = sorted(
+        (p for p in profile_dir.iterdir() if p.suffix in (".prof", ".html")),
+        key=lambda p: p.stat().st_mtime,
+        reverse=True
+    )
+    return [{
+        "nombre": p.name,
+        "formato": "pyinstrument_html" if p.suffix == ".html" else "cprofile",
+        "bytes": p.stat().st_size,
+        "creado": datetime.fromtimestamp(p.stat().st_mtime).isoformat()
+    } for p in files[:limit]]
+
+
+def resolve_profile(name: str) -> Optional[Path]:
+    """Ruta de un perfil guardado (solo nombres dentro de PROFILE_DIR)"""
+    profile_dir = get_profile_dir().resolve()
+    path = (profile_dir / name).resolve()
+    if path.parent != profile_dir or not path.is_file():
+        return None
+    return path
+
+
+def cprofile_summary(path: Path, limit: int = 40, sort: str = "cumulative") -> str:
+    """Top de funciones de un perfil cProfile en texto (pstats)"""
+    out = io.StringIO()
+    stats = pstats.Stats(str(path), stream=out)
+    stats.strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
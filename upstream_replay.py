@@ -0,0 +1,409 @@
+# Grabación / reproducción de respuestas de servicios externos
+# Permite ejecutar benchmarks y pruebas de carga sin red, con latencia y errores configurables
+#
+# Modos (variable de entorno UPSTREAM_MODE):
+#   live    -> (por defecto) requests directos a internet
+#   record  -> requests directos + guarda cada respuesta en UPSTREAM_FIXTURES_DIR
+#   replay  -> todas las URLs externas se redirigen al servidor mock (UPSTREAM_MOCK_URL)
+#
+# Servidor mock:
+#   python -m upstream_replay serve --port 8765 --latency-ms 80 --jitter-ms 20 --error-rate 0.02
+#   UPSTREAM_MODE=replay UPSTREAM_MOCK_URL=http://127.0.0.1:8765 uvicorn main:app
+
+import argparse
+import base64
+import hashlib
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Any, Optional, List, Tuple
+from urllib.parse import urlsplit, parse_qsl
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_FIXTURES_DIR = Path(__file__).parent / "fixtures" / "upstream"
+DEFAULT_MOCK_URL = "http://127.0.0.1:8765"
+
+# Parámetros que no forman parte de la clave ni se guardan en disco (credenciales / tokens de sesión)
+SENSITIVE_PARAMS = frozenset({"appid", "apikey", "api_key", "key", "token", "subscription-key", "nonce"})
+
+
+def get_mode() -> str:
+    """Modo actual (se lee en cada llamada para poder cambiarlo desde un harness)"""
+    mode = os.getenv("UPSTREAM_MODE", "live").strip().lower()
+    return mode if mode in ("live", "record", "replay") else "live"
+
+
+def is_recording() -> bool:
+    return get_mode() == "record"
+
+
+def get_fixtures_dir() -> Path:
+    return Path(os.getenv("UPSTREAM_FIXTURES_DIR", str(DEFAULT_FIXTURES_DIR)))
+
+
+def route(url: str) -> str:
+    """
+    En modo replay reescribe https://host/path?q -> {UPSTREAM_MOCK_URL}/host/path?q
+    En cualquier otro modo devuelve la URL sin cambios
+    """
+    if get_mode() != "replay":
+        return url
+    parts = urlsplit(url)
+    mock = os.getenv("UPSTREAM_MOCK_URL", DEFAULT_MOCK_URL).rstrip("/")
+    routed = f"{mock}/{parts.netloc}{parts.path or '/'}"
+    return f"{routed}?{parts.query}" if parts.query else routed
+
+
+def _clean_pairs(pairs: List[Tuple[str, Any]]) -> List[Tuple[str, str]]:
+    return sorted((str(k), str(v)) for k, v in pairs if str(k).lower() not in SENSITIVE_PARAMS)
+
+
+def _as_pairs(values: Optional[Any]) -> List[Tuple[str, Any]]:
+    if not values:
+        return []
+    if isinstance(values, dict):
+        return list(values.items())
+    return list(values)
+
+
+def request_key(method: str, host: str, path: str, query: List[Tuple[str, Any]],
+                form: List[Tuple[str, Any]]) -> str:
+    """Clave de fixture: método + host + path + query y form ordenados (sin credenciales)"""
+    payload = json.dumps({
+        "method": method.upper(),
+        "host": host.lower(),
+        "path": path or "/",
+        "query": _clean_pairs(query),
+        "form": _clean_pairs(form)
+    }, sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def key_for_url(method: str, url: str, params: Optional[Any] = None, data: Optional[Any] = None) -> Tuple[str, str, str]:
+    """(host, path, key) para una URL original + params/data como los recibe requests/aiohttp"""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True) + _as_pairs(params)
+    key = request_key(method, parts.netloc, parts.path, query, _as_pairs(data))
+    return parts.netloc, parts.path or "/", key
+
+
+def _host_dir(host: str) -> str:
+    # "localhost:11434" -> "localhost_11434" (nombres válidos también en Windows)
+    return host.lower().replace(":", "_")
+
+
+class FixtureStore:
+    """
+    Fixtures en disco: <dir>/<host>/<key>.json
+
+    Cada archivo guarda la request original (sin credenciales), status, headers
+    relevantes y el cuerpo (texto o base64)
+    """
+
+    KEPT_HEADERS = ("content-type", "etag", "last-modified")
+
+    def __init__(self, fixtures_dir: Optional[Path] = None):
+        self.fixtures_dir = Path(fixtures_dir) if fixtures_dir else get_fixtures_dir()
+        self._by_key: Dict[str, Dict[str, Any]] = {}
+        self._by_path: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def load(self) -> int:
+        """Carga todos los fixtures en memoria; devuelve cuántos hay"""
+        by_key, by_path = {}, {}
+        for path in sorted(self.fixtures_dir.glob("*/*.json")):
+            try:
+                fixture = json.loads(path.read_text(encoding="utf-8"))
+            except (OSError, ValueError) as e:
+                logger.warning(f"Fixture inválido {path}: {e}")
+                continue
+            req = fixture.get("request", {})
+            method = req.get("method", "GET").upper()
+            host = req.get("host", "").lower()
+            by_key[path.stem] = fixture
+            # Fallback por path: el primero en orden de archivo gana
+            by_path.setdefault((method, host, req.get("path", "/")), fixture)
+        with self._lock:
+            self._by_key, self._by_path = by_key, by_path
+        return len(by_key)
+
+    def lookup(self, method: str, host: str, path: str, query: List[Tuple[str, Any]],
+               form: List[Tuple[str, Any]]) -> Optional[Dict[str, Any]]:
+        """Coincidencia exacta por clave; si no existe, el fixture del mismo método + host + path"""
+        key = request_key(method, host, path, query, form)
+        fixture = self._by_key.get(key)
+        if fixture is None:
+            fixture = self._by_path.get((method.upper(), host.lower(), path or "/"))
+        return fixture
+
+    def save(self, method: str, url: str, params: Optional[Any], data: Optional[Any],
+             status: int, headers: Dict[str, str], body: bytes) -> Path:
+        """Guarda una respuesta grabada (sobrescribe la anterior para la misma request)"""
+        host, path, key = key_for_url(method, url, params, data)
+        parts = urlsplit(url)
+        query = _clean_pairs(parse_qsl(parts.query, keep_blank_values=True) + _as_pairs(params))
+
+        lowered = {str(k).lower(): v for k, v in (headers or {}).items()}
+        fixture: Dict[str, Any] = {
+            "request": {
+                "method": method.upper(),
+                "host": host.lower(),
+                "path": path,
+                "query": query,
+                "form": _clean_pairs(_as_pairs(data))
+            },
+            "status": status,
+            "headers": {h: lowered[h] for h in self.KEPT_HEADERS if h in lowered},
+            "recorded_at": datetime.now().isoformat()
+        }
+        try:
+            fixture["body"] = body.decode("utf-8")
+        except UnicodeDecodeError:
+            fixture["body_b64"] = base64.b64encode(body).decode("ascii")
+
+        target = self.fixtures_dir / _host_dir(host) / f"{key}.json"
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_suffix(f".{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(fixture, indent=2, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, target)
+        return target
+
+    @staticmethod
+    def body_of(fixture: Dict[str, Any]) -> bytes:
+        if "body_b64" in fixture:
+            return base64.b64decode(fixture["body_b64"])
+        return fixture.get("body", "").encode("utf-8")
+
+
+def record(method: str, url: str, params: Optional[Any], data: Optional[Any],
+           status: int, headers: Dict[str, str], body: bytes):
+    """Guarda la respuesta si el modo actual es record (no-op en otro caso)"""
+    if not is_recording():
+        return
+    try:
+        target = FixtureStore().save(method, url, params, data, status, headers, body)
+        logger.info(f"  💾 Respuesta grabada: {method.upper()} {url} -> {target.name}")
+    except OSError as e:
+        logger.warning(f"No se pudo grabar respuesta de {url}: {e}")
+
+
+# ===== SERVIDOR MOCK =====
+
+class UpstreamProfile:
+    """Latencia (ms), jitter (ms, uniforme ±) y tasa de error para un host o global"""
+
+    def __init__(self, latency_ms: float = 0.0, jitter_ms: float = 0.0,
+                 error_rate: float = 0.0, error_status: int = 503):
+        self.latency_ms = max(0.0, latency_ms)
+        self.jitter_ms = max(0.0, jitter_ms)
+        self.error_rate = min(max(error_rate, 0.0), 1.0)
+        self.error_status = error_status
+
+    @classmethod
+    def parse(cls, spec: str) -> "UpstreamProfile":
+        """'latencia:jitter:error_rate[:status]', p.ej. '250:50:0.1:502'"""
+        values = spec.split(":")
+        return cls(
+            latency_ms=float(values[0]) if len(values) > 0 and values[0] else 0.0,
+            jitter_ms=float(values[1]) if len(values) > 1 and values[1] else 0.0,
+            error_rate=float(values[2]) if len(values) > 2 and values[2] else 0.0,
+            error_status=int(values[3]) if len(values) > 3 and values[3] else 503
+        )
+
+
+class MockUpstreamServer:
+    """
+    Servidor HTTP local que sirve los fixtures grabados
+
+    - Ruta: /<host>/<path>?<query> (ver route())
+    - Latencia, jitter y errores configurables globalmente o por host, con semilla fija
+    - ETag por contenido + 304 ante If-None-Match (ejercita la caché HTTP del scraper)
+    - GET /__stats__ devuelve contadores de requests / errores / fixtures faltantes
+    """
+
+    def __init__(self, fixtures_dir: Optional[Path] = None, host: str = "127.0.0.1", port: int = 0,
+                 profile: Optional[UpstreamProfile] = None,
+                 host_profiles: Optional[Dict[str, UpstreamProfile]] = None, seed: int = 42):
+        self.store = FixtureStore(fixtures_dir)
+        self.store.load()
+        self.profile = profile or UpstreamProfile()
+        self.host_profiles = {h.lower(): p for h, p in (host_profiles or {}).items()}
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self.stats = {"requests": 0, "errors_injected": 0, "not_modified": 0, "missing": 0}
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _draw(self, profile: UpstreamProfile) -> Tuple[float, bool]:
+        """(retardo en segundos, inyectar error) con el RNG compartido y determinista"""
+        with self._rng_lock:
+            jitter = self._rng.uniform(-profile.jitter_ms, profile.jitter_ms) if profile.jitter_ms else 0.0
+            fail = profile.error_rate > 0 and self._rng.random() < profile.error_rate
+        return max(0.0, profile.latency_ms + jitter) / 1000.0, fail
+
+    def _count(self, name: str):
+        with self._rng_lock:
+            self.stats[name] += 1
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status: int, body: bytes, headers: Optional[Dict[str, str]] = None):
+                self.send_response(status)
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                if body and self.command != "HEAD":
+                    self.wfile.write(body)
+
+            def _handle(self, method: str):
+                parts = urlsplit(self.path)
+                if parts.path == "/__stats__":
+                    self._send(200, json.dumps(server.stats).encode("utf-8"), {"Content-Type": "application/json"})
+                    return
+
+                segments = parts.path.lstrip("/").split("/", 1)
+                host = segments[0]
+                path = "/" + (segments[1] if len(segments) > 1 else "")
+                query = parse_qsl(parts.query, keep_blank_values=True)
+
+                form: List[Tuple[str, str]] = []
+                length = int(self.headers.get("Content-Length") or 0)
+                if length:
+                    raw = self.rfile.read(length).decode("utf-8", errors="replace")
+                    form = parse_qsl(raw, keep_blank_values=True)
+
+                server._count("requests")
+                profile = server.host_profiles.get(host.lower(), server.profile)
+                delay, fail = server._draw(profile)
+                if delay:
+                    time.sleep(delay)
+
+                if fail:
+                    server._count("errors_injected")
+                    self._send(profile.error_status, b'{"error": "error inyectado por mock"}',
+                               {"Content-Type": "application/json"})
+                    return
+
+                fixture = server.store.lookup(method, host, path, query, form)
+                if fixture is None:
+                    server._count("missing")
+                    logger.warning(f"Fixture no encontrado: {method} {host}{path}")
+                    self._send(404, b'{"error": "fixture no encontrado"}', {"Content-Type": "application/json"})
+                    return
+
+                body = FixtureStore.body_of(fixture)
+                headers = dict(fixture.get("headers", {}))
+                etag = '"%s"' % hashlib.sha256(body).hexdigest()[:32]
+                headers["ETag"] = etag
+                headers.pop("etag", None)
+
+                if fixture.get("status", 200) == 200 and self.headers.get("If-None-Match") == etag:
+                    server._count("not_modified")
+                    self._send(304, b"", {"ETag": etag})
+                    return
+
+                self._send(fixture.get("status", 200), body, headers)
+
+            def do_GET(self):
+                self._handle("GET")
+
+            def do_POST(self):
+                self._handle("POST")
+
+            def log_message(self, format, *args):
+                logger.debug("mock upstream: " + format % args)
+
+        return Handler
+
+    def start(self) -> "MockUpstreamServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockUpstreamServer":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def replay_environment(server: MockUpstreamServer) -> Dict[str, str]:
+    """Variables de entorno para que el servicio use el servidor mock"""
+    return {"UPSTREAM_MODE": "replay", "UPSTREAM_MOCK_URL": server.url}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor mock de servicios externos (fixtures grabados)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve = sub.add_parser("serve", help="Servir fixtures con latencia / errores configurables")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8765)
+    serve.add_argument("--fixtures", type=Path, default=None)
+    serve.add_argument("--latency-ms", type=float, default=0.0)
+    serve.add_argument("--jitter-ms", type=float, default=0.0)
+    serve.add_argument("--error-rate", type=float, default=0.0)
+    serve.add_argument("--error-status", type=int, default=503)
+    serve.add_argument("--host-profile", action="append", default=[],
+                       help="Perfil por host: host=latencia:jitter:error_rate[:status]")
+    serve.add_argument("--seed", type=int, default=42)
+
+    sub.add_parser("list", help="Listar fixtures disponibles")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == "list":
+        store = FixtureStore()
+        store.load()
+        for (method, host, path), fixture in sorted(store._by_path.items()):
+            print(f"{method:<5} {host}{path}  [{fixture.get('status', 200)}]")
+        return
+
+    host_profiles = {}
+    for spec in args.host_profile:
+        name, _, values = spec.partition("=")
+        host_profiles[name] = UpstreamProfile.parse(values)
+
+    server = MockUpstreamServer(
+        fixtures_dir=args.fixtures,
+        host=args.host,
+        port=args.port,
+        profile=UpstreamProfile(args.latency_ms, args.jitter_ms, args.error_rate, args.error_status),
+        host_profiles=host_profiles,
+        seed=args.seed
+    )
+    logger.info(f"🧪 Mock upstream en {server.url} ({len(server.store._by_key)} fixtures)")
+    logger.info(f"   export UPSTREAM_MODE=replay UPSTREAM_MOCK_URL={server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Verifica la migración de metadata de precios (PriceDatabase._migrar_metadata_precios)
+
+La migración reconstruye precios_publicos / precios_despacho la primera vez que se abre una
+BD con el esquema original (JSON completo en `metadata`) y no se puede deshacer. Este script
+la ejecuta sobre COPIAS (nunca sobre el archivo original) y compara fila por fila:
+
+  - mismas filas (conteo e ids) y mismas columnas originales
+  - campos promovidos a columnas desde el JSON viejo (cantidad_sacos, costo_operativo, nota,
+    derivado_desde, fuentes_detalle) y cantidad_fuentes conservado
+  - el resto del JSON guardado una sola vez en metadata_payloads (deduplicado por hash)
+  - una segunda apertura no vuelve a migrar ni cambia nada
+
+Siempre verifica una BD sintética con el esquema original; además, cada ruta pasada como
+argumento (por defecto data/precios_historicos.db si todavía tiene el esquema original).
+
+Uso:
+    python verificar_migracion.py
+    python verificar_migracion.py /ruta/a/backup.db
+"""
+
+import json
+import logging
+import shutil
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List
+
+from database import (
+    PriceDatabase, METADATA_PUBLICOS, METADATA_DESPACHO, REDUNDANTES_PUBLICOS, REDUNDANTES_DESPACHO
+)
+
+# Esquema original de las tablas con metadata JSON (antes de la migración)
+ESQUEMA_ORIGINAL = """
+    CREATE TABLE precios_publicos (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha DATE NOT NULL,
+        calibre TEXT NOT NULL,
+        precio_usd_lb REAL NOT NULL,
+        fuente TEXT NOT NULL,
+        cantidad_fuentes INTEGER DEFAULT 1,
+        confiabilidad TEXT DEFAULT 'media',
+        metadata TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(fecha, calibre, fuente)
+    );
+    CREATE TABLE precios_despacho (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        fecha DATE NOT NULL,
+        calibre TEXT NOT NULL,
+        presentacion TEXT NOT NULL,
+        precio_usd_lb REAL NOT NULL,
+        origen TEXT DEFAULT 'EXPORQUILSA',
+        metadata TEXT,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        UNIQUE(fecha, calibre, presentacion, origen)
+    );
+"""
+
+# tabla -> (campos promovidos (columna, clave JSON), claves redundantes)
+TABLAS = {
+    "precios_publicos": (METADATA_PUBLICOS, REDUNDANTES_PUBLICOS),
+    "precios_despacho": (METADATA_DESPACHO, REDUNDANTES_DESPACHO),
+}
+
+
+def crear_bd_sintetica(path: Path):
+    """BD con el esquema original y metadata variada: repetida, vacía, inválida, con listas"""
+    repetida = json.dumps({"desviacion_estandar": 0.08})
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(ESQUEMA_ORIGINAL)
+        publicos = []
+        for dia in range(1, 29):
+            fecha = f"2025-02-{dia:02d}"
+            publicos += [
+                (fecha, "16/20", 5.1, "promedio_consolidado", 3, "alta", json.dumps({
+                    "fuentes": ["selina_wamucii", "freezeocean", "alibaba"],
+                    "precio_publico_promedio": 5.1, "actualizado": f"{fecha}T10:00:00",
+                    "desviacion_estandar": 0.12
+                })),
+                (fecha, "21/25", 4.6, "selina_wamucii", 1, "media", repetida),
+                (fecha, "26/30", 4.2, "derivado", 1, "baja", json.dumps({"derivado_desde": "21/25"})),
+                (fecha, "31/35", 3.9, "manual", 1, "media", None),
+            ]
+        publicos.append(("2025-03-01", "16/20", 5.0, "manual", 1, "media", "no es json"))
+        publicos.append(("2025-03-01", "21/25", 4.5, "manual", 1, "media", "[1, 2]"))
+        conn.executemany("""
+            INSERT INTO precios_publicos (fecha, calibre, precio_usd_lb, fuente, cantidad_fuentes,
+                                          confiabilidad, metadata)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, publicos)
+
+        despacho = []
+        for dia in range(1, 29):
+            fecha = f"2025-02-{dia:02d}"
+            despacho += [
+                (fecha, "16/20", "HEADLESS", 3.0, "EXPORQUILSA", json.dumps({
+                    "calibre": "16/20", "presentacion": "HEADLESS", "precio_usd_lb": 3.0,
+                    "origen": "EXPORQUILSA", "nota": "seed_from_base"
+                })),
+                (fecha, "20", "WHOLE", 4.6, "COMPRA", json.dumps({
+                    "cantidad_sacos": 100 + dia, "costo_operativo": 0.15, "proveedor": "Finca A"
+                })),
+                (fecha, "21/25", "HEADLESS", 2.6, "EXPORQUILSA", None),
+            ]
+        conn.executemany("""
+            INSERT INTO precios_despacho (fecha, calibre, presentacion, precio_usd_lb, origen, metadata)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, despacho)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _leer_filas(path: Path, tabla: str) -> Dict[int, Dict[str, Any]]:
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    try:
+        return {row["id"]: dict(row) for row in conn.execute(f"SELECT * FROM {tabla}")}
+    finally:
+        conn.close()
+
+
+def _metadata_original(texto: Any) -> Dict[str, Any]:
+    if not texto:
+        return {}
+    try:
+        datos = json.loads(texto)
+    except ValueError:
+        return {"texto": texto}
+    return datos if isinstance(datos, dict) else {"valor": datos}
+
+
+def _esperado_columna(valor: Any) -> Any:
+    if isinstance(valor, (list, tuple)):
+        return ",".join(sorted(str(v) for v in valor)) or None
+    if isinstance(valor, str) and not valor.strip():
+        return None
+    return valor
+
+
+def _iguales(a: Any, b: Any) -> bool:
+    if a == b:
+        return True
+    # Afinidad de columna de SQLite: "120" en JSON puede quedar como 120 en INTEGER
+    try:
+        return float(a) == float(b)
+    except (TypeError, ValueError):
+        return False
+
+
+def verificar(original: Path) -> List[str]:
+    """Migra una copia de `original` y retorna la lista de diferencias (vacía = OK)"""
+    errores: List[str] = []
+    antes = {tabla: _leer_filas(original, tabla) for tabla in TABLAS}
+
+    with tempfile.TemporaryDirectory(prefix="maransa-migracion-") as tmp:
+        copia = Path(tmp) / original.name
+        shutil.copy2(original, copia)
+        PriceDatabase(copia)
+
+        conn = sqlite3.connect(copia)
+        try:
+            payloads = dict(conn.execute("SELECT hash, payload FROM metadata_payloads"))
+            temporales = [r[0] for r in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE '%\\_v1' ESCAPE '\\'")]
+        finally:
+            conn.close()
+        if temporales:
+            errores.append(f"tablas temporales sin borrar: {temporales}")
+
+        payloads_usados, restos_distintos = set(), set()
+        for tabla, (campos, redundantes) in TABLAS.items():
+            despues = _leer_filas(copia, tabla)
+            if "metadata" in next(iter(despues.values()), {}):
+                errores.append(f"{tabla}: sigue teniendo la columna metadata")
+                continue
+            if set(despues) != set(antes[tabla]):
+                errores.append(f"{tabla}: {len(antes[tabla])} filas antes, {len(despues)} después "
+                               f"(ids distintos: {len(set(despues) ^ set(antes[tabla]))})")
+                continue
+
+            promovidas = {clave for _, clave in campos}
+            for id_fila, vieja in antes[tabla].items():
+                nueva = despues[id_fila]
+                for columna, valor in vieja.items():
+                    if columna != "metadata" and not _iguales(nueva[columna], valor):
+                        errores.append(f"{tabla} id={id_fila}: {columna} {valor!r} -> {nueva[columna]!r}")
+                datos = _metadata_original(vieja["metadata"])
+                for columna, clave in campos:
+                    esperado = _esperado_columna(datos.get(clave))
+                    if not _iguales(nueva[columna], esperado):
+                        errores.append(f"{tabla} id={id_fila}: {columna} esperado {esperado!r}, "
+                                       f"quedó {nueva[columna]!r}")
+                resto = {k: v for k, v in datos.items()
+                         if k not in redundantes and k not in promovidas and v is not None}
+                hash_payload = nueva["metadata_hash"]
+                if resto:
+                    restos_distintos.add(json.dumps(resto, sort_keys=True, default=str))
+                if not resto:
+                    if hash_payload is not None:
+                        errores.append(f"{tabla} id={id_fila}: payload {hash_payload} sin datos que guardar")
+                elif hash_payload not in payloads:
+                    errores.append(f"{tabla} id={id_fila}: falta el payload de {sorted(resto)}")
+                elif json.loads(payloads[hash_payload]) != json.loads(json.dumps(resto, default=str)):
+                    errores.append(f"{tabla} id={id_fila}: payload distinto al JSON original")
+                else:
+                    payloads_usados.add(hash_payload)
+
+        if len(payloads) != len(restos_distintos):
+            errores.append(f"metadata_payloads tiene {len(payloads)} payloads para "
+                           f"{len(restos_distintos)} JSON distintos (no deduplicados)")
+        huerfanos = set(payloads) - payloads_usados
+        if huerfanos:
+            errores.append(f"metadata_payloads tiene {len(huerfanos)} payloads sin filas que los usen")
+
+        # Segunda apertura: el esquema ya es el nuevo, no debe migrar ni tocar filas
+        firma = {tabla: _leer_filas(copia, tabla) for tabla in TABLAS}
+        PriceDatabase(copia)
+        if firma != {tabla: _leer_filas(copia, tabla) for tabla in TABLAS}:
+            errores.append("la segunda apertura modificó las filas migradas")
+
+    return errores
+
+
+def _tiene_esquema_original(path: Path) -> bool:
+    conn = sqlite3.connect(path)
+    try:
+        return all(
+            "metadata" in [row[1] for row in conn.execute(f"PRAGMA table_info({tabla})")]
+            for tabla in TABLAS
+        )
+    finally:
+        conn.close()
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.WARNING)
+    rutas = [Path(p) for p in sys.argv[1:]]
+    if not rutas:
+        por_defecto = Path(__file__).parent / "data" / "precios_historicos.db"
+        if por_defecto.exists() and _tiene_esquema_original(por_defecto):
+            rutas.append(por_defecto)
+
+    fallos = 0
+    with tempfile.TemporaryDirectory(prefix="maransa-migracion-") as tmp:
+        sintetica = Path(tmp) / "esquema_original.db"
+        crear_bd_sintetica(sintetica)
+        for nombre, path in [("BD sintética", sintetica)] + [(str(p), p) for p in rutas]:
+            if not _tiene_esquema_original(path):
+                print(f"⏭️  {nombre}: no tiene el esquema original (nada que migrar)")
+                continue
+            filas = {tabla: len(_leer_filas(path, tabla)) for tabla in TABLAS}
+            errores = verificar(path)
+            if errores:
+                fallos += 1
+                print(f"❌ {nombre}: {len(errores)} diferencias")
+                for error in errores[:20]:
+                    print(f"   - {error}")
+            else:
+                print(f"✅ {nombre}: migración correcta "
+                      f"({filas['precios_publicos']} públicos, {filas['precios_despacho']} despacho)")
+    return 1 if fallos else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())